@@ -0,0 +1,150 @@
+#a cache of engine replies that is kept on disk between games
+#openings and common positions come up again and again, so the best move the engine found for a position is stored
+#and the next time the same position comes up with the same engine settings, the engine does not have to be asked
+#
+#the cache is a small sqlite database, keyed by the zobrist hash of the position and a string of the engine settings
+#when it grows past max_entries, the entries that were used the longest time ago are removed
+
+import time
+import sqlite3
+import threading
+import chess
+import chess.polyglot
+import chess.engine
+
+#a mate score is stored as a very large centipawn score
+MATE_SCORE = 100000
+
+
+#building the settings part of the key, from the name of the engine, its UCI options and the search limit
+#e.g. 'Stockfish 16', {'Skill Level': 10} and Limit(time=0.1) give 'engine=Stockfish 16|Skill Level=10|time=0.1'
+#the name keeps the replies of different engines apart, the built-in engine's moves are never served as Stockfish's
+def settings_key(options, limit, engine=None):
+    parts = [f'engine={engine}'] if engine is not None else []
+    parts += [f'{name}={value}' for name, value in sorted((options or {}).items())]
+    if limit is not None:
+        for name in ('time', 'depth', 'nodes', 'mate'):
+            value = getattr(limit, name)
+            if value is not None:
+                parts.append(f'{name}={value}')
+    return '|'.join(parts)
+
+#the name of an engine for the settings key, as it gave it (id name), the built-in engine is 'builtin'
+def engine_name(engine):
+    return getattr(engine, 'id', {}).get('name', 'unknown')
+
+#the 64 bit zobrist hash of a position, as a signed number because sqlite integers are signed
+#key is the hash if the caller already has it (the game keeps it up to date on its bitboards), it is worked out from the board otherwise
+def position_key(board, key=None):
+    if key is None:
+        key = chess.polyglot.zobrist_hash(board)
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+#cache of engine replies stored in a sqlite file
+class AnalysisCache:
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        #the cache can be used from the engine worker threads as well as the game, so one lock guards the connection
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        #WAL keeps writes cheap, the cache does not need every write to be flushed to disk straight away
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS replies ('
+            ' position INTEGER NOT NULL,'
+            ' settings TEXT NOT NULL,'
+            ' move TEXT NOT NULL,'
+            ' score INTEGER,'
+            ' depth INTEGER,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (position, settings)'
+            ')')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS replies_last_used ON replies (last_used)')
+        self.connection.commit()
+        self.count = self.connection.execute('SELECT COUNT(*) FROM replies').fetchone()[0]
+        #how many lookups found a stored reply, and how many did not
+        self.hits = 0
+        self.misses = 0
+
+    #looking up the reply stored for a position, returns a dictionary with move, score and depth, or None
+    #score is in centipawns from the point of view of the side to move
+    #key is the zobrist hash of the board if it is already known, so it does not have to be worked out again
+    def get(self, board, settings, key=None):
+        key = position_key(board, key)
+        with self.lock:
+            row = self.connection.execute('SELECT move, score, depth FROM replies WHERE position = ? AND settings = ?', (key, settings)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            #marking the entry as used, so it is the last one to be removed when the cache is full
+            self.connection.execute('UPDATE replies SET last_used = ? WHERE position = ? AND settings = ?', (time.time(), key, settings))
+            self.connection.commit()
+        move = chess.Move.from_uci(row[0])
+        #a hash collision could give a move that does not fit the position, that is treated as a miss
+        if move not in board.legal_moves:
+            return None
+        return {'move': move, 'score': row[1], 'depth': row[2]}
+
+    #storing the reply of the engine for a position
+    #info is the info dictionary of the search (python-chess), the score and depth are taken from it if it has them
+    def put(self, board, settings, move, info=None, key=None):
+        info = info or {}
+        score = info.get('score')
+        if score is not None:
+            score = score.pov(board.turn).score(mate_score=MATE_SCORE)
+        depth = info.get('depth')
+        key = position_key(board, key)
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO replies (position, settings, move, score, depth, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, settings, move.uci(), score, depth, time.time()))
+            #a new entry makes the cache bigger, a replaced one does not, so the size is read again only when it may be too big
+            self.count += 1
+            if self.count > self.max_entries:
+                self.count = self.connection.execute('SELECT COUNT(*) FROM replies').fetchone()[0]
+                if self.count > self.max_entries:
+                    self._evict()
+            self.connection.commit()
+
+    #removing the entries that were used the longest time ago, a tenth of the cache at a time so this does not run on every put
+    def _evict(self):
+        remove = self.count - self.max_entries + max(1, self.max_entries // 10)
+        self.connection.execute('DELETE FROM replies WHERE rowid IN (SELECT rowid FROM replies ORDER BY last_used LIMIT ?)', (remove,))
+        self.count = self.connection.execute('SELECT COUNT(*) FROM replies').fetchone()[0]
+
+    #share of lookups that found a stored reply
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+
+#wrapper around an engine that answers play() from the cache when it can, and stores every new reply
+#it has the same play(board, limit, game=..., info=...) method as a SimpleEngine, so selfplay.py can use it in place of the engine
+class CachedEngine:
+
+    #options are the UCI options the engine was set up with, they are part of the cache key together with the limit
+    def __init__(self, engine, cache, options=None):
+        self.engine = engine
+        self.cache = cache
+        self.options = options
+
+    def play(self, board, limit, game=None, info=chess.engine.INFO_NONE):
+        settings = settings_key(self.options, limit, engine_name(self.engine))
+        stored = self.cache.get(board, settings)
+        if stored is not None:
+            info = {'depth': stored['depth']} if stored['depth'] is not None else {}
+            return chess.engine.PlayResult(stored['move'], None, info)
+        result = self.engine.play(board, limit, game=game, info=info | chess.engine.INFO_SCORE)
+        if result.move is not None:
+            self.cache.put(board, settings, result.move, result.info)
+        return result
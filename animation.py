@@ -0,0 +1,107 @@
+#non-blocking animations of the pieces
+#an animation is a tween: a piece image that goes from one place to another (and can fade in or out) over a number of seconds
+#the tweens are advanced by the main loop of the game with the time that has passed, not by frames, so they take the
+#same time at any frame rate, the window keeps handling events while they run, and several of them can run at once
+#(e.g. the king and the rook when castling, or a captured piece fading out while the capturing piece moves in)
+
+import time
+
+
+#smoothstep easing, the piece speeds up at the start and slows down at the end
+def ease(x):
+    return x * x * (3 - 2 * x)
+
+
+#one animated piece
+class Tween:
+
+    #image is the surface drawn, start and end are its (x, y) screen positions, duration is in seconds
+    #alpha is the (start, end) opacity of the image, from 0 to 255, for fading in or out
+    #hide is a set of (row, col) squares whose piece on the board is not drawn while the tween runs,
+    #e.g. the square the moving piece comes from, so the piece is not drawn twice
+    #on_finish is called (with no arguments) when the tween is over
+    def __init__(self, image, start, end, duration, alpha=(255, 255), hide=(), on_finish=None):
+        #a fading tween changes the opacity of its image, so it gets its own copy and the shared piece image is not changed
+        self.image = image.copy() if alpha != (255, 255) else image
+        self.start = start
+        self.end = end
+        self.duration = max(duration, 0.001)
+        self.alpha = alpha
+        self.hide = set(hide)
+        self.on_finish = on_finish
+        #the time the tween started, set by the Animator when it is added
+        self.started = None
+
+    #how far along the tween is at the given time, from 0 to 1
+    def progress(self, now):
+        return min(1.0, max(0.0, (now - self.started) / self.duration))
+
+    def finished(self, now):
+        return now - self.started >= self.duration
+
+    #drawing the image where it is at the given time, returns the rect that was drawn
+    def draw(self, screen, now):
+        x = ease(self.progress(now))
+        position = (round(self.start[0] + (self.end[0] - self.start[0]) * x),
+                    round(self.start[1] + (self.end[1] - self.start[1]) * x))
+        if self.alpha != (255, 255):
+            self.image.set_alpha(round(self.alpha[0] + (self.alpha[1] - self.alpha[0]) * x))
+        return screen.blit(self.image, position)
+
+
+#the running tweens, advanced and drawn once per frame by the main loop
+class Animator:
+
+    def __init__(self):
+        self.tweens = []
+
+    #starting a tween now
+    def add(self, tween, now=None):
+        tween.started = time.perf_counter() if now is None else now
+        self.tweens.append(tween)
+        return tween
+
+    #true while there is a tween running
+    def busy(self):
+        return bool(self.tweens)
+
+    #stopping every tween, their on_finish is not called
+    def clear(self):
+        self.tweens = []
+
+    #the squares whose piece on the board should not be drawn, because a tween is drawing it
+    def hidden(self):
+        squares = set()
+        for tween in self.tweens:
+            squares |= tween.hide
+        return squares
+
+    #seconds until the next tween is over, None if there is no tween
+    def time_left(self, now=None):
+        if not self.tweens:
+            return None
+        now = time.perf_counter() if now is None else now
+        return max(0.0, min(tween.started + tween.duration for tween in self.tweens) - now)
+
+    #removing the tweens that are over and calling their on_finish
+    #this is done before the board is drawn, so the board already shows the result of a finished move
+    def step(self, now=None):
+        now = time.perf_counter() if now is None else now
+        done = [tween for tween in self.tweens if tween.finished(now)]
+        if done:
+            self.tweens = [tween for tween in self.tweens if not tween.finished(now)]
+            for tween in done:
+                if tween.on_finish is not None:
+                    tween.on_finish()
+
+    #drawing every running tween over the board, returns the rects that were drawn
+    #the squares under each drawn image are marked as changed in the renderer, so next frame they are drawn again
+    #and the image is wiped from where it was, that way only the old and new rects of a moving piece are redrawn
+    def draw(self, screen, renderer, now=None):
+        now = time.perf_counter() if now is None else now
+        rects = []
+        for tween in self.tweens:
+            rect = tween.draw(screen, now)
+            renderer.invalidate_rect(rect)
+            rects.append(rect)
+        return rects
@@ -0,0 +1,279 @@
+#annotating the games of a PGN archive with an engine, for nightly analysis of the games that were played
+#every position of every game is searched by a pool of engines, and the games are written out again with the evaluation
+#of every move ([%eval]), the mistakes marked with ?!, ? and ?? and the move the engine would have played instead
+#
+#the archive is read one game at a time, and only a window of games is in flight at any time, so memory stays bounded
+#however big the archive is. Nothing is ever written next to the archive, so it can be on a read-only disk. The positions
+#of the games in the window are searched in parallel, and the games are written in the order they were read. A position
+#that comes up again (the same opening in many games, or a repetition) is searched once: the answers are kept in memory
+#(and on disk with --cache), and a position that is still being searched is waited for instead of being searched again
+#
+#usage: python annotate.py games.pgn --engine path/to/stockfish --depth 14 --workers 8 > annotated.pgn
+#at the end it prints the positions per second and per second per core, to work out the hardware a nightly run needs
+
+import os
+import sys
+import time
+import argparse
+import io
+import collections
+import concurrent.futures
+import chess
+import chess.pgn
+import chess.engine
+import chess.polyglot
+from engine_pool import EnginePool
+from pgn_archive import read_index, READ_BUFFER
+from analysis_cache import AnalysisCache, settings_key, engine_name, MATE_SCORE
+
+#centipawns a move has to lose to be an inaccuracy (?!), a mistake (?) or a blunder (??)
+INACCURACY = 50
+MISTAKE = 100
+BLUNDER = 300
+#scores are capped at this many centipawns when the loss of a move is worked out, so going from mate in 3 to mate in 5,
+#or from +12 to +9 in a won position, is not counted as a mistake
+LOSS_CAP = 1000
+#seconds an engine searches a position when no limit is given
+DEFAULT_TIME = 0.1
+
+
+#the score of a side to move from a centipawn number of the cache, where mates are stored as MATE_SCORE minus the moves to mate
+def decode_score(score):
+    if abs(score) >= MATE_SCORE - 1000:
+        return chess.engine.Mate(MATE_SCORE - score if score > 0 else -(MATE_SCORE + score))
+    return chess.engine.Cp(score)
+
+
+#searching positions with a pool of engines, a position is searched once however many games it comes up in
+class PositionAnalyser:
+
+    #pool is an EnginePool, workers the number of positions searched at the same time (one per engine of the pool)
+    #cache is an optional AnalysisCache kept on disk, memory_size the number of answers kept in memory
+    def __init__(self, pool, limit, workers, cache=None, memory_size=100000):
+        self.pool = pool
+        self.limit = limit
+        #the engines of the pool are all the same, the name of one of them goes into the key of the cache
+        with pool.lease() as engine:
+            self.settings = settings_key({}, limit, engine_name(engine))
+        self.cache = cache
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='annotate')
+        #the searches that are running or waiting, by zobrist key of the position
+        self.pending = {}
+        #the answers of finished searches, by zobrist key, the ones used the longest time ago are dropped first
+        self.memory = collections.OrderedDict()
+        self.memory_size = memory_size
+        #how many positions were asked for, how many had to be searched, and how many were answered by the cache on disk
+        self.positions = 0
+        self.searched = 0
+        self.cache_hits = 0
+
+    #the answer for a position as a future of (best move, score, depth), the score in centipawns for the side to move
+    #this is only called from the main thread, the searches run on the worker threads
+    def submit(self, board):
+        self.positions += 1
+        key = chess.polyglot.zobrist_hash(board)
+        #a position with no moves has nothing to search, it is mate or stalemate
+        if not any(board.generate_legal_moves()):
+            return self._done((None, -MATE_SCORE if board.is_check() else 0, 0))
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self._done(self.memory[key])
+        future = self.pending.get(key)
+        if future is not None:
+            #the position is being searched for another game, the answer is shared
+            if not future.done():
+                return future
+            self._remember(key, future.result())
+            del self.pending[key]
+            return future
+        if self.cache is not None:
+            stored = self.cache.get(board, self.settings, key)
+            if stored is not None and stored['score'] is not None:
+                self.cache_hits += 1
+                answer = (stored['move'], stored['score'], stored['depth'])
+                self._remember(key, answer)
+                return self._done(answer)
+        self.searched += 1
+        future = self.executor.submit(self._search, board.copy(stack=False))
+        self.pending[key] = future
+        return future
+
+    #the searches that finished are moved to the memory, so the pending searches do not grow with the archive
+    def settle(self):
+        for key in [key for key, future in self.pending.items() if future.done()]:
+            future = self.pending.pop(key)
+            if future.exception() is None:
+                self._remember(key, future.result())
+
+    #a future that already has its answer
+    def _done(self, answer):
+        future = concurrent.futures.Future()
+        future.set_result(answer)
+        return future
+
+    #keeping an answer in memory, the oldest one is dropped when the memory is full
+    def _remember(self, key, answer):
+        self.memory[key] = answer
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    #searching one position on a worker thread with an engine leased from the pool
+    def _search(self, board):
+        with self.pool.lease() as engine:
+            result = engine.play(board, self.limit, info=chess.engine.INFO_SCORE)
+        score = result.info.get('score')
+        score = score.pov(board.turn).score(mate_score=MATE_SCORE) if score is not None else 0
+        if self.cache is not None and result.move is not None:
+            self.cache.put(board, self.settings, result.move, result.info)
+        return result.move, score, result.info.get('depth')
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+#the games of a PGN file from number start on (from 0), read one at a time, nothing is written next to the file
+#an index of the file that is already there takes the reading straight to the start game, or the last game it knows before it,
+#the games before that are skipped without being parsed, an index for a file that was made smaller since is not used
+def read_games(path, start=0):
+    offset, skip = 0, start
+    if start > 0:
+        offsets, indexed = read_index(path)
+        if offsets and indexed <= os.path.getsize(path):
+            known = min(start, len(offsets) - 1)
+            offset, skip = offsets[known], start - known
+    raw = open(path, 'rb', buffering=READ_BUFFER)
+    raw.seek(offset)
+    with io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace') as file:
+        for _ in range(skip):
+            if not chess.pgn.skip_game(file):
+                return
+        while True:
+            game = chess.pgn.read_game(file)
+            if game is None:
+                return
+            yield game
+
+
+#the boards of a game, before every move and after the last one
+def game_positions(game):
+    board = game.board()
+    boards = [board.copy(stack=False)]
+    for move in game.mainline_moves():
+        board.push(move)
+        boards.append(board.copy(stack=False))
+    return boards
+
+
+#writing the evaluations, the mistakes and the better moves into a game, answers are the (best move, score, depth)
+#of every position of the game (from game_positions), the scores in centipawns for the side to move
+def annotate_game(game, answers, thresholds=(INACCURACY, MISTAKE, BLUNDER)):
+    inaccuracy, mistake, blunder = thresholds
+    #the NAG of each kind of mistake, the worst one the loss reaches is given
+    nags = [(blunder, chess.pgn.NAG_BLUNDER), (mistake, chess.pgn.NAG_MISTAKE), (inaccuracy, chess.pgn.NAG_DUBIOUS_MOVE)]
+    board = game.board()
+    for node, (best, before, _), (_, after, depth) in zip(game.mainline(), answers, answers[1:]):
+        mover = board.turn
+        #the score after the move is for the other side, so the loss of the mover is the score before minus the negated one after
+        loss = max(-LOSS_CAP, min(LOSS_CAP, before)) - max(-LOSS_CAP, min(LOSS_CAP, -after))
+        node.set_eval(chess.engine.PovScore(decode_score(after), not mover), depth)
+        for threshold, nag in nags:
+            if loss >= threshold and best is not None and best != node.move:
+                node.nags.add(nag)
+                best_text = f'Best: {board.san(best)}'
+                node.comment = f'{node.comment} {best_text}'.strip() if node.comment else best_text
+                break
+        board.push(node.move)
+    return game
+
+
+#annotating the games of an archive and writing them to output in the order they were read
+#window is the most games in flight at the same time, it bounds the memory of the run, the answers are waited for in order
+#progress is an optional function called with every game that is written and its number of positions
+def annotate_archive(analyser, games, output, window, thresholds=(INACCURACY, MISTAKE, BLUNDER), progress=None):
+    in_flight = collections.deque()
+
+    def write_first():
+        game, futures = in_flight.popleft()
+        annotate_game(game, [future.result() for future in futures], thresholds)
+        output.write(game.accept(chess.pgn.StringExporter(headers=True, variations=True, comments=True)) + '\n\n')
+        if progress is not None:
+            progress(game, len(futures))
+
+    for game in games:
+        in_flight.append((game, [analyser.submit(board) for board in game_positions(game)]))
+        #the games at the front that are done are written straight away, and when the window is full the first one is waited for
+        while in_flight and (len(in_flight) >= window or all(future.done() for future in in_flight[0][1])):
+            write_first()
+        analyser.settle()
+    while in_flight:
+        write_first()
+
+
+#reading the command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Annotate the games of a PGN archive with an engine: evaluations, mistakes and better moves.')
+    parser.add_argument('archive', help='PGN file to annotate, it is read one game at a time')
+    parser.add_argument('--output', '-o', help='PGN file the annotated games are written to, stdout if not given')
+    parser.add_argument('--engine', required=True, help="path of the UCI engine (e.g. stockfish), or 'builtin' for the built-in python engine")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of engines searching at the same time, one per core')
+    parser.add_argument('--time', type=float, help='seconds per position')
+    parser.add_argument('--depth', type=int, help='search depth per position')
+    parser.add_argument('--nodes', type=int, help='nodes per position')
+    parser.add_argument('--hash', type=int, default=16, help='Hash option of the engines, in MB')
+    parser.add_argument('--start', type=int, default=0, help='number of the first game to annotate (from 0)')
+    parser.add_argument('--window', type=int, help='most games in flight at the same time, 4 per worker if not given')
+    parser.add_argument('--memory', type=int, default=100000, help='searched positions kept in memory to answer repeated ones')
+    parser.add_argument('--cache', help='sqlite file where the searched positions are kept between runs')
+    parser.add_argument('--cache-size', type=int, default=1000000, help='most positions kept in the cache file')
+    parser.add_argument('--inaccuracy', type=int, default=INACCURACY, help='centipawns lost for ?!')
+    parser.add_argument('--mistake', type=int, default=MISTAKE, help='centipawns lost for ?')
+    parser.add_argument('--blunder', type=int, default=BLUNDER, help='centipawns lost for ??')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.time is None and args.depth is None and args.nodes is None:
+        args.time = DEFAULT_TIME
+    limit = chess.engine.Limit(time=args.time, depth=args.depth, nodes=args.nodes)
+    window = args.window or 4 * args.workers
+
+    pool = EnginePool(args.engine, size=args.workers, options={'Threads': 1, 'Hash': args.hash})
+    cache = AnalysisCache(args.cache, args.cache_size) if args.cache else None
+    analyser = PositionAnalyser(pool, limit, args.workers, cache, args.memory)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    started = time.perf_counter()
+    games = [0]
+
+    #a line on stderr for every game that is written, with the throughput so far
+    def progress(game, positions):
+        games[0] += 1
+        elapsed = time.perf_counter() - started
+        print(f"[{args.start + games[0] - 1}] {game.headers.get('White', '?')} - {game.headers.get('Black', '?')}: {positions} positions, "
+              f'{analyser.positions / elapsed:.1f} positions/s', file=sys.stderr)
+
+    try:
+        annotate_archive(analyser, read_games(args.archive, args.start), output, window,
+                         (args.inaccuracy, args.mistake, args.blunder), progress)
+    finally:
+        analyser.close()
+        pool.close()
+        if cache is not None:
+            cache.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+
+    #the throughput, per core as every engine uses one thread
+    elapsed = time.perf_counter() - started
+    print(f'{games[0]} games, {analyser.positions} positions, {analyser.searched} searched, '
+          f'{analyser.positions - analyser.searched} answered without a search ({analyser.cache_hits} from the cache file), '
+          f'in {elapsed:.1f}s', file=sys.stderr)
+    print(f'{analyser.positions / elapsed:.1f} positions/s, {analyser.positions / elapsed / args.workers:.1f} positions/s per core '
+          f'({analyser.searched / elapsed / args.workers:.1f} searched/s per core) with {args.workers} workers', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
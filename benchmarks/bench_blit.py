@@ -0,0 +1,76 @@
+#benchmark for drawing the pieces
+#compares the images the game used before (loaded and scaled on every launch, never converted to the screen format)
+#with the sprite atlas (converted with convert_alpha, one subsurface per piece, cached on disk by tile size)
+#it measures blits per second of the pieces of the starting position, and the time to load the images
+#run it from the root of the repository: python benchmarks/bench_blit.py
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#no window is needed, the blits go to a screen surface of the dummy video driver
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+import sprite_atlas
+from chess_rules import ChessRules
+
+#the tile size of the game
+TILE_SIZE = 75
+
+#how long each method is timed for, in seconds
+DURATION = 1.0
+
+
+#the images the way load_images made them before the atlas
+def load_plain_images(tile_size):
+    images = {}
+    for piece, filename in sprite_atlas.PIECE_FILES.items():
+        image = pygame.image.load(os.path.join('images', filename))
+        images[piece] = pygame.transform.scale(image, (tile_size, tile_size))
+    return images
+
+#blitting the pieces of the board over and over for DURATION seconds, returns blits per second
+def measure(screen, images, position):
+    pieces = [(images[position.piece(row, col)], (col * TILE_SIZE, row * TILE_SIZE)) for row in range(8) for col in range(8) if position.piece(row, col)]
+    blits = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < DURATION:
+        for image, position in pieces:
+            screen.blit(image, position)
+        blits += len(pieces)
+    return blits / (time.perf_counter() - started)
+
+#time in milliseconds to run load()
+def load_time(load):
+    started = time.perf_counter()
+    load()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    pygame.display.init()
+    screen = pygame.display.set_mode((8 * TILE_SIZE, 8 * TILE_SIZE))
+    position = ChessRules().position
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        plain_ms = load_time(lambda: load_plain_images(TILE_SIZE))
+        cold_ms = load_time(lambda: sprite_atlas.SpriteAtlas(TILE_SIZE, cache_folder=cache_folder))
+        cached_ms = load_time(lambda: sprite_atlas.SpriteAtlas(TILE_SIZE, cache_folder=cache_folder))
+        atlas = sprite_atlas.SpriteAtlas(TILE_SIZE, cache_folder=cache_folder)
+
+    old_rate = measure(screen, load_plain_images(TILE_SIZE), position)
+    new_rate = measure(screen, atlas.sprites, position)
+    print(f"load, scaled every launch:  {plain_ms:10.1f} ms")
+    print(f"load, atlas (no cache):     {cold_ms:10.1f} ms")
+    print(f"load, atlas (cached):       {cached_ms:10.1f} ms")
+    print(f"blit, unconverted images:   {old_rate:10,.0f} blits/s")
+    print(f"blit, atlas convert_alpha:  {new_rate:10,.0f} blits/s")
+    print(f"speedup:                    {new_rate / old_rate:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#benchmark for the built-in engine (builtin_engine.py)
+#searches a few positions to a fixed depth and prints the nodes, the time and the nodes per second of each search,
+#then the depth each skill level reaches in the start position with its own time limit
+#run it from the root of the repository: python benchmarks/bench_engine.py [depth]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chess
+import chess.engine
+import builtin_engine
+
+#positions to benchmark: the start, an open middlegame, a tactical position and an endgame
+POSITIONS = [
+    ('start', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'),
+    ('italian', 'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4'),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'),
+    ('endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'),
+]
+
+#depth of the fixed depth searches, if none is given on the command line
+DEPTH = 4
+
+#the skill levels shown in the second table
+SKILLS = [0, 5, 10, 15, 20]
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else DEPTH
+    total_nodes = 0
+    total_seconds = 0.0
+    print(f"{'position':<10} {'depth':>5} {'nodes':>10} {'seconds':>8} {'nps':>10}  move")
+    for name, fen in POSITIONS:
+        #the search is run directly with no deadline, so the time limit of the skill level does not cut it short
+        #and with a new transposition table for every position, so one search does not help the next
+        started = time.perf_counter()
+        move, info = builtin_engine.Search(chess.Board(fen), {}, depth).run()
+        seconds = time.perf_counter() - started
+        nodes = info['nodes']
+        total_nodes += nodes
+        total_seconds += seconds
+        print(f"{name:<10} {info['depth']:>5} {nodes:>10,} {seconds:>8.2f} {nodes / seconds:>10,.0f}  {move}")
+    print(f"{'total':<10} {'':>5} {total_nodes:>10,} {total_seconds:>8.2f} {total_nodes / total_seconds:>10,.0f}")
+
+    print()
+    print(f"{'skill':>5} {'max depth':>9} {'time':>6} {'reached':>7} {'nodes':>8}")
+    for skill in SKILLS:
+        engine = builtin_engine.BuiltinEngine()
+        engine.configure({'Skill Level': skill})
+        max_depth, seconds = builtin_engine.skill_limits(skill)
+        #the limit is the skill level's own time, the same as the game gives it with no other limit
+        result = engine.play(chess.Board(), chess.engine.Limit(time=seconds))
+        print(f"{skill:>5} {max_depth:>9} {seconds:>6.2f} {result.info['depth']:>7} {result.info['nodes']:>8,}")
+
+
+if __name__ == '__main__':
+    main()
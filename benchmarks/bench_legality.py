@@ -0,0 +1,75 @@
+#benchmark for the legality check in get_valid_moves
+#compares the old way (copy the board, build a FEN string, parse it into a chess.Board and call is_check)
+#with the make/unmake check on the bitboards
+#run it from the root of the repository: python benchmarks/bench_legality.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chess
+import bitboard
+from chess_rules import ChessRules
+
+#positions to benchmark, the last one has a queen in the middle of the board
+POSITIONS = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1',
+    'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w - - 0 1',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w - - 0 1',
+    '4k3/8/8/8/3Q4/8/8/4K3 w - - 0 1',
+]
+
+#how long each method is timed for, in seconds
+DURATION = 1.0
+
+
+#the legality check get_valid_moves used before the bitboards, one board copy and one chess.Board per candidate move
+#the copy is a copy of the position now, the move is made on it the way it was made on the copied board
+def fen_roundtrip_is_legal(game, start, end):
+    position_copy = game.position.copy()
+    start_square, end_square = bitboard.square_of(*start), bitboard.square_of(*end)
+    position_copy.squares[end_square] = position_copy.squares[start_square]
+    position_copy.squares[start_square] = 0
+    return not chess.Board(position_copy.fen()).is_check()
+
+#the legality check get_valid_moves uses now
+def bitboard_is_legal(game, start, end):
+    return game.bitboards.is_legal(bitboard.square_of(*start), bitboard.square_of(*end))
+
+#running the check over every candidate move of every position for DURATION seconds, returns checks per second
+def measure(check, cases):
+    checks = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < DURATION:
+        for game, start, end in cases:
+            check(game, start, end)
+        checks += len(cases)
+    return checks / (time.perf_counter() - started)
+
+
+def main():
+    #collecting every pseudo-legal move of the side to move in every position
+    cases = []
+    for fen in POSITIONS:
+        #only the rules of the game are needed, so the engine and the window are not started
+        game = ChessRules()
+        game.load_fen(fen)
+        for start_square, end_square in game.bitboards.generate_moves(bitboard.COLOR_INDEX[game.turn]):
+            cases.append((game, bitboard.row_col(start_square), bitboard.row_col(end_square)))
+
+    #both methods must agree before their speed is compared
+    for game, start, end in cases:
+        assert fen_roundtrip_is_legal(game, start, end) == bitboard_is_legal(game, start, end), (start, end)
+
+    old_rate = measure(fen_roundtrip_is_legal, cases)
+    new_rate = measure(bitboard_is_legal, cases)
+    print(f"candidate moves:        {len(cases)}")
+    print(f"FEN + chess.Board:      {old_rate:12,.0f} checks/s")
+    print(f"bitboard make/unmake:   {new_rate:12,.0f} checks/s")
+    print(f"speedup:                {new_rate / old_rate:12.1f}x")
+
+
+if __name__ == '__main__':
+    main()
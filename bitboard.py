@@ -0,0 +1,468 @@
+#bitboard based move generation for the chess game
+#every piece type of every side is stored as one 64 bit integer, where bit n is set if that piece stands on square n
+#this lets us find all the moves of a piece with a few AND/OR operations instead of walking the board square by square
+
+#SQUARE NUMBERING:
+#the squares are numbered the same way python-chess numbers them, a1 = 0, b1 = 1, ... h1 = 7, a2 = 8, ... h8 = 63
+#the game itself uses (row, col) where row 0 is the top of the screen (rank 8), so square_of and row_col convert between the two
+
+import chess.polyglot
+
+
+#all 64 bits set, used to cut off anything that is shifted past the board
+FULL_BOARD = (1 << 64) - 1
+
+#piece letters in the order of their index in Bitboards.pieces
+#uppercase is white, lowercase is black, the same letters FEN and the piece images use (see also position.PIECE_CODES)
+PIECE_LETTERS = 'PNBRQKpnbrqk'
+#dictionary to go from the letter of a piece to its index
+PIECE_INDEX = {letter: index for index, letter in enumerate(PIECE_LETTERS)}
+
+#index of each side in Bitboards.occupied_by
+WHITE, BLACK = 0, 1
+#the game stores the turn as 'w' or 'b', this maps it to the side index
+COLOR_INDEX = {'w': WHITE, 'b': BLACK}
+
+#directions are (row offset, col offset), same as the ones passed to get_linear_moves in chess_game.py
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+#castling, one entry per castling right letter (the same letters FEN uses)
+#(king from, king to, rook from, rook to, squares that must be empty, squares the king must not be attacked on)
+CASTLING = {
+    'K': (4, 6, 7, 5, (5, 6), (4, 5, 6)),
+    'Q': (4, 2, 0, 3, (1, 2, 3), (4, 3, 2)),
+    'k': (60, 62, 63, 61, (61, 62), (60, 61, 62)),
+    'q': (60, 58, 56, 59, (57, 58, 59), (60, 59, 58)),
+}
+
+#the squares that lose a castling right when a piece moves from or to them (the king and the rook of that right)
+CASTLING_SQUARES = {right: (entry[0], entry[2]) for right, entry in CASTLING.items()}
+
+#the pieces a pawn can be promoted to, as lowercase letters
+PROMOTION_PIECES = 'qrbn'
+
+#ZOBRIST KEYS:
+#the key of a position is the XOR of one random 64 bit number for every feature of it: each piece on its square,
+#each castling right, the file of the en passant square and the side to move
+#a move only changes a few features, so the key is kept up to date with a few XORs instead of being worked out from the whole board
+#the random numbers are the ones of the polyglot book format, so the key is the same number chess.polyglot.zobrist_hash gives
+#and the opening book and the analysis cache can be looked up with it directly
+ZOBRIST_RANDOM = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+#one number per piece and square, in the order of PIECE_LETTERS
+#polyglot orders the pieces black pawn, white pawn, black knight, white knight, ... which is where the index comes from
+ZOBRIST_PIECES = [[ZOBRIST_RANDOM[64 * (index % 6 * 2 + (index < 6)) + square] for square in range(64)] for index in range(12)]
+ZOBRIST_CASTLING = {'K': ZOBRIST_RANDOM[768], 'Q': ZOBRIST_RANDOM[769], 'k': ZOBRIST_RANDOM[770], 'q': ZOBRIST_RANDOM[771]}
+#one number per file of the en passant square
+ZOBRIST_EP = ZOBRIST_RANDOM[772:780]
+#XORed in when white is to move
+ZOBRIST_TURN = ZOBRIST_RANDOM[780]
+
+
+#converting the (row, col) of the game into a square number
+def square_of(row, col):
+    return (7 - row) * 8 + col
+
+#converting a square number back into the (row, col) of the game
+def row_col(square):
+    return 7 - (square >> 3), square & 7
+
+#yielding the square number of every set bit in a bitboard, lowest square first
+def iter_squares(bb):
+    while bb:
+        #bb & -bb keeps only the lowest set bit
+        low = bb & -bb
+        yield low.bit_length() - 1
+        #removing the lowest bit and moving on to the next one
+        bb ^= low
+
+#converting a bitboard into the list of (row, col) tuples the game works with
+def to_cells(bb):
+    return [row_col(square) for square in iter_squares(bb)]
+
+#the part of the zobrist key that comes from the castling rights ('KQkq', '' if none)
+def castling_key(castling):
+    key = 0
+    for right in castling:
+        key ^= ZOBRIST_CASTLING[right]
+    return key
+
+
+#building a table with the squares reachable with one step of each offset, for every square
+#this is used for the knight and the king, which jump a fixed distance
+def _step_table(offsets):
+    table = []
+    for square in range(64):
+        row, col = row_col(square)
+        bb = 0
+        for x, y in offsets:
+            r, c = row + x, col + y
+            if 0 <= r < 8 and 0 <= c < 8:
+                bb |= 1 << square_of(r, c)
+        table.append(bb)
+    return table
+
+#building the rays of a direction, the ray of a square holds every square from it to the edge of the board (not including itself)
+def _ray_table(direction):
+    x, y = direction
+    table = []
+    for square in range(64):
+        row, col = row_col(square)
+        bb = 0
+        r, c = row + x, col + y
+        while 0 <= r < 8 and 0 <= c < 8:
+            bb |= 1 << square_of(r, c)
+            r += x
+            c += y
+        table.append(bb)
+    return table
+
+#precomputed attack tables, built once when the module is imported
+KNIGHT_ATTACKS = _step_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _step_table(KING_OFFSETS)
+#pawns capture diagonally forward, white goes up the screen (row - 1), black goes down (row + 1)
+PAWN_ATTACKS = [_step_table([(-1, -1), (-1, 1)]), _step_table([(1, -1), (1, 1)])]
+#one ray table for every direction, keyed by the direction tuple
+RAYS = {direction: _ray_table(direction) for direction in QUEEN_DIRECTIONS}
+#a direction with a negative row offset goes up the screen, which means towards HIGHER square numbers
+#for these the closest blocker is the lowest set bit of the ray, for the others it is the highest set bit
+_TOWARDS_HIGHER = {direction: direction[0] < 0 or (direction[0] == 0 and direction[1] > 0) for direction in QUEEN_DIRECTIONS}
+
+
+#calculating the squares attacked by a sliding piece (rook, bishop, queen) along the given directions
+#the ray stops at the first occupied square, which is included so that captures are possible
+def slider_attacks(square, occupied, directions):
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            #finding the closest blocker along the ray
+            if _TOWARDS_HIGHER[direction]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            #everything past the blocker is cut off by removing the ray that starts at the blocker
+            ray ^= RAYS[direction][blocker]
+        attacks |= ray
+    return attacks
+
+
+#class holding the bitboards of a position
+class Bitboards:
+    __slots__ = ('pieces', 'occupied_by', 'occupied', 'castling', 'ep_square', 'key')
+
+    def __init__(self):
+        #one bitboard per piece letter, in the order of PIECE_LETTERS
+        self.pieces = [0] * 12
+        #all the white pieces and all the black pieces
+        self.occupied_by = [0, 0]
+        #every piece on the board
+        self.occupied = 0
+        #castling rights still available, as FEN letters ('KQkq', '' if none)
+        self.castling = ''
+        #square a pawn can capture en passant on, None if the last move was not a double pawn step
+        self.ep_square = None
+        #zobrist key of the position, kept up to date by make_move and push_move (see ZOBRIST KEYS above)
+        self.key = 0
+
+    #building the bitboards from a position.Position, whose squares hold piece codes (code - 1 is the index in PIECE_LETTERS)
+    @classmethod
+    def from_position(cls, position):
+        bitboards = cls()
+        bitboards.castling = position.castling
+        bitboards.ep_square = position.ep_square
+        pieces = bitboards.pieces
+        for square, code in enumerate(position.squares):
+            if code:
+                pieces[code - 1] |= 1 << square
+        bitboards.occupied_by[WHITE] = pieces[0] | pieces[1] | pieces[2] | pieces[3] | pieces[4] | pieces[5]
+        bitboards.occupied_by[BLACK] = pieces[6] | pieces[7] | pieces[8] | pieces[9] | pieces[10] | pieces[11]
+        bitboards.occupied = bitboards.occupied_by[WHITE] | bitboards.occupied_by[BLACK]
+        bitboards.key = bitboards.compute_key(position.turn)
+        return bitboards
+
+    #working out the zobrist key from the whole position, color is the side to move
+    #this is only needed when bitboards are built, after that make_move and push_move keep self.key up to date
+    def compute_key(self, color):
+        key = castling_key(self.castling) ^ self.ep_key(color)
+        if color == WHITE:
+            key ^= ZOBRIST_TURN
+        for index, bb in enumerate(self.pieces):
+            for square in iter_squares(bb):
+                key ^= ZOBRIST_PIECES[index][square]
+        return key
+
+    #the part of the zobrist key that comes from the en passant square, color is the side to move
+    #like polyglot, the file is only part of the key if a pawn of the side to move stands next to the square to capture on it
+    def ep_key(self, color):
+        if self.ep_square is not None and PAWN_ATTACKS[color ^ 1][self.ep_square] & self.pieces[0 if color == WHITE else 6]:
+            return ZOBRIST_EP[self.ep_square & 7]
+        return 0
+
+    #finding the piece letter on a square, or '' if it is empty
+    def piece_at(self, square):
+        bit = 1 << square
+        if not self.occupied & bit:
+            return ''
+        for index, bb in enumerate(self.pieces):
+            if bb & bit:
+                return PIECE_LETTERS[index]
+        return ''
+
+    #squares attacked by the given piece standing on the given square, own pieces are not removed here
+    def attacks(self, square, piece):
+        kind = piece.upper()
+        if kind == 'N':
+            return KNIGHT_ATTACKS[square]
+        if kind == 'K':
+            return KING_ATTACKS[square]
+        if kind == 'P':
+            return PAWN_ATTACKS[WHITE if piece.isupper() else BLACK][square]
+        if kind == 'R':
+            return slider_attacks(square, self.occupied, ROOK_DIRECTIONS)
+        if kind == 'B':
+            return slider_attacks(square, self.occupied, BISHOP_DIRECTIONS)
+        return slider_attacks(square, self.occupied, QUEEN_DIRECTIONS)
+
+    #squares a pawn can move to, forward pushes onto empty squares and diagonal captures of enemy pieces
+    def pawn_targets(self, square, color):
+        row, col = row_col(square)
+        empty = ~self.occupied & FULL_BOARD
+        if color == WHITE:
+            #white moves up the screen, which is +8 in square numbers
+            single = (1 << (square + 8)) & empty if row > 0 else 0
+            double = (single << 8) & empty if row == 6 and single else 0
+        else:
+            #black moves down the screen, which is -8 in square numbers
+            single = (1 << (square - 8)) & empty if row < 7 else 0
+            double = (single >> 8) & empty if row == 1 and single else 0
+        captures = PAWN_ATTACKS[color][square] & self.occupied_by[color ^ 1]
+        #capturing en passant, onto the empty square the enemy pawn skipped over
+        if self.ep_square is not None:
+            captures |= PAWN_ATTACKS[color][square] & (1 << self.ep_square)
+        return single | double | captures
+
+    #squares the king of a side can castle to
+    #the squares between king and rook must be empty, and the king cannot castle out of, through or into check
+    def castling_targets(self, color):
+        targets = 0
+        king = self.pieces[5 if color == WHITE else 11]
+        rooks = self.pieces[3 if color == WHITE else 9]
+        for right in self.castling:
+            if (right.isupper()) != (color == WHITE):
+                continue
+            king_from, king_to, rook_from, rook_to, empty, safe = CASTLING[right]
+            if not king & (1 << king_from) or not rooks & (1 << rook_from):
+                continue
+            if any(self.occupied & (1 << square) for square in empty):
+                continue
+            if any(self.is_attacked(square, color ^ 1) for square in safe):
+                continue
+            targets |= 1 << king_to
+        return targets
+
+    #pseudo-legal targets of the piece on the square, i.e. every square it can go to without caring about checks
+    def targets(self, square):
+        piece = self.piece_at(square)
+        if not piece:
+            return 0
+        color = WHITE if piece.isupper() else BLACK
+        if piece.upper() == 'P':
+            return self.pawn_targets(square, color)
+        #a piece can go anywhere it attacks, except onto its own pieces
+        targets = self.attacks(square, piece) & ~self.occupied_by[color]
+        if piece.upper() == 'K' and self.castling:
+            targets |= self.castling_targets(color)
+        return targets
+
+    #square of the king of a side, or None if it is missing
+    def king_square(self, color):
+        king = self.pieces[5 if color == WHITE else 11]
+        if not king:
+            return None
+        return king.bit_length() - 1
+
+    #checking if a square is attacked by any piece of the given side
+    #instead of looking at every enemy piece, we look from the square outwards with each piece's attack pattern
+    #if a knight pattern from the square hits an enemy knight, that knight attacks the square, and so on for the others
+    def is_attacked(self, square, by_color):
+        offset = 0 if by_color == WHITE else 6
+        pieces = self.pieces
+        if KNIGHT_ATTACKS[square] & pieces[offset + 1]:
+            return True
+        if KING_ATTACKS[square] & pieces[offset + 5]:
+            return True
+        #a white pawn attacks the square if it stands where a black pawn on the square would capture, and the other way round
+        if PAWN_ATTACKS[by_color ^ 1][square] & pieces[offset]:
+            return True
+        queens = pieces[offset + 4]
+        rooks = pieces[offset + 3] | queens
+        if rooks and slider_attacks(square, self.occupied, ROOK_DIRECTIONS) & rooks:
+            return True
+        bishops = pieces[offset + 2] | queens
+        if bishops and slider_attacks(square, self.occupied, BISHOP_DIRECTIONS) & bishops:
+            return True
+        return False
+
+    #checking if the king of a side is attacked
+    def in_check(self, color):
+        king = self.king_square(color)
+        return king is not None and self.is_attacked(king, color ^ 1)
+
+    #moving a piece from one square to another on the bitboards, nothing is captured here
+    def _shift(self, index, from_sq, to_sq):
+        bits = (1 << from_sq) | (1 << to_sq)
+        self.pieces[index] ^= bits
+        self.occupied_by[WHITE if index < 6 else BLACK] ^= bits
+        self.key ^= ZOBRIST_PIECES[index][from_sq] ^ ZOBRIST_PIECES[index][to_sq]
+
+    #adding or removing a piece on a square of the bitboards
+    def _toggle(self, index, square):
+        bit = 1 << square
+        self.pieces[index] ^= bit
+        self.occupied_by[WHITE if index < 6 else BLACK] ^= bit
+        self.key ^= ZOBRIST_PIECES[index][square]
+
+    #making a move on the bitboards in place, returns what is needed to take it back with unmake_move
+    #en passant captures and castling (the rook moves along with the king) are handled here as well
+    #the key follows the pieces that move and are captured, and the side to move changes
+    def make_move(self, from_sq, to_sq):
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        pieces = self.pieces
+        moving = captured = -1
+        for index in range(12):
+            if pieces[index] & from_bit:
+                moving = index
+            elif pieces[index] & to_bit:
+                captured = index
+        captured_sq = to_sq
+        rook = None
+        kind = moving % 6
+        #a pawn moving diagonally onto the en passant square captures the pawn next to it
+        if kind == 0 and captured < 0 and to_sq == self.ep_square and (from_sq - to_sq) % 8:
+            captured_sq = to_sq - 8 if moving < 6 else to_sq + 8
+            captured = 6 if moving < 6 else 0
+        #a king moving two squares is castling, so the rook has to move too
+        elif kind == 5 and abs(from_sq - to_sq) == 2:
+            for king_from, king_to, rook_from, rook_to, empty, safe in CASTLING.values():
+                if king_from == from_sq and king_to == to_sq:
+                    rook = (moving - 2, rook_from, rook_to)
+                    self._shift(*rook)
+        #removing the captured piece first, then moving our piece from the start square to the end square
+        if captured >= 0:
+            self._toggle(captured, captured_sq)
+        self._shift(moving, from_sq, to_sq)
+        self.occupied = self.occupied_by[WHITE] | self.occupied_by[BLACK]
+        self.key ^= ZOBRIST_TURN
+        return moving, captured, captured_sq, rook
+
+    #taking back a move made with make_move, undo is the tuple make_move returned
+    def unmake_move(self, from_sq, to_sq, undo):
+        moving, captured, captured_sq, rook = undo
+        self._shift(moving, from_sq, to_sq)
+        if captured >= 0:
+            self._toggle(captured, captured_sq)
+        if rook is not None:
+            self._shift(*rook)
+        self.occupied = self.occupied_by[WHITE] | self.occupied_by[BLACK]
+        self.key ^= ZOBRIST_TURN
+
+    #a move is legal if the king of the side that moved is not attacked once the move is made
+    #the move is made in place and taken back straight away, no copy of the board is needed
+    def is_legal(self, from_sq, to_sq):
+        undo = self.make_move(from_sq, to_sq)
+        color = WHITE if undo[0] < 6 else BLACK
+        legal = not self.in_check(color)
+        self.unmake_move(from_sq, to_sq, undo)
+        return legal
+
+    #every legal move of a side, as (from square, to square) tuples
+    def legal_moves(self, color):
+        return [move for move in self.generate_moves(color) if self.is_legal(*move)]
+
+    #every legal move of a side with the piece of each promotion, as (from square, to square, promotion) tuples
+    #promotion is None for a normal move, and a pawn reaching the last rank gives one move for each of 'qrbn'
+    def legal_moves_with_promotions(self, color):
+        pawns = self.pieces[0 if color == WHITE else 6]
+        moves = []
+        for from_sq, to_sq in self.legal_moves(color):
+            if pawns & (1 << from_sq) and (to_sq >> 3) in (0, 7):
+                moves.extend((from_sq, to_sq, piece) for piece in PROMOTION_PIECES)
+            else:
+                moves.append((from_sq, to_sq, None))
+        return moves
+
+    #making a full move in place, with everything make_move leaves out:
+    #promotion (the lowercase letter of the new piece, or None), the castling rights and the en passant square
+    #returns what is needed to take it back with pop_move
+    #this is how ChessRules.apply_move, the searches and perft make their moves
+    def push_move(self, from_sq, to_sq, promotion=None):
+        state = (self.castling, self.ep_square, self.key)
+        color = WHITE if self.occupied_by[WHITE] & (1 << from_sq) else BLACK
+        #taking the old en passant square out of the key while the pawns next to it are still where they were
+        self.key ^= self.ep_key(color)
+        undo = self.make_move(from_sq, to_sq)
+        moving = undo[0]
+        #the pawn that reached the last rank is swapped for the new piece, the square stays occupied so occupied does not change
+        if promotion is not None:
+            self._toggle(moving, to_sq)
+            #the index of the new piece is the index of its uppercase letter, plus 6 for black
+            self._toggle(PIECE_INDEX[promotion.upper()] + moving - moving % 6, to_sq)
+        #moving the king or a rook, or capturing a rook on its starting square, loses those castling rights
+        if self.castling:
+            castling = ''.join(right for right in self.castling
+                               if from_sq not in CASTLING_SQUARES[right] and to_sq not in CASTLING_SQUARES[right])
+            if castling != self.castling:
+                self.key ^= castling_key(self.castling) ^ castling_key(castling)
+                self.castling = castling
+        #a pawn that moves two squares can be captured en passant on the square it skipped
+        if moving % 6 == 0 and abs(to_sq - from_sq) == 16:
+            self.ep_square = (from_sq + to_sq) // 2
+            self.key ^= self.ep_key(color ^ 1)
+        else:
+            self.ep_square = None
+        return undo, promotion, state
+
+    #taking back a move made with push_move, undo is the tuple push_move returned
+    def pop_move(self, from_sq, to_sq, undo):
+        undo, promotion, state = undo
+        moving = undo[0]
+        if promotion is not None:
+            self._toggle(PIECE_INDEX[promotion.upper()] + moving - moving % 6, to_sq)
+            self._toggle(moving, to_sq)
+        self.unmake_move(from_sq, to_sq, undo)
+        self.castling, self.ep_square, self.key = state
+
+    #every pseudo-legal move of a side, as (from square, to square) tuples
+    def generate_moves(self, color):
+        moves = []
+        for square in iter_squares(self.occupied_by[color]):
+            for target in iter_squares(self.targets(square)):
+                moves.append((square, target))
+        return moves
+
+
+#everything the game needs to know about the position of the side to move, worked out once after every move
+#clicks, highlighting and game over detection all read from this instead of generating moves again
+class PositionState:
+    __slots__ = ('moves', 'in_check', 'is_checkmate', 'is_stalemate')
+
+    def __init__(self, bitboards, color):
+        #legal moves grouped by the square they start from, both as (row, col) so the game can use them directly
+        self.moves = {}
+        for from_sq, to_sq in bitboards.legal_moves(color):
+            self.moves.setdefault(row_col(from_sq), []).append(row_col(to_sq))
+        #whether the king of the side to move is attacked
+        self.in_check = bitboards.in_check(color)
+        #no legal moves means the game is over, checkmate if the king is attacked and stalemate otherwise
+        self.is_checkmate = self.in_check and not self.moves
+        self.is_stalemate = not self.in_check and not self.moves
+
+    #legal moves of the piece on (row, col), an empty list if it has none or it is not its turn
+    def moves_from(self, row, col):
+        return self.moves.get((row, col), [])
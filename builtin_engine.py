@@ -0,0 +1,606 @@
+#a small chess engine written in python, used when no UCI engine (stockfish) is installed
+#it searches with the game's own bitboards: iterative deepening alpha-beta with a transposition table,
+#captures ordered by MVV-LVA (most valuable victim, least valuable attacker), killer moves, and a quiescence search
+#of the captures at the end of every line so it does not stop in the middle of an exchange
+#
+#it has the parts of python-chess's SimpleEngine the game and the tools use (play, analysis, configure, options, ping, quit),
+#so AsyncEngine, CachedEngine, BookEngine and EnginePool work with it the same way they work with stockfish
+#
+#it is much weaker and slower than stockfish, but it needs no engine process and works on every machine
+
+import time
+import queue
+import threading
+import chess
+import chess.engine
+import chess.polyglot
+import bitboard
+
+#the command name that selects the built-in engine, e.g. python selfplay.py --engine builtin
+BUILTIN = 'builtin'
+
+#values of the pieces in centipawns, in the order of bitboard.PIECE_LETTERS (P, N, B, R, Q, K)
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]
+
+#piece-square tables, bonuses in centipawns for a white piece on each square, written the way the board looks (rank 8 first)
+#black uses the same tables mirrored, these are the well known tables of the "simplified evaluation function"
+PIECE_SQUARE_TABLES = [
+    #pawn
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     50, 50, 50, 50, 50, 50, 50, 50,
+     10, 10, 20, 30, 30, 20, 10, 10,
+     5, 5, 10, 25, 25, 10, 5, 5,
+     0, 0, 0, 20, 20, 0, 0, 0,
+     5, -5, -10, 0, 0, -10, -5, 5,
+     5, 10, 10, -20, -20, 10, 10, 5,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    #knight
+    [-50, -40, -30, -30, -30, -30, -40, -50,
+     -40, -20, 0, 0, 0, 0, -20, -40,
+     -30, 0, 10, 15, 15, 10, 0, -30,
+     -30, 5, 15, 20, 20, 15, 5, -30,
+     -30, 0, 15, 20, 20, 15, 0, -30,
+     -30, 5, 10, 15, 15, 10, 5, -30,
+     -40, -20, 0, 5, 5, 0, -20, -40,
+     -50, -40, -30, -30, -30, -30, -40, -50],
+    #bishop
+    [-20, -10, -10, -10, -10, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 10, 10, 5, 0, -10,
+     -10, 5, 5, 10, 10, 5, 5, -10,
+     -10, 0, 10, 10, 10, 10, 0, -10,
+     -10, 10, 10, 10, 10, 10, 10, -10,
+     -10, 5, 0, 0, 0, 0, 5, -10,
+     -20, -10, -10, -10, -10, -10, -10, -20],
+    #rook
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     5, 10, 10, 10, 10, 10, 10, 5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     0, 0, 0, 5, 5, 0, 0, 0],
+    #queen
+    [-20, -10, -10, -5, -5, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 5, 5, 5, 0, -10,
+     -5, 0, 5, 5, 5, 5, 0, -5,
+     0, 0, 5, 5, 5, 5, 0, -5,
+     -10, 5, 5, 5, 5, 5, 0, -10,
+     -10, 0, 5, 0, 0, 0, 0, -10,
+     -20, -10, -10, -5, -5, -10, -10, -20],
+    #king
+    [-30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -20, -30, -30, -40, -40, -30, -30, -20,
+     -10, -20, -20, -20, -20, -20, -20, -10,
+     20, 20, 0, 0, 0, 0, 20, 20,
+     20, 30, 10, 0, 0, 10, 30, 20],
+]
+
+#the score of every piece index on every square number, from white's point of view (value + table, negative for black)
+#the tables are written rank 8 first, which is the (row, col) order of the game, so row_col finds the entry of a square
+SQUARE_SCORES = [[0] * 64 for _ in range(12)]
+for _kind in range(6):
+    for _square in range(64):
+        _row, _col = bitboard.row_col(_square)
+        SQUARE_SCORES[_kind][_square] = PIECE_VALUES[_kind] + PIECE_SQUARE_TABLES[_kind][_row * 8 + _col]
+        #a black piece on a square scores like a white piece on the square mirrored top to bottom (square ^ 56)
+        SQUARE_SCORES[_kind + 6][_square ^ 56] = -SQUARE_SCORES[_kind][_square]
+
+#a checkmate is scored as MATE_SCORE minus the number of plies to it, so shorter mates score higher
+MATE_SCORE = 100000
+#scores above this are mates
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+#the deepest the search goes, also the limit of a search with no depth (e.g. pondering)
+MAX_DEPTH = 64
+
+#kinds of transposition table entries: the exact score, a lower bound (the search failed high) or an upper bound (failed low)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+#how often (in nodes) the search looks at the clock and the stop flag
+CHECK_EVERY = 1024
+
+
+#the depth and the seconds the engine searches at each skill level, 0 is the weakest and 20 the strongest
+#it goes from depth 1 in 0.05 seconds at skill 0 to depth 7 in 1.05 seconds at skill 20
+def skill_limits(skill):
+    skill = max(0, min(20, skill))
+    return 1 + skill * 6 // 20, 0.05 + 0.05 * skill
+
+#building the game's bitboards from a python-chess board, both number the squares the same way (a1 = 0)
+def bitboards_of(board):
+    bitboards = bitboard.Bitboards()
+    for index, letter in enumerate(bitboard.PIECE_LETTERS):
+        piece = chess.Piece.from_symbol(letter)
+        bitboards.pieces[index] = board.pieces_mask(piece.piece_type, piece.color)
+    bitboards.occupied_by[bitboard.WHITE] = board.occupied_co[chess.WHITE]
+    bitboards.occupied_by[bitboard.BLACK] = board.occupied_co[chess.BLACK]
+    bitboards.occupied = board.occupied
+    bitboards.castling = board.castling_xfen().replace('-', '')
+    bitboards.ep_square = board.ep_square
+    bitboards.key = bitboards.compute_key(bitboard.WHITE if board.turn == chess.WHITE else bitboard.BLACK)
+    return bitboards
+
+#the zobrist keys of the positions of the game that the search could still come back to
+#a pawn move or a capture can never be taken back, so only the positions since the last one (the halfmove clock) are needed
+def game_history(board):
+    board = board.copy()
+    keys = {chess.polyglot.zobrist_hash(board)}
+    for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+        board.pop()
+        keys.add(chess.polyglot.zobrist_hash(board))
+    return keys
+
+#converting a (from, to, promotion) move of the bitboards into a chess.Move
+def to_chess_move(move):
+    from_sq, to_sq, promotion = move
+    return chess.Move(from_sq, to_sq, chess.Piece.from_symbol(promotion).piece_type if promotion else None)
+
+
+#raised inside the search when the time is up or it has been told to stop
+class SearchStopped(Exception):
+    pass
+
+
+#one search of one position, the alpha-beta search itself
+class Search:
+
+    #table is the transposition table, shared between the searches of a game
+    #max_depth and deadline (a time.perf_counter() value, None for no deadline) limit the search, stop is a threading.Event
+    #multipv is how many lines (best moves) are searched, and on_iteration is called with their infos after every depth
+    def __init__(self, board, table, max_depth, deadline=None, max_nodes=None, stop=None, multipv=1, on_iteration=None):
+        self.board = board
+        self.bitboards = bitboards_of(board)
+        self.color = bitboard.WHITE if board.turn == chess.WHITE else bitboard.BLACK
+        self.table = table
+        self.max_depth = max_depth
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.stop = stop
+        self.multipv = multipv
+        self.on_iteration = on_iteration
+        self.nodes = 0
+        #zobrist keys of the positions of the game and of the line being searched, to score repetitions as draws
+        self.seen = game_history(board)
+        #two killer moves per ply, quiet moves that caused a cutoff at that ply in a sibling line
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 64)]
+        #what the last finished iteration found
+        self.best_move = None
+        self.score = 0
+        self.depth = 0
+        self.pv = []
+        #(move, score, pv) of every line of the last finished iteration, best first
+        self.lines = []
+        self.started = time.perf_counter()
+
+    #the score of the position from the point of view of color, in centipawns
+    def evaluate(self, color):
+        score = 0
+        for index, pieces in enumerate(self.bitboards.pieces):
+            table = SQUARE_SCORES[index]
+            while pieces:
+                low = pieces & -pieces
+                score += table[low.bit_length() - 1]
+                pieces ^= low
+        return score if color == bitboard.WHITE else -score
+
+    #the index of the piece of color on a square, -1 if there is none
+    def piece_index(self, square, color):
+        bit = 1 << square
+        offset = 0 if color == bitboard.WHITE else 6
+        pieces = self.bitboards.pieces
+        for index in range(offset, offset + 6):
+            if pieces[index] & bit:
+                return index
+        return -1
+
+    #every pseudo-legal move of color as (from, to, promotion), with the pawns reaching the last rank promoted to each piece
+    #captures_only keeps only the captures and the promotions, for the quiescence search
+    def generate(self, color, captures_only=False):
+        bitboards = self.bitboards
+        pawns = bitboards.pieces[0 if color == bitboard.WHITE else 6]
+        enemies = bitboards.occupied_by[color ^ 1]
+        moves = []
+        for from_sq, to_sq in bitboards.generate_moves(color):
+            is_pawn = pawns & (1 << from_sq)
+            if is_pawn and (to_sq >> 3) in (0, 7):
+                #the quiescence search only looks at the queen promotion
+                moves.extend((from_sq, to_sq, piece) for piece in (('q',) if captures_only else bitboard.PROMOTION_PIECES))
+            elif not captures_only or enemies & (1 << to_sq) or (is_pawn and to_sq == bitboards.ep_square):
+                moves.append((from_sq, to_sq, None))
+        return moves
+
+    #sorting the moves so the best ones are searched first, which makes alpha-beta cut off much more
+    #first the move of the transposition table, then captures by MVV-LVA, then promotions, then the killers, then the rest
+    def order(self, moves, color, table_move=None, ply=0):
+        enemies = self.bitboards.occupied_by[color ^ 1]
+        killers = self.killers[ply]
+        scored = []
+        for move in moves:
+            from_sq, to_sq, promotion = move
+            if move == table_move:
+                score = 1000000
+            elif enemies & (1 << to_sq):
+                victim = self.piece_index(to_sq, color ^ 1) % 6
+                attacker = self.piece_index(from_sq, color) % 6
+                score = 100000 + PIECE_VALUES[victim] * 10 - PIECE_VALUES[attacker] // 10
+            elif promotion is not None:
+                score = 90000 + PIECE_VALUES[bitboard.PIECE_INDEX[promotion.upper()]]
+            elif move == killers[0]:
+                score = 80000
+            elif move == killers[1]:
+                score = 79000
+            else:
+                score = 0
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for score, move in scored]
+
+    #counting a node, and every CHECK_EVERY nodes checking if the search has to stop
+    #depth 1 is always finished (self.depth is still 0 while it runs), so the search always has a move to give
+    def count_node(self):
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and self.depth:
+            if self.stop is not None and self.stop.is_set():
+                raise SearchStopped()
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchStopped()
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                raise SearchStopped()
+
+    #searching only the captures, until the position is quiet, so exchanges are not cut off halfway
+    def quiescence(self, alpha, beta, color, ply):
+        self.count_node()
+        #the side to move does not have to capture, so the score of the position is a lower bound (stand pat)
+        stand_pat = self.evaluate(color)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        bitboards = self.bitboards
+        for move in self.order(self.generate(color, captures_only=True), color, ply=ply):
+            undo = bitboards.push_move(*move)
+            if bitboards.in_check(color):
+                bitboards.pop_move(move[0], move[1], undo)
+                continue
+            score = -self.quiescence(-beta, -alpha, color ^ 1, ply + 1)
+            bitboards.pop_move(move[0], move[1], undo)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    #the alpha-beta search (negamax form), returns the score of the position for color
+    def negamax(self, depth, alpha, beta, color, ply):
+        self.count_node()
+        #the transposition table is keyed by the zobrist key, which push_move keeps up to date as the search makes its moves
+        key = self.bitboards.key
+        #a position that was already on the board, in the game or earlier in this line, is a repetition and scored as a draw
+        if key in self.seen:
+            return 0
+        entry = self.table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_kind, table_move = entry
+            if entry_depth >= depth:
+                if entry_kind == EXACT:
+                    return entry_score
+                if entry_kind == LOWER and entry_score >= beta:
+                    return entry_score
+                if entry_kind == UPPER and entry_score <= alpha:
+                    return entry_score
+
+        bitboards = self.bitboards
+        in_check = bitboards.in_check(color)
+        #a position in check is searched one ply deeper, so the search sees how the check ends
+        if in_check and ply < MAX_DEPTH:
+            depth += 1
+        if depth <= 0:
+            return self.quiescence(alpha, beta, color, ply)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        legal = 0
+        enemies = bitboards.occupied_by[color ^ 1]
+        self.seen.add(key)
+        for move in self.order(self.generate(color), color, table_move, ply):
+            undo = bitboards.push_move(*move)
+            #the moves are pseudo-legal, a move that leaves the king attacked is skipped
+            if bitboards.in_check(color):
+                bitboards.pop_move(move[0], move[1], undo)
+                continue
+            legal += 1
+            score = -self.negamax(depth - 1, -beta, -alpha, color ^ 1, ply + 1)
+            bitboards.pop_move(move[0], move[1], undo)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        #a quiet move that cuts off is remembered as a killer of this ply
+                        if not enemies & (1 << move[1]) and move[2] is None and move != self.killers[ply][0]:
+                            self.killers[ply][1] = self.killers[ply][0]
+                            self.killers[ply][0] = move
+                        break
+        self.seen.discard(key)
+
+        #no legal move: checkmate if in check, stalemate otherwise
+        if not legal:
+            return -MATE_SCORE + ply if in_check else 0
+
+        if best_score <= original_alpha:
+            kind = UPPER
+        elif best_score >= beta:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.table[key] = (depth, best_score, kind, best_move)
+        return best_score
+
+    #searching every legal move of the root position to the given depth, returns (best move, score)
+    def search_root(self, depth, moves):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        bitboards = self.bitboards
+        for move in moves:
+            undo = bitboards.push_move(*move)
+            score = -self.negamax(depth - 1, -beta, -alpha, self.color ^ 1, 1)
+            bitboards.pop_move(move[0], move[1], undo)
+            if best_move is None or score > alpha:
+                alpha = score
+                best_move = move
+        return best_move, alpha
+
+    #the principal variation (the line the engine expects) from the transposition table, as chess.Moves
+    #first is the first move of the line for the other lines of a multipv search, the best line starts from the table
+    def principal_variation(self, first=None):
+        pv = []
+        board = self.board.copy(stack=False)
+        bitboards = self.bitboards
+        undos = []
+        for _ in range(self.depth):
+            if first is not None:
+                move, first = first, None
+            else:
+                entry = self.table.get(bitboards.key)
+                if entry is None or entry[3] is None:
+                    break
+                move = entry[3]
+            chess_move = to_chess_move(move)
+            if chess_move not in board.legal_moves:
+                break
+            pv.append(chess_move)
+            board.push(chess_move)
+            undos.append((move, bitboards.push_move(*move)))
+        for move, undo in reversed(undos):
+            bitboards.pop_move(move[0], move[1], undo)
+        return pv
+
+    #iterative deepening: searching depth 1, 2, 3, ... until max_depth or the time is up
+    #the best move of each finished depth is searched first at the next one, and the transposition table fills up on the way
+    #returns (best move as a chess.Move or None, info dictionary)
+    def run(self):
+        moves = self.bitboards.legal_moves_with_promotions(self.color)
+        if moves:
+            moves = self.order(moves, self.color)
+        for depth in range(1, self.max_depth + 1):
+            if not moves:
+                break
+            try:
+                best_move, score = self.search_root(depth, moves)
+                lines = [(best_move, score)]
+                #with multipv, the next line is the best of the moves that are not in a line yet, and so on
+                others = [move for move in moves if move != best_move]
+                while len(lines) < self.multipv and others:
+                    move, line_score = self.search_root(depth, others)
+                    lines.append((move, line_score))
+                    others.remove(move)
+            except SearchStopped:
+                #the move of the last finished depth is played
+                break
+            self.table[self.bitboards.key] = (depth, score, EXACT, best_move)
+            self.best_move, self.score, self.depth = best_move, score, depth
+            self.pv = self.principal_variation()
+            self.lines = [(best_move, score, self.pv)] + [(move, line_score, self.principal_variation(move)) for move, line_score in lines[1:]]
+            if self.on_iteration is not None:
+                self.on_iteration(self.infos())
+            #the moves of the lines are searched first at the next depth, best first
+            first = [move for move, line_score in lines]
+            moves = first + [move for move in moves if move not in first]
+            #a forced mate has been found, searching deeper will not change the move
+            if abs(score) >= MATE_BOUND:
+                break
+            #a new depth takes several times longer than the last one, if half the time is gone it would not finish
+            if self.deadline is not None and time.perf_counter() - self.started > (self.deadline - self.started) / 2:
+                break
+        return (to_chess_move(self.best_move) if self.best_move is not None else None), self.info()
+
+    #the info dictionary of the search, the same keys python-chess gives for a UCI engine
+    def info(self, score=None, pv=None):
+        seconds = time.perf_counter() - self.started
+        score = self.score if score is None else score
+        if abs(score) >= MATE_BOUND:
+            #the number of moves to mate, positive if the side to move mates
+            plies = MATE_SCORE - abs(score)
+            score = chess.engine.Mate((plies + 1) // 2 if score > 0 else -((plies + 1) // 2))
+        else:
+            score = chess.engine.Cp(score)
+        return {
+            'depth': self.depth,
+            'score': chess.engine.PovScore(score, self.board.turn),
+            'nodes': self.nodes,
+            'nps': int(self.nodes / seconds) if seconds else 0,
+            'time': seconds,
+            'pv': self.pv if pv is None else pv,
+        }
+
+    #the infos of every line of the last finished iteration, with their multipv number (1 for the best line)
+    def infos(self):
+        infos = []
+        for number, (move, score, pv) in enumerate(self.lines, 1):
+            info = self.info(score, pv)
+            info['multipv'] = number
+            infos.append(info)
+        return infos
+
+
+#a search started with BuiltinEngine.analysis, it can be stopped from another thread with stop(), like a python-chess analysis
+#wait() runs the search on the calling thread (the engine worker thread) and returns the best move
+#iterating over it runs the search on a thread of its own and yields the info of every line after every depth,
+#the same way iterating over a python-chess analysis yields the infos the engine sends
+class BuiltinAnalysis:
+
+    def __init__(self, engine, board, limit, multipv=1):
+        self.engine = engine
+        self.board = board
+        self.limit = limit
+        self.multipv_count = multipv
+        self.stop_event = threading.Event()
+        #the info of the best line, and of every line (python-chess has the same two)
+        self.info = {}
+        self.multipv = []
+        self.result = None
+        #the infos of a search that is iterated over, None at the end, and the thread of that search
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    #running the search and keeping its chess.engine.BestMove
+    def _run(self):
+        try:
+            move, self.info = self.engine._search(self.board, self.limit, self.stop_event, self.multipv_count, self._iteration)
+            pv = self.info.get('pv', [])
+            self.result = chess.engine.BestMove(move, pv[1] if len(pv) > 1 else None)
+        finally:
+            #telling the iteration that there is nothing more to come
+            self.queue.put(None)
+
+    #called by the search after every depth with the infos of the lines
+    def _iteration(self, infos):
+        self.multipv = infos
+        self.info = infos[0]
+        for info in infos:
+            self.queue.put(info)
+
+    #running the search (only the first time) and returning its chess.engine.BestMove
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+        elif self.result is None:
+            self._run()
+        return self.result
+
+    #yielding the infos of the lines as the search finds them, until it is done or stopped
+    def __iter__(self):
+        if self.thread is None and self.result is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        while True:
+            info = self.queue.get()
+            if info is None:
+                return
+            yield info
+
+    def __enter__(self):
+        return self
+
+    #the search thread is waited for, so it never runs at the same time as the next search of the engine
+    def __exit__(self, *exc):
+        self.stop()
+        if self.thread is not None:
+            self.thread.join()
+
+
+#the built-in engine, with the methods of chess.engine.SimpleEngine the game and the tools use
+class BuiltinEngine:
+
+    #the UCI options the engine has, Skill Level sets the depth and time (see skill_limits), Hash the size of the table
+    options = {
+        'Skill Level': chess.engine.Option('Skill Level', 'spin', 20, 0, 20, []),
+        'Hash': chess.engine.Option('Hash', 'spin', 16, 1, 1024, []),
+    }
+
+    def __init__(self):
+        self.skill_level = 20
+        #the transposition table, it is kept between the searches of a game and cleared when a new game starts
+        self.table = {}
+        self.max_entries = self._entries(16)
+        self.game = None
+        self.id = {'name': 'builtin'}
+
+    #roughly how many entries of the table fit in the given number of MB
+    def _entries(self, megabytes):
+        return megabytes * 1024 * 1024 // 200
+
+    #setting options, the options the engine does not have (e.g. Threads) are ignored
+    def configure(self, options):
+        for name, value in options.items():
+            if name == 'Skill Level':
+                self.skill_level = max(0, min(20, int(value)))
+            elif name == 'Hash':
+                self.max_entries = self._entries(int(value))
+
+    #clearing the transposition table when a new game starts, game is the game id python-chess style (any object)
+    def _new_game(self, game):
+        if game is not None and game is not self.game:
+            self.table.clear()
+            self.game = game
+
+    #searching the board within the limit (None for no limit, it then searches until stopped) and the skill level
+    #multipv and on_iteration are passed on to the Search, for analysis() with several lines
+    def _search(self, board, limit, stop=None, multipv=1, on_iteration=None):
+        #a full table is cleared, the next searches fill it again with what they need
+        if len(self.table) > self.max_entries:
+            self.table.clear()
+        max_depth, seconds = skill_limits(self.skill_level)
+        max_nodes = None
+        if limit is not None:
+            if limit.depth is not None:
+                max_depth = min(max_depth, limit.depth)
+            if limit.time is not None:
+                seconds = min(seconds, limit.time)
+            max_nodes = limit.nodes
+        elif stop is not None:
+            #with no limit (pondering) it searches as deep as it can until it is stopped
+            max_depth, seconds = MAX_DEPTH, None
+        deadline = time.perf_counter() + seconds if seconds is not None else None
+        return Search(board, self.table, max_depth, deadline, max_nodes, stop, multipv, on_iteration).run()
+
+    #the same as SimpleEngine.play, returns a chess.engine.PlayResult
+    def play(self, board, limit, game=None, info=None, **kwargs):
+        self._new_game(game)
+        move, search_info = self._search(board, limit)
+        pv = search_info.get('pv', [])
+        return chess.engine.PlayResult(move, pv[1] if len(pv) > 1 else None, search_info)
+
+    #the same as SimpleEngine.analysis, the search runs when wait() is called or the analysis is iterated over
+    def analysis(self, board, limit=None, multipv=None, game=None, **kwargs):
+        self._new_game(game)
+        return BuiltinAnalysis(self, board.copy(), limit, multipv or 1)
+
+    #there is no process to check or to close
+    def ping(self):
+        pass
+
+    def quit(self):
+        self.table.clear()
+
+    def close(self):
+        self.quit()
+
+
+#starting an engine: the built-in one for 'builtin', a UCI engine process for anything else
+def open_engine(command):
+    if command == BUILTIN:
+        return BuiltinEngine()
+    return chess.engine.SimpleEngine.popen_uci(command)
@@ -1,9 +1,24 @@
+import time  
+#the time the game started, for the startup report
+STARTED = time.perf_counter()
 import pygame
 import sys
 import chess.engine
-import tkinter.messagebox
-import time  
 import os
+import shutil
+import chess_rules
+import bitboard
+import engine_driver
+import builtin_engine
+import analysis_cache
+import opening_book
+import renderer
+import animation
+import sprite_atlas
+import profiler
+import hint_overlay
+import time_control
+import pgn_archive
 
 #NEW FEATURES ADDED:
 #1. Sound effects for moves, captures, check, and checkmate.
@@ -13,10 +28,50 @@ import os
 #5. Different levels of AI skill using Stockfish's skill level configuration.
 #6. Restart using R key.
 #7. Highlighting valid moves for the selected piece.
-
-
-#initializing the game
-pygame.init()
+#8. Hints with the H key, the engine's best moves for the player are drawn as arrows while it keeps searching.
+#9. Game clocks with an increment, the AI shares out its time from its clock instead of searching every move for the same time.
+#10. Every game is recorded in a PGN archive, and a past game can be replayed or resumed with --replay N or --resume N.
+
+
+#if the game is started with --startup-report, it prints how long each step of starting up took
+STARTUP_REPORT = '--startup-report' in sys.argv
+#if the game is started with --profile, the hot paths are timed from the start and the overlay is shown, P turns it on and off
+PROFILE = '--profile' in sys.argv
+#file the timings are written to when the game is closed, .json for JSON and anything else for CSV, None to not write them
+PROFILE_PATH = 'frame_profile.csv'
+#seconds between updates of the numbers on the overlay
+PROFILE_HUD_REFRESH = 0.5
+#--replay N shows game N of the PGN archive move by move, --resume N sets it up straight away, and the game goes on from where it stopped
+#N counts from 0 and negative numbers count from the end, without a number it is the last game (-1)
+def archive_argument(flag):
+    if flag not in sys.argv:
+        return None
+    position = sys.argv.index(flag) + 1
+    if position < len(sys.argv) and sys.argv[position].lstrip('-').isdigit():
+        return int(sys.argv[position])
+    return -1
+REPLAY = archive_argument('--replay')
+RESUME = archive_argument('--resume')
+#the steps of starting up, as (name, time it was done), see startup_step
+STARTUP_STEPS = [('imports', time.perf_counter())]
+
+#recording that a step of starting up is done, for the startup report
+def startup_step(name):
+    STARTUP_STEPS.append((name, time.perf_counter()))
+
+#printing how long each step of starting up took
+def print_startup_report():
+    print("Startup:")
+    last = STARTED
+    for name, done in STARTUP_STEPS:
+        print(f"  {name:<12} {(done - last) * 1000:7.1f} ms")
+        last = done
+    print(f"  {'total':<12} {(last - STARTED) * 1000:7.1f} ms")
+
+#showing a message box, tkinter is only imported the first time a message is shown, as most games never show one
+def show_message(title, message):
+    import tkinter.messagebox
+    tkinter.messagebox.showinfo(title, message)
 
 #defining constants for the game
 WIDTH, HEIGHT = 600, 600 #board size
@@ -25,11 +80,26 @@ TILE_SIZE = WIDTH // COLS #1 tile of the board is the result of total width / nu
 WHITE = (252, 252, 252) #this is the white tile color
 BLACK = (115, 14, 6) #this is the black tile color, although it is not black, i labelled it as black as its easier to understand
 HIGHLIGHT = (68, 202, 88) #color to highlight legal moves of the selected piece
-FPS = 60 #frames per second, this is the speed of the game
-
-
-#initialising mixer for sound effects
-pygame.mixer.init()
+ENGINE_PATH = r"C:\Users\Krish Jangra\Downloads\stockfish-windows-x86-64-avx2 (1)\stockfish\stockfish-windows-x86-64-avx2.exe" #path to the stockfish executable, if it cannot be found (or is 'builtin') the built-in python engine is used
+FPS = 60 #frames per second, this is the speed of the game while a piece is moving, when nothing moves the game sleeps until an event comes
+SEARCH_POLL_TIME = 0.1 #seconds between checks of the AI's search when no event comes, the search posts AI_SEARCH_DONE when it finishes anyway
+TIME_CONTROL = (600, 5) #seconds on the player's clock at the start, and seconds added after every move
+AI_TIME_CONTROL = (30, 0.2) #the same for the AI's clock, the AI works out how long it searches each move from the time on its clock, with 30+0.2 it searches 0.4 to 0.8 seconds a move
+MOVE_DELAY = 0.6 #the AI's move is shown at the earliest this many seconds after it started thinking, the search runs during this time instead of before it
+PONDER = True #if true, stockfish searches the reply it expects from the player while the player is thinking (the built-in engine never ponders)
+ANALYSIS_CACHE_PATH = 'analysis_cache.sqlite3' #file where the AI's replies are remembered between games, None turns it off
+OPENING_BOOK_PATH = 'book.bin' #polyglot opening book the AI plays from while the game is in it, it is only used if the file exists
+ANIMATION_SECONDS_PER_SQUARE = 0.06 #seconds a moving piece takes per square it travels, the animations are timed and do not depend on FPS
+BOOK_MODE = 'weighted' #'weighted' picks book moves at random by their weight, 'best' always plays the highest weighted move
+HINT_LINES = 3 #number of candidate moves the hints show (the MultiPV of the hint analysis)
+PGN_ARCHIVE_PATH = 'games.pgn' #file every game is appended to when it is over (or the game is closed), None turns the recording off
+REPLAY_DELAY = 0.8 #seconds between the moves of a game that is replayed with --replay
+
+
+#event posted by the engine worker thread when the AI's search is done, it wakes up the main loop
+AI_SEARCH_DONE = pygame.event.custom_type()
+#event posted by the engine worker thread when the lines of the hints changed
+HINTS_UPDATED = pygame.event.custom_type()
 
 #loading the images
 IMAGES = {} #empty dict of images 
@@ -37,74 +107,80 @@ IMAGES = {} #empty dict of images
 pieces = ['r','n','b','q','k','p','R','N','B','Q','K','P']
 
 #function to load the images of the pieces
+#the images are scaled to the tile size and packed into one atlas in the pixel format of the screen,
+#the scaled atlas is cached on disk by tile size so the next launch does not scale them again (see sprite_atlas.py)
+#this is called once the window is open, so the images can be converted to the format of the screen
 def load_images():
-    #a dictionary to assign the images as r, n, etc. so its easier to place them on the board using a for loop
     #ASSIGNING LOWERCASE TO BLACK, AND UPPERCASE TO WHITE
-    piece_to_filename = {
-        'r': 'brown-castle.png',
-        'n': 'brown-elephant.png',
-        'b': 'bishop-brown.png',
-        'q': 'brown-queen.png',
-        'k': 'brown-king.png',
-        'p': 'brown-pawn.png',
-        'R': 'white-castle.png',
-        'N': 'white-elephant.png',
-        'B': 'white-bishop.png',
-        'Q': 'white-queen.png',
-        'K': 'white-king.png',
-        'P': 'white-pawn.png',
-    }
-    
-    #iterating over the items in the dictionary and placing them on the board
-    for piece, filename in piece_to_filename.items():
-        image = pygame.image.load(f"images/{filename}")
-        IMAGES[piece] = pygame.transform.scale(image, (TILE_SIZE, TILE_SIZE))
-
-#function to load sounds for sound effects
-def load_sound():
-    #empty dictionary to store the sounds
-    sounds = {}
+    atlas = sprite_atlas.SpriteAtlas(TILE_SIZE)
+    #each image is a subsurface of the atlas, so they are placed on the board the same way as before
+    IMAGES.update(atlas.sprites)
+    startup_step('images')
+
+#the sound files, with their respective keys
+SOUND_FILES = {
+    'move' : 'move.mp3',
+    'capture' : 'capture.mp3',
+    'check' : 'check.mp3',
+    'checkmate' : 'check.mp3',
+    'restart' : 'restart.mp3',
+}
+
+#function to load one sound effect, the sounds are loaded the first time they are played, not when the game starts
+#returns None if the sound cannot be loaded, the game then plays without it
+def load_sound(key):
     #folder where the sound files are stored
     folder = 'sounds'
+    try: 
+        #starting the mixer the first time a sound is needed, starting the audio device can take a while
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        #loading the sound file
+        return pygame.mixer.Sound(os.path.join(folder, SOUND_FILES[key]))
+    except:
+        #if the sound file is not found, print an error message
+        print(f"Error loading sound: {SOUND_FILES[key]}!")
+        return None
 
-    #list of sound files to be loaded, with their respective keys
-    files = {
-        'move' : 'move.mp3',
-        'capture' : 'capture.mp3',
-        'check' : 'check.mp3',
-        'checkmate' : 'check.mp3',
-        'restart' : 'restart.mp3',
-    }
-
-    #iterating through the files dictionary to load the sound files
-    for key, value in files.items():
-        try: 
-            #loading the sound file and scaling it to the tile size
-            sounds[key] = pygame.mixer.Sound(os.path.join(folder, value))
-        except:
-            #if the sound file is not found, print an error message
-            print(f"Error loading sound: {value}!")
-    #returning the sounds dictionary containing all the loaded sound effects
-    return sounds
+
+#starting the engine process, this runs on the engine worker thread (see AsyncEngine.launch)
+#if stockfish is not installed where ENGINE_PATH says, the game plays with the built-in engine instead of crashing
+def open_engine():
+    command = ENGINE_PATH
+    if command != builtin_engine.BUILTIN and not shutil.which(command):
+        print(f"Stockfish not found at {command}, playing with the built-in engine")
+        command = builtin_engine.BUILTIN
+    engine = builtin_engine.open_engine(command)
+    #waiting for the engine to be ready (isready), so it has finished setting itself up before the first search
+    engine.ping()
+    return engine
 
 
 #making a class for the game
-class ChessInPython:
+#the rules of the game come from ChessRules, this class adds the window, the sounds and the AI
+class ChessInPython(chess_rules.ChessRules):
     
     #CONSTRUCTOR OF THE CLASS
     def __init__(self):
 
+        #only the parts of pygame the first frame needs are started here, the mixer is started when the first sound plays
+        pygame.display.init()
+        pygame.font.init()
+
         #initialising the display screen
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
 
         #setting the title of the window
         pygame.display.set_caption("Manual Python Chess")
 
+        #loading the images of the pieces, now that the window is open they are converted to its pixel format
+        load_images()
+
         #intialising clock
         self.clock = pygame.time.Clock()
 
-        #intialising the chess board
-        self.board = self.create_board()
+        #intialising the chess board, the turn and everything else the rules of the game need
+        chess_rules.ChessRules.__init__(self)
 
         #by default, no pieces are selected
         self.selected = None
@@ -112,496 +188,312 @@ class ChessInPython:
         #an array to store all the valid moves
         self.valid_moves = []
 
-        #first white will play, according to the rule of chess
-        self.turn = 'w'
-
         #setting running to true, indicating that the game is running
         self.running = True
 
-        #initialising stockfish engine as AI (adding the path to the stockfish executable)
-        self.engine = chess.engine.SimpleEngine.popen_uci(r"C:\Users\Krish Jangra\Downloads\stockfish-windows-x86-64-avx2 (1)\stockfish\stockfish-windows-x86-64-avx2.exe")
+        #the searches run on a worker thread, so the game keeps drawing and handling input while stockfish thinks
+        self.async_engine = engine_driver.AsyncEngine()
+        #initialising stockfish engine as AI, the engine process is started on the worker thread so the board shows straight away
+        self.async_engine.launch(open_engine)
+        if STARTUP_REPORT:
+            self.async_engine.launched.add_done_callback(lambda future: print(f"Engine ready after {(time.perf_counter() - STARTED) * 1000:.1f} ms"))
         self.skill_level = 10 #setting the skill level, it can be from 0 to 20 with 20 being the highest/most skilled
-        #applying the skill level to the engine after defining it
-        self.engine.configure({"Skill Level": self.skill_level})
+        #applying the skill level to the engine after defining it, it is set as soon as the engine is up
+        self.async_engine.configure({"Skill Level": self.skill_level})
+        #handle of the search that is running for the AI, None if the AI is not thinking
+        self.ai_search = None
+        #the replies of the AI that are remembered on disk, positions seen before are answered without asking the engine
+        self.cache = analysis_cache.AnalysisCache(ANALYSIS_CACHE_PATH) if ANALYSIS_CACHE_PATH else None
+        #the cache key of the engine settings the running search uses
+        self.ai_search_settings = None
+        #the opening book, book moves are played straight away without asking the engine
+        if OPENING_BOOK_PATH and os.path.exists(OPENING_BOOK_PATH):
+            self.book = opening_book.OpeningBook(OPENING_BOOK_PATH, BOOK_MODE)
+        else:
+            self.book = None
 
         #storing AI move data, initially as none
         self.ai_move_data = None  
+        #when the AI started thinking about its move, its move is not shown before MOVE_DELAY seconds after that
+        self.ai_started = 0.0
+
+        #the clocks of the player and the AI, and the time manager that works out how long the AI searches each move
+        self.game_clock = time_control.Clock(TIME_CONTROL, AI_TIME_CONTROL)
+        self.time_manager = time_control.TimeManager(self.game_clock)
+
+        #RECORDING
+        #the archive the games are written to, and the recorder of the game that is being played
+        self.archive = pgn_archive.PgnArchive(PGN_ARCHIVE_PATH) if PGN_ARCHIVE_PATH else None
+        self.recorder = pgn_archive.GameRecorder(self.archive, {'White': 'Player'}) if self.archive is not None else None
+        #the clock and evaluation that go with the next move made on the board, as (clock, score, depth), None for the player's moves
+        self.move_info = None
+        #the moves of an archived game that are still to be replayed, as (move, clock, score, depth), and when the next one is shown
+        self.replay_moves = []
+        self.replay_next = 0.0
+        #the moves that came from the archive, a game is only written again once a new move has been played after them
+        self.loaded_moves = 0
+        #the clocks of the archived game after its last move, they are set when the game goes on
+        self.loaded_clocks = None
+        #the result of the archived game that is replayed, as text, if it was already over, None if it can be played on
+        self.archived_result = None
 
         #setting the game to not show stats screen by default
         self.show_stats_screen = False  
      
-        #loading the sound effects
-        self.sounds = load_sound()  
-
-    #assigning the position as 'r', 'R', etc. to place the pieces accordingly
-    #returning a 2D array of the whole board
-    def create_board(self):
-        return [
-            ['r', 'n', 'b', 'q', 'k', 'b', 'n', 'r'],
-            ['p'] * 8,
-            [''] * 8,
-            [''] * 8,
-            [''] * 8,
-            [''] * 8,
-            ['P'] * 8,
-            ['R', 'N', 'B', 'Q', 'K', 'B', 'N', 'R']
-        ]
-
-    #function to draw the chess board
-    def draw_board(self):
-
-        #2 for loops for rows and cols
-        #for loop for rows
-        for row in range(ROWS):
-            #for loops for columns
-            for col in range(COLS):
-                #if the sum of the rows and cols is even, then the tile should be white
-                if (row+col) % 2 == 0:
-                    color = WHITE
-                else:
-                    #if odd, its black
-                    color = BLACK
-
-                #drawing the tile using the rectangle function from pygame
-                pygame.draw.rect(self.screen, color, (col*TILE_SIZE, row*TILE_SIZE, TILE_SIZE, TILE_SIZE))
-
-                #checking if the current tile (row, col) is one of the valid moves for the selected piece
-                if (row, col) in self.valid_moves:
-                    #creating a new image of the tile, with the same dimensions
-                    s = pygame.Surface((TILE_SIZE, TILE_SIZE))
-                    #setting transparency of the image, it will overlap the original tile
-                    s.set_alpha(100)
-                    #highlights the image to the color defined at the start of the code
-                    s.fill(HIGHLIGHT)
-                    #drawing the translucent image of green tile which marks the valid moves of the pieces
-                    self.screen.blit(s, (col*TILE_SIZE, row*TILE_SIZE))
-
-    #placing the images on the board
-    def placing_pieces(self):
-        #looping through the board, (rows and cols)
-        for row in range(ROWS):
-            for col in range(COLS):
-                #assigning the piece on the board at the row,col position
-                piece = self.board[row][col]
-                #checking if the piece is present on the board (piece is a string that goes like 'r', 'R', etc.)
-                if piece:
-                    #calculates where the image should be placed, and places it on its respective position
-                    self.screen.blit(IMAGES[piece], (col*TILE_SIZE, row*TILE_SIZE))
-
-    #i set the pieces for white as uppercase letters in the create_board() function
-    # for black its lowercase
-    # this function checks if the piece is lowercase or uppercase  
-    def get_piece_color(self, piece):
-        #if the piece is R, Q, etc. (uppercase), then it is white
-        if piece.isupper(): return 'w'
-        #if lowercase, its black
-        elif piece.islower(): return 'b'
-        #otherwise, none
-        return None
+        #the sound effects, each one is loaded the first time it is played (see play_sound)
+        self.sounds = {}
+
+        #how many times the main loop woke up, and the CPU and wall time of the loop, to check the game does not use CPU while idle
+        self.wakeups = 0
+        self.loop_started = time.perf_counter()
+        self.loop_cpu_started = time.process_time()
+
+        #the renderer keeps the empty board and the highlight tile drawn once, and redraws only the squares that changed
+        self.renderer = renderer.BoardRenderer(self.screen, IMAGES, TILE_SIZE, WHITE, BLACK, HIGHLIGHT)
+        #the animations of the pieces, advanced by run() every frame
+        self.animator = animation.Animator()
+        #the (start, end) of the move that is being animated, it is made on the board when its animation is over
+        self.moving = None
+
+        #timings of the hot paths, only taken while the profiler is on (see profiler.py)
+        self.profiler = profiler.Profiler(enabled=PROFILE)
+        self.profiler.watch(self, 'update_state', 'move generation')
+        self.profiler.watch(self.renderer, 'render', 'render board')
+        self.profiler.watch(self.animator, 'draw', 'animation')
+        self.profiler.watch(self, 'stats_screen', 'stats screen')
+        self.profiler.watch(self, 'update_display', 'display update')
+        #if the overlay with the timings is shown, the overlay image and when it was last made
+        self.show_profile_hud = PROFILE
+        self.profile_hud = None
+        self.profile_hud_made = 0.0
+        #when the running search of the AI was started, to time it
+        self.ai_search_started = 0.0
+
+        #HINTS
+        #if the hints are shown (toggled with 'H'), the arrows and the panel of the lines, and the analysis they come from
+        self.show_hints = False
+        self.hints = hint_overlay.HintOverlay(TILE_SIZE)
+        self.hint_stream = None
+        #the board and the position key the running hint analysis is for, and when it started
+        self.hint_board = None
+        self.hint_key = None
+        self.hint_started = 0.0
+
+        #setting up the archived game to replay or resume, if one was asked for on the command line
+        if REPLAY is not None or RESUME is not None:
+            self.load_archived_game(REPLAY if REPLAY is not None else RESUME, replay=REPLAY is not None)
+        startup_step('window')
+
+    #playing a sound effect, loading it first if it has not been played before
+    def play_sound(self, key):
+        if key not in self.sounds:
+            self.sounds[key] = load_sound(key)
+        if self.sounds[key] is not None:
+            self.sounds[key].play()
 
     #function to animate the move of the piece
-    def animate_move(self, start_pos, end_pos, piece):
-        #setting the frames per square for the animation
-        #the more frames per square, the slower the animation will be
-        frames_per_square = 2 
-        #calculating the difference in rows 
-        diff_row = end_pos[0] - start_pos[0]
-        #calculating the difference in columns
-        diff_col = end_pos[1] - start_pos[1]
-
-        #calculating the total number of frames for the animation
-        frame_count = (abs(diff_row) + abs(diff_col)) * frames_per_square
-
-        #calculating the starting and ending positions of the piece
-        start_x = start_pos[1] * TILE_SIZE
-        start_y = start_pos[0] * TILE_SIZE
-        end_x = end_pos[1] * TILE_SIZE
-        end_y = end_pos[0] * TILE_SIZE
-
-        #making a copy of the board to avoid modifying the original board during animation
-        temp_board = [row.copy() for row in self.board]
-        
-        #storing the piece and temporarily remove it from the board for animation
-        saved_piece = self.board[start_pos[0]][start_pos[1]]
-        self.board[start_pos[0]][start_pos[1]] = ''
-
-        #animating the piece moving from start to end position
-        #iterating through the frames
-        for frame in range(frame_count + 1):
-            #x is the fraction of the current frame over the total number of frames
-            x = frame / frame_count
-
-            #calculating the current position of the piece based on the fraction x
-            current_x = int(start_x + (end_x - start_x) * x)
-            current_y = int(start_y + (end_y - start_y) * x)
-
-            #drawing the board and pieces
-            self.draw_board()
-            #placing the pieces on the board
-            self.placing_pieces()  
-            #drawing the moving piece
-            #we will use the saved piece to draw the piece at the current position
-            self.screen.blit(IMAGES[piece], (current_x, current_y))  
-            #updating the display
-            pygame.display.flip()
-            #ticking the clock to control the frame rate
-            self.clock.tick(FPS)
-    
-        #restoring the piece to the board at the original position
-        #this will ensure the actual move is made by make_move()
-        self.board[start_pos[0]][start_pos[1]] = saved_piece
+    #the animation does not block, it is started here and run() moves the piece a little every frame
+    #when the piece arrives, the move is made on the board with make_move, and then on_done is called (e.g. to let the AI reply)
+    def animate_move(self, start_pos, end_pos, promotion='q', on_done=None):
+        piece = self.position.piece(*start_pos)
+        #the time of the animation grows with the distance, a piece going across the board takes longer than one going a square
+        distance = ((end_pos[0] - start_pos[0]) ** 2 + (end_pos[1] - start_pos[1]) ** 2) ** 0.5
+        duration = max(2, distance) * ANIMATION_SECONDS_PER_SQUARE
+        now = time.perf_counter()
+
+        #the moving piece is drawn by the animation, so it is hidden on its start square until the move is made
+        self.moving = (start_pos, end_pos)
+        #the position is about to change, so the hints for it are stopped and taken off the board
+        self.update_hints()
+        self.animator.add(animation.Tween(
+            IMAGES[piece], self.pixel_position(start_pos), self.pixel_position(end_pos), duration,
+            hide={start_pos}, on_finish=lambda: self.finish_move(start_pos, end_pos, promotion, on_done)), now)
+
+        #a captured piece fades out while the other piece moves in
+        #en passant captures the pawn next to the end square, not the one on it
+        captured_pos = end_pos
+        if piece in 'Pp' and start_pos[1] != end_pos[1] and not self.position.piece(*end_pos):
+            captured_pos = (start_pos[0], end_pos[1])
+        captured = self.position.piece(*captured_pos)
+        if captured:
+            self.animator.add(animation.Tween(
+                IMAGES[captured], self.pixel_position(captured_pos), self.pixel_position(captured_pos), duration,
+                alpha=(255, 0), hide={captured_pos}), now)
+
+        #when castling, the rook moves at the same time as the king
+        if piece in 'Kk' and abs(end_pos[1] - start_pos[1]) == 2:
+            rook_from = (start_pos[0], 7 if end_pos[1] > start_pos[1] else 0)
+            rook_to = (start_pos[0], 5 if end_pos[1] > start_pos[1] else 3)
+            self.animator.add(animation.Tween(
+                IMAGES[self.position.piece(*rook_from)], self.pixel_position(rook_from), self.pixel_position(rook_to), duration,
+                hide={rook_from}), now)
+
+    #function called when the animation of a move is over, it makes the move on the board
+    def finish_move(self, start_pos, end_pos, promotion, on_done):
+        self.moving = None
+        self.make_move(start_pos, end_pos, promotion)
+        #a promoted piece fades in on the square the pawn arrived on
+        if self.chess_board.move_stack[-1].promotion:
+            self.animator.add(animation.Tween(
+                IMAGES[self.position.piece(*end_pos)], self.pixel_position(end_pos), self.pixel_position(end_pos), 4 * ANIMATION_SECONDS_PER_SQUARE,
+                alpha=(0, 255), hide={end_pos}))
+        if on_done is not None:
+            on_done()
+        #if it is the player's turn now, the hints start on the new position
+        self.update_hints()
+
+    #the top left pixel of a square on the screen, as (x, y)
+    def pixel_position(self, pos):
+        return (pos[1] * TILE_SIZE, pos[0] * TILE_SIZE)
 
-    
-    #this function checks the moves in the horizontal/vertical direction, i.e, straight in any horizontal/vertcal direction
-    #along with the initial row and col, it also takes the directions of the piece
-    #WE WILL USE THIS FUNCTION FOR ROOK, BISHOP, QUEEN MOVES
-    def get_linear_moves(self, row, col, directions):
-        moves_made = [] #moves_made array
-
-        #x and y are the offsets for the directions
-        #iterating through the directions, which are passed as a list of tuples -> (x, y)
-        for x, y in directions:
-            #r and c are the new row and new col respectively, which are calculated by adding x and y to old row and col respectively
-            r, c = row + x, col + y
-
-            #while the new row and new col are within the bounds of the board
-            while 0 <= r < 8 and 0 <= c < 8:
-                #checking the target piece at the new row and new col
-                target = self.board[r][c]
-                #if the target piece is empty, we can move the piece to that position
-                if target == '':
-                    moves_made.append((r, c)) #adding the move to the moves_made array
-
-                #if the target piece is of opposite color, we can capture it and move the piece to that position
-                elif self.get_piece_color(target) != self.turn:
-                    #adding the move to the moves_made array
-                    moves_made.append((r, c))
-                    break
-                #any other case, if the target piece is of the same color, we cannot move there
-                else:
-                    break
-
-                #updating the row and col to the new position
-                r += x
-                c += y
-        #returning the array of moves made
-        return moves_made
-
-    #function for pawn moves
-    def get_pawn_moves(self, row, col, piece):
-        if piece.isupper():
-            #the piece is uppercase, meaning its white
-            #white pieces are placed at the bottom of the board, so the direction would be negative as its going up 
-            #the rows are labelled from 0 to 7 from top to bottm, and white piece goes from bottom to top (OPPOSITE DIRECTION)
-            direction = -1
-        else:
-            #the piece is lowecase, meaning its black
-            #black pieces are placed on the top of the board, so the direction would be positive as its coming down
-            #the rows are labelled from 0 to 7 from top to bottm, and black piece comes from top to bottom
-            direction = 1 
-        
-        #if the piece is uppercase, then its white
-        #white pawn starts from row 6 from rows 0 to 7, one index before the last row
-        #intial row is 6 because it starts from the bottom of the board
-        if piece.isupper():
-            intial_row = 6
-        #if the piece is lowercase, its black
-        else:
-            #black pawn starts from row 1 from rows 0 to 7, one index after the first row
-            #initial row is 1 because it starts from the top of the board
-            intial_row = 1
-
-        #empty array to store the moves made
-        moves_made = []
-        #checking if the move made to the new place is empty and within the bounds of the board
-        if 0 <= row + direction < 8 and self.board[row + direction][col] == '':
-            #if empty, add the move to the moves_made array
-            moves_made.append((row + direction, col))
-            
-            #checking if the piece hasn't moved, i.e, is at its starting point
-            #if true, it will allow the user to move 2 steps forward, according to the chess rules
-            if row == intial_row and self.board[row + (2 * direction)][col] == '':
-                #adding to the moves_made array
-                moves_made.append((row + (2 * direction), col))
-        
-        #this is the CAPTURE move
-        #checking if a piece is available diagonally
-        # [-1,1] checks in both directions, left or right (col+1 or col-1)
-        for diag_col in [-1, 1]:
-            #the updated column will be the initial col + diag_col
-            new_col = col + diag_col
-            #checking if in bounds
-            if 0 <= new_col < 8 and 0 <= row + direction < 8:
-                #this takes any piece present diagonally and label it as the target
-                target = self.board[row + direction][new_col]
-                #if the recognised piece, which is present diagonally, is of opposite color
-                #checking if the piece is of opposite color, for example, if the white pawn has to capture a black piece diagonally, it means its white's turn 
-                #this proves that its not the turn on black, and if its not diagonal piece's turn, its the opposite color
-                if target and self.get_piece_color(target) != self.turn:
-                    moves_made.append((row + direction, new_col)) #adding the move to the moves_made array
-
-        #return the moves made
-        return moves_made
-
-    #checking the rook's moves
-    def get_rook_moves(self, row, col):
-        #as we know, rook moves either vertically or horizontally, in a straight line
-        #so the directions will be (-1, 0) [down, vertical], (1, 0) [up, vertical], (0, -1) [left, horizontal], (0, 1) [right, horizontal] 
-        #this covers all possible directions it can move in
-        #passing it in linear moves func, then returning the result
-        return self.get_linear_moves(row, col, [(-1, 0), (1, 0), (0, -1), (0, 1)])
-
-    #checking bishop's moves
-    def get_bishop_moves(self, row, col):
-        #bishop moves diagonally 
-        #the possible moves can be (-1, -1) [bottom-left], (-1, 1) [bottom-right], (1, -1) [top-left], (1, 1) [top-right]
-        #this covers all the possible moves of bishop
-        #passing it in linear moves func, then returning the result
-        return self.get_linear_moves(row, col, [(-1, -1), (-1, 1), (1, -1), (1, 1)])
-
-    #checking queen's moves
-    def get_queen_moves(self, row, col):
-        #queen is a mix of bishop and rook moves, it can straight or diagonally in any direction
-        #possible directions can be rook moves --> [(-1, 0), (1, 0), (0, -1), (0, 1)], bishop moves --> [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        #passing the combination in linear moves func, and returning the result
-        return self.get_linear_moves(row, col, [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)])
-
-    #checking king's moves
-    def get_king_moves(self, row, col):
-        #moves made are stored in an array
-        moves_made = []
-
-        #king moves one step in any direction
-        #(-1,-1)  (-1,0)   (-1,1)
-        #(0,-1)    KING    (0,1)   [KING'S POSITION = (0,0)]
-        #(1,-1)   (1,0)    (1,1)
-        #possible rows it can move to: -1, 0, 1
-        #possible cols it can move to: -1, 0, 1
-        
-        #looping through the coordinates of the row
-        for sel_row in [-1, 0, 1]:
-            #looping through the coordinates of the col
-            for sel_col in [-1, 0, 1]:
-                #skipping if the move where king moves to (0,0), as it is its current pos 
-                if sel_row == 0 and sel_col == 0:
-                    continue
-
-                #CAPTURING PIECES
-                #calculating the coordinates of the target piece
-                r, c = row + sel_row, col + sel_col
-                #if the target is in bounds
-                if 0 <= r < 8 and 0 <= c < 8:
-                    #calculating the location of the target on the board 
-                    target = self.board[r][c]
-                    #checking if the target piece we are pointing at is empty or of opposite color
-                    #if true, then we can move the king diagonally as a capture move (if the piece is of opp color)
-                    if target == '' or self.get_piece_color(target) != self.turn:
-                        moves_made.append((r, c)) #adding the move to the moves_made array
-        #retrning the moves_made array
-        return moves_made
-
-    #checking tge knight's moves
-    def get_knight_moves(self, row, col):
-        #same procedure, setting up an empty movesmade array to store the valid moves
-        moves_made = []
-        #knight moves in an L shape, that means, 2 steps in one direction and one step in any direction horizontally
-        #setting up an array of directions the knight can move to
-        knight_directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-
-        #iterating over the offsets (directions) of the knight, in each direction
-        # (x,y) --> offsets
-        for x, y in knight_directions:
-            #r and c are the new row and new col respectively
-            #the new rows/cols will be the intiial rows/cols + the direction knight is moving in
-            r, c = row + x, col + y
-
-            #capturing piece
-            #checking if in bounds
-            if 0 <= r < 8 and 0 <= c < 8:
-                #assigning any piece detected diagonally as target
-                target = self.board[r][c]
-                #if the target is empty or of opponent's color, we can move the bishop to that place
-                if target == '' or self.get_piece_color(target) != self.turn:
-                    moves_made.append((r, c)) #adding in the moves made array as a legal move
-
-        return moves_made
-
-    #function to calculate the valid moves of each piece
-    def get_valid_moves(self, row, col):
-        #selecting the piece at the passed coordinates 
-        piece = self.board[row][col]
-        #if no piece is found at the selected coordinate, or the piece found is of opponent's, then return nothing
-        #this skips the part, returning an empty array
-        if not piece or self.get_piece_color(piece) != self.turn:
-            return []
-        
-        #defining an empty array to store all the moves
-        total_moves = []
-        
-        #if the piece has a string value of 'p' or 'P', then its a pawn
-        if piece.upper() == 'P':
-            total_moves = self.get_pawn_moves(row, col, piece)
-        #if the piece has a string value of 'r' or 'R', then its a rook  
-        elif piece.upper() == 'R':
-            total_moves = self.get_rook_moves(row, col)
-        #if the piece has a string value of 'n' or 'N', then its a knight
-        elif piece.upper() == 'N':
-            total_moves = self.get_knight_moves(row, col)
-        #if the piece has a string value of 'b' or 'B', then its a bishop
-        elif piece.upper() == 'B':
-            total_moves = self.get_bishop_moves(row, col)
-        #if the piece has a string value of 'q' or 'Q', then its a queen
-        elif piece.upper() == 'Q':  
-            total_moves = self.get_queen_moves(row, col)
-        #if the piece has a string value of 'k' or 'K', then its a king
-        elif piece.upper() == 'K':
-            total_moves = self.get_king_moves(row, col)
-
-        #we collected all of the moves that our pieces can make, however, only a fraction of those moves will be legal
-        #to find the legal moves, creating an empty array to store it
-        legal_moves = []
-        #looping through the array of total_moves
-        for move in total_moves:
-            #creating a temporary copy of the board
-            board_copy_temp = [row.copy() for row in self.board]
-            #getting the initial position of the selected piece
-            start_row, start_col = row, col
-            #getting the final/ending position of the piece
-            ending_row, ending_col = move
-            #making the move by shifting the piece to the specified coordinates
-            board_copy_temp[ending_row][ending_col] = board_copy_temp[start_row][start_col]
-            #setting the initial position as null, leaving it vacant
-            board_copy_temp[start_row][start_col] = ''
-            
-            #converting the board to FEN 
-            #it is essential to convert the moves to FEN in order to communicate with STOCKFISH
-            fen = self.to_fen(board_copy_temp)
-
-            #creating an object from the FEN string
-            board = chess.Board(fen)
-            #checking if the KING is in check, if false --> add the legal move to the legal_moves array
-            #this is done to ensure that the player is not able to move any piece when their king is in check
-            if not board.is_check():
-                legal_moves.append(move)
-
-        return legal_moves
-    
     #function to make a move on the board
-    def make_move(self, start, end):
-
-        #start and end are tuples, so we need to unpack them
-        #start is the initial position of the piece, and end is the final position of the piece
-        start_row, start_col = start
-        end_row, end_col = end
-        
-        # Get the piece at the start position
-        piece = self.board[start_row][start_col]
-        
-        # Check if this move is a capture
-        is_capture = self.board[end_row][end_col] != ''
-        
-        # Move the piece
-        self.board[end_row][end_col] = piece
-        self.board[start_row][start_col] = ''
+    #promotion is the lowercase letter of the piece a pawn is promoted to, the player always gets a queen
+    def make_move(self, start, end, promotion='q'):
+        #making the move with the rules of the game, this also switches the turn and works out the new position state
+        is_capture, is_promotion = self.apply_move(start, end, promotion)
+        #the player's clock stops when their move is made (the AI's clock already stopped when its move was found)
+        self.game_clock.stop()
+        #recording the move with the time left on the clock of the side that moved, and the evaluation of the AI's moves
+        if self.recorder is not None:
+            clock, score, depth = self.move_info or (None, None, None)
+            mover = 'b' if self.turn == 'w' else 'w'
+            self.recorder.record(self.chess_board.move_stack[-1], clock if clock is not None else self.game_clock.time_left(mover), score, depth)
+        self.move_info = None
         
         # Play the appropriate sound
-        if is_capture and 'capture' in self.sounds:
-            self.sounds['capture'].play()
-        elif 'move' in self.sounds:
-            self.sounds['move'].play()
-    
+        if is_capture:
+            self.play_sound('capture')
+        else:
+            self.play_sound('move')
+
         # Handle pawn promotion
-        if piece.upper() == 'P' and (end_row == 0 or end_row == 7):
-            self.board[end_row][end_col] = 'Q' if piece.isupper() else 'q'
-            if piece.isupper():
-                tkinter.messagebox.showinfo("Promotion", "White Pawn promoted to Queen!")
+        if is_promotion:
+            #name of the piece the pawn was promoted to, for the message
+            name = chess.piece_name(chess.Piece.from_symbol(promotion).piece_type).capitalize()
+            #the turn has already switched, so if black is to move it was a white pawn
+            if self.turn == 'b':
+                show_message("Promotion", f"White Pawn promoted to {name}!")
             else:
-                tkinter.messagebox.showinfo("Promotion", "Black Pawn promoted to Queen!")
-            
-        
-        # Update turn
-        if self.turn == 'w':
-            self.turn = 'b'
-        else:
-            self.turn = 'w'
-        
+                show_message("Promotion", f"Black Pawn promoted to {name}!")
+
         # Check for check or checkmate after move
-        board = chess.Board(self.to_fen(self.board))
-        if board.is_checkmate():
-            if 'checkmate' in self.sounds:
-                self.sounds['checkmate'].play()
-            tkinter.messagebox.showinfo("Game Over", "Checkmate! AI wins!")
+        if self.state.is_checkmate:
+            self.play_sound('checkmate')
+            #the side that is checkmated is the one to move, if its black the player has won
+            if self.turn == 'b':
+                show_message("Game Over", "Checkmate! You win!")
+            else:
+                show_message("Game Over", "Checkmate! AI wins!")
+            self.save_game('1-0' if self.turn == 'b' else '0-1', 'normal')
             self.running = False
-        elif board.is_check():
-            if 'check' in self.sounds:
-                self.sounds['check'].play()
-
-    #function to convert the board state to FEN notation
-    def to_fen(self, board_state):
-
-        #an empty array to store the FEN rows
-        fen_rows = []
-        #iterating through each row of the board state
-        for row in board_state:
-            #converting the row to FEN format
-            fen_row = ''
-            #counting the number of empty squares in the row, initially set to 0
-            empty = 0
-
-            #iterating through each piece in the row
-            for piece in row:
-                #if the piece is empty, increment the empty counter
-                if piece == '':
-                    empty += 1 #incrementing the empty counter
-
-                #if the piece is not empty, we need to add it to the FEN row
-                else:
-                    #if there are empty squares before the piece, we need to add the count of empty squares to the FEN row
-                    if empty > 0:
-                        fen_row += str(empty) #adding the count of empty squares to the FEN row
-                        empty = 0 #resetting the empty counter to 0
-                        
-                    #adding the piece to the FEN row
-                    fen_row += piece
-            #if there are any empty squares left at the end of the row, we need to add the count of empty squares to the FEN row
-            #this is done to ensure that the FEN row is complete
-            if empty > 0:
-                #adding the count of empty squares to the FEN row
-                fen_row += str(empty)
-            
-            #adding the FEN row to the fen_rows array
-            fen_rows.append(fen_row)
-        
-        #joining the FEN rows with '/' to create the final FEN string and returning it
-        #the format of the FEN string is: 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1
-        #'w' or 'b' indicates the turn, and '-' indicates no castling rights
-        #if castling rights are applicable, we can add 'KQkq' to the FEN string
-        return '/'.join(fen_rows) + f" {'w' if self.turn == 'w' else 'b'} - - 0 1"
+        #if the side to move has no legal moves and is not in check, the game is a draw
+        elif self.state.is_stalemate:
+            show_message("Game Over", "Stalemate! It's a draw!")
+            self.save_game('1/2-1/2', 'normal')
+            self.running = False
+        elif self.state.in_check:
+            self.play_sound('check')
+
+        #the player's clock runs from the moment the AI's move is on the board (a replayed move is not played by anyone)
+        if self.running and self.turn == 'w' and not self.replay_moves:
+            self.game_clock.start('w')
+        self.update_caption()
 
     #function to make the AI move
     def ai_move(self):
-        #passing the current board state to the FEN function to convert it to FEN notation
-        #this is done to ensure that the AI can understand the current state of the board
-        board = chess.Board(self.to_fen(self.board))
-        #checking if the AI is in checkmate, if true, then the game is over
-        if board.is_checkmate():
-            #showing a message box to the user indicating that the they have won
-            tkinter.messagebox.showinfo("Game Over", "Checkmate! You win!")
-            self.running = False
+        #if the player's move ended the game (checkmate or stalemate), make_move has already stopped it
+        if not self.running:
             return
 
-        #checking if the AI is in stalemate, if true, then the game is a draw
-        if board.is_stalemate():
-            tkinter.messagebox.showinfo("Game Over", "Stalemate! It's a draw!")
-            self.running = False
+        #starting the search for the best move of the AI using Stockfish engine
+        #the engine is given the python-chess board that follows the game, so it receives every move played so far
+        #and can keep using what it found in the previous searches, game_id tells it when a new game has started
+        #using the chess.engine.Limit to limit the time taken by the engine to calculate the move
+        #the time manager works it out from the AI's clock, the number of the move and how much the evaluation moved,
+        #and caps the depth and nodes by the skill level
+        #the search runs in the background, run() checks the handle every frame and calls receive_ai_move when its done
+        self.ai_started = time.time()
+        self.game_clock.start('b')
+        limit = self.time_manager.limit('b', self.chess_board.fullmove_number, self.skill_level)
+        #the name of the engine is part of the key, so the moves of the built-in engine are never served as Stockfish's
+        #while the engine is still starting its name is not known yet, and the cache is not used for that move
+        self.ai_search_settings = None
+        if self.async_engine.ready():
+            self.ai_search_settings = analysis_cache.settings_key({"Skill Level": self.skill_level}, limit,
+                                                                  analysis_cache.engine_name(self.async_engine.engine))
+
+        #while the game is still in the opening book, the book move is played and the engine is not asked at all
+        if self.book is not None:
+            move = self.book.choose(self.chess_board, self.position_key())
+            if move is not None:
+                self.async_engine.stop_ponder()
+                self.receive_ai_move(move)
+                return
+
+        #if the engine has already answered this position with the same settings, its stored move is used and no search is needed
+        if self.cache is not None and self.ai_search_settings is not None:
+            stored = self.cache.get(self.chess_board, self.ai_search_settings, self.position_key())
+            if stored is not None:
+                #the ponder search is not needed either
+                self.async_engine.stop_ponder()
+                self.receive_ai_move(stored['move'])
+                return
+
+        self.ai_search = self.async_engine.search(self.chess_board, limit, game=self.game_id)
+        self.ai_search_started = time.perf_counter()
+        #the main loop sleeps while it waits, the search wakes it up with an event when it is done
+        self.ai_search.add_done_callback(lambda: pygame.event.post(pygame.event.Event(AI_SEARCH_DONE)))
+
+    #pondering on the player's time, the engine searches the position after the reply it expects
+    #if the player plays that reply, ai_move gets the answer straight away
+    #if the AI's move ended the game, make_move has already shown the message and stopped the game, so there is nothing to ponder
+    #while the hints are shown, the engine analyses the position for them instead, it can only run one search at a time
+    #the built-in engine does not ponder: it searches in python inside the game's own process, so pondering would keep
+    #a core busy (and hold the GIL against the drawing) the whole time the game should be asleep waiting for the player
+    def start_ponder(self, ponder):
+        if PONDER and self.running and not self.show_hints and not isinstance(self.async_engine.engine, builtin_engine.BuiltinEngine):
+            self.async_engine.ponder(self.chess_board, ponder, game=self.game_id)
+
+    #starting or stopping the hint analysis, so that it is always for the position on the board
+    #it runs while the hints are shown and it is the player's turn, and stops as soon as a move is started or the game ends
+    def update_hints(self):
+        wanted = self.show_hints and self.running and self.turn == 'w' and self.moving is None and self.state.moves and not self.replay_moves
+        #the analysis that is running is already for this position
+        if wanted and self.hint_stream is not None and self.hint_key == self.position_key():
+            return
+        self.stop_hints()
+        if not wanted:
+            return
+        self.async_engine.stop_ponder()
+        self.hint_board = self.chess_board.copy()
+        self.hint_key = self.position_key()
+        self.hint_started = time.perf_counter()
+        #the analysis has no limit, it deepens until it is stopped, and wakes the main loop up each time the lines change
+        self.hint_stream = self.async_engine.stream(self.chess_board, HINT_LINES, hint_overlay.shown_part,
+                                                    on_update=lambda: pygame.event.post(pygame.event.Event(HINTS_UPDATED)), game=self.game_id)
+
+    #stopping the hint analysis and taking the hints off the board
+    def stop_hints(self):
+        if self.hint_stream is not None:
+            self.hint_stream.cancel()
+            self.hint_stream = None
+        self.hints.clear()
+
+    #taking the new lines of the hint analysis, called by run() when the analysis says they changed
+    def receive_hints(self):
+        if self.hint_stream is None:
             return
+        lines = self.hint_stream.take_lines()
+        if lines is None:
+            return
+        #the time from starting the analysis to the first hint on the board
+        if self.profiler.enabled and not self.hints.arrows:
+            self.profiler.record('first hint', time.perf_counter() - self.hint_started)
+        self.hints.set_lines(self.hint_board, [line for line in lines if line is not None])
 
-        #calculating the best move for the AI using Stockfish engine
-        #using the chess.engine.Limit to limit the time taken by the engine to calculate the move, setting it to 0.1 seconds for quick response
-        #using play function to get the best move
-        result = self.engine.play(board, chess.engine.Limit(time=0.1))
-        #setting the move to the result of the engine's calculation
-        move = result.move
+    #function called by run() with the move the engine found
+    #ponder is the reply the engine expects from the player, it is searched while the player thinks
+    def receive_ai_move(self, move, ponder=None, info=None):
 
         #making the move on the board
         #converting the chess positions returned by Stockfish to row and column indices
@@ -617,12 +509,20 @@ class ChessInPython:
         end_row = 7 - (move.to_square // 8)
         end_col = move.to_square % 8
 
+        #the AI has its move, so its clock stops
+        self.game_clock.stop()
+
         #storing the AI move data to animate it later
-        #storing it as a dictionary with start and end positions, and the time of the move
+        #storing it as a dictionary with start and end positions, the piece a pawn is promoted to, and the time it is shown
+        #the move is shown MOVE_DELAY seconds after the AI started thinking, the time it spent searching counts towards the delay,
+        #so a search longer than the delay shows its move straight away
         self.ai_move_data = {
             'start': (start_row, start_col),
             'end': (end_row, end_col),
-            'time': time.time()
+            'promotion': chess.piece_symbol(move.promotion) if move.promotion else 'q',
+            'ponder': ponder,
+            'time': max(time.time(), self.ai_started + MOVE_DELAY),
+            'info': info or {}
         }
 
     #function to handle the click
@@ -640,42 +540,34 @@ class ChessInPython:
         if self.selected:
             #checking if the clicked position is a valid move
             if (row, col) in self.valid_moves:
-                #getting the piece at the selected position
-                piece = self.board[self.selected[0]][self.selected[1]]
-                
-                #animating the move
-                self.animate_move(self.selected, (row, col), piece)
-                
-                #making the piece move on the board
-                self.make_move(self.selected, (row, col))
-                #deselecting the piece after the move is made
+                #animating the move, the move is made on the board when the piece arrives
+                #and then the AI is asked for its move
+                self.animate_move(self.selected, (row, col), on_done=self.ai_move)
+                #deselecting the piece
                 self.selected = None
-                #as the piece has been moved, we need to reset the valid moves
+                #as the piece is being moved, we need to reset the valid moves
                 self.valid_moves = []
-                
-                #making the AI move after the player's move
-                self.ai_move()
             
             #if the clicked position is not a valid move
             else:
                 #setting the selected piece to the clicked position
                 self.selected = (row, col)
-                #calculating the valid moves for the newly selected piece
-                self.valid_moves = self.get_valid_moves(row, col)
+                #reading the valid moves for the newly selected piece from the moves worked out for this ply
+                self.valid_moves = self.state.moves_from(row, col)
 
         #if no piece is selected
         else:
             #setting the clicked position as the selected piece
             self.selected = (row, col)
-            #calculating the valid moves for the selected piece
-            self.valid_moves = self.get_valid_moves(row, col)
+            #reading the valid moves for the selected piece from the moves worked out for this ply
+            self.valid_moves = self.state.moves_from(row, col)
 
     #function to change the skill level of the AI
     def change_skill_level(self, level):
         #setting the skill level between 0 and 20
         self.skill_level = max(0, min(20, level))  #min is 0, max is 20
         #configuring the engine with the new skill level
-        self.engine.configure({"Skill Level": self.skill_level})
+        self.async_engine.configure({"Skill Level": self.skill_level})
 
     #screen to display the skill level of the AI, and allows the user to adjust it
     #this screen will be displayed when the user presses 'S' on the keyboard
@@ -717,6 +609,28 @@ class ChessInPython:
         #the green rectangle will be drawn on top of the grey rectangle, with the width calculated above
         pygame.draw.rect(self.screen, (0, 200, 0), (WIDTH//2 - bar_width//2, 230, level_width, bar_height))
 
+        #showing how well pondering works, how often the engine guessed the player's move and the search time it saved
+        engine = self.async_engine
+        ponder_text = info_font.render(f"Ponder hits: {engine.ponder_hits}/{engine.ponder_hits + engine.ponder_misses} ({engine.ponder_hit_rate():.0%})", True, (200, 200, 200))
+        self.screen.blit(ponder_text, (WIDTH//2 - ponder_text.get_width()//2, 290))
+        saved_text = info_font.render(f"Search time saved: {engine.saved_latency:.1f}s", True, (200, 200, 200))
+        self.screen.blit(saved_text, (WIDTH//2 - saved_text.get_width()//2, 320))
+
+        #showing how many of the AI's moves came from the opening book
+        if self.book is not None:
+            book_text = info_font.render(f"Book hits: {self.book.hits}, misses: {self.book.misses}", True, (200, 200, 200))
+            self.screen.blit(book_text, (WIDTH//2 - book_text.get_width()//2, 350))
+
+        #showing the time left on the clocks
+        clock = self.game_clock
+        clock_text = info_font.render(f"Clocks: You {time_control.format_time(clock.time_left('w'))}, AI {time_control.format_time(clock.time_left('b'))}"
+                                      f" ({clock.describe('w')} vs {clock.describe('b')})", True, (200, 200, 200))
+        self.screen.blit(clock_text, (WIDTH//2 - clock_text.get_width()//2, 470))
+
+        #showing how often the main loop woke up and how much CPU it used, when the game is idle it should be close to nothing
+        loop_text = info_font.render(self.loop_report(), True, (200, 200, 200))
+        self.screen.blit(loop_text, (WIDTH//2 - loop_text.get_width()//2, 440))
+
         restart_text = info_font.render("Press 'R' to restart the game", True, (200, 200, 200))
         self.screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, 390))
 
@@ -726,41 +640,307 @@ class ChessInPython:
         self.screen.blit(back_text, (WIDTH//2 - back_text.get_width()//2, 500))
 
     def reset_game(self):
+        #stopping the search of the AI if its still thinking, the move it finds would be for the old game
+        if self.ai_search is not None:
+            self.ai_search.cancel()
+            self.ai_search = None
+        #the ponder search and the hints are for a position of the old game as well
+        self.async_engine.stop_ponder()
+        self.stop_hints()
+        #the game that was being played is written to the archive as unfinished, before anything of it (e.g. the skill level) is reset
+        #the recorder then starts on the new one
+        self.save_game('*', 'abandoned')
     # Reset the board to initial position
-        self.board = self.create_board()
+        #this also starts a new move history and resets the turn to white, with a new game_id so the engine knows the old game is over
+        self.new_game()
         
         #resetting the skill level to 10
         self.skill_level = 10
         #reconfiguring the engine with the new skill level
-        self.engine.configure({"Skill Level": self.skill_level})
+        self.async_engine.configure({"Skill Level": self.skill_level})
         #resetting to no piece selected
         self.selected = None
         #resetting the valid moves to an empty array
         self.valid_moves = []
-        #resetting to white's turn
-        self.turn = 'w'  
         #resetting the AI move data to None
         self.ai_move_data = None
+        if self.recorder is not None:
+            self.recorder.start()
+        self.move_info = None
+        self.replay_moves = []
+        self.loaded_moves = 0
+        self.loaded_clocks = None
+        self.archived_result = None
+        #the clocks start again from the base time, with the player's clock running
+        self.game_clock.reset()
+        self.time_manager.reset()
+        self.game_clock.start('w')
+        self.update_caption()
+        #stopping the animations, the move that was being animated belongs to the old game
+        self.animator.clear()
+        self.moving = None
+        #the hints start again on the starting position, if they are shown
+        self.update_hints()
     
     #playing a sound effect when the game is reset
-        if 'restart' in self.sounds:
-            self.sounds['restart'].play()
+        self.play_sound('restart')
+
+    #ending the game when the time of a side ran out, color is the side that lost on time
+    def time_out(self, color):
+        self.game_clock.stop()
+        if color == 'w':
+            show_message("Game Over", "Out of time! AI wins!")
+        else:
+            show_message("Game Over", "AI ran out of time! You win!")
+        self.save_game('0-1' if color == 'w' else '1-0', 'time forfeit')
+        self.running = False
+
+    #writing the game to the PGN archive, result is '1-0', '0-1', '1/2-1/2' or '*' if it was not finished
+    #a game with no moves, or a replayed game with no new moves after the ones that were loaded, is not written
+    def save_game(self, result, termination):
+        if self.recorder is None or self.recorder.moves <= self.loaded_moves:
+            return
+        number = self.recorder.finish(result, termination, {'Black': f'AI (skill {self.skill_level})'})
+        self.loaded_moves = 0
+        print(f"Game saved to {PGN_ARCHIVE_PATH} as game {number}")
+
+    #setting up a game of the archive, number counts from 0 and negative numbers from the end
+    #with replay its moves are shown one by one (see replay_step), otherwise they are made straight away
+    #either way the game goes on from its last position when the moves are done, and it is recorded again as a new game
+    def load_archived_game(self, number, replay=False):
+        if self.archive is None or not -len(self.archive) <= number < len(self.archive):
+            print(f"There is no game {number} in {PGN_ARCHIVE_PATH}")
+            return
+        game = self.archive.game(number)
+        board, moves = pgn_archive.recorded_moves(game)
+        #a game that already ended (mate, stalemate, or a result such as a time forfeit) has nothing left to play
+        #a resume of it would just sit there, so it is refused and a new game starts, a replay shows the result at its end
+        self.archived_result = pgn_archive.game_result(game)
+        if self.archived_result is not None and not replay:
+            show_message("Game Over", f"Game {number} is already over ({self.archived_result}), it cannot be resumed. "
+                                      f"Use --replay {number} to watch it.")
+            self.archived_result = None
+            return
+        if board.fen() != chess.STARTING_FEN:
+            self.load_fen(board.fen())
+            self.recorder.start(board)
+        self.loaded_moves = len(moves)
+        #the clock of each side is the time it had left after its last move
+        self.loaded_clocks = {}
+        turn = board.turn
+        for move, clock, score, depth in moves:
+            if clock is not None:
+                self.loaded_clocks['w' if turn == chess.WHITE else 'b'] = clock
+            turn = not turn
+        if replay:
+            self.replay_moves = moves
+            return
+        for move, clock, score, depth in moves:
+            self.apply_move(bitboard.row_col(move.from_square), bitboard.row_col(move.to_square),
+                            chess.piece_symbol(move.promotion) if move.promotion else 'q')
+            self.recorder.record(move, clock, score, depth)
+
+    #showing the next move of the game that is replayed, the last one lets the game go on
+    def replay_step(self):
+        move, clock, score, depth = self.replay_moves[0]
+        self.move_info = (clock, score, depth)
+        self.replay_next = time.time() + REPLAY_DELAY
+        on_done = None
+        if len(self.replay_moves) == 1:
+            on_done = self.show_archived_result if self.archived_result is not None else self.start_play
+        self.animate_move(bitboard.row_col(move.from_square), bitboard.row_col(move.to_square),
+                          chess.piece_symbol(move.promotion) if move.promotion else 'q', on_done=self.replay_done(on_done))
+
+    #the function called when a replayed move has been made, the move is taken off the list only then,
+    #so the player cannot click and the hints do not start while the replay is going on
+    def replay_done(self, on_done):
+        def done():
+            self.replay_moves = self.replay_moves[1:]
+            if on_done is not None:
+                on_done()
+        return done
+
+    #the end of the replay of a game that was already over, there is no play to go on with
+    #a mate or stalemate was already shown by make_move when the last move was made, and that stopped the game
+    def show_archived_result(self):
+        if self.running:
+            show_message("Game Over", f"The replayed game is over ({self.archived_result}).")
+            self.running = False
+        self.archived_result = None
+
+    #starting the play, when the window is up or when an archived game has been set up
+    #the clocks get the time they had in the archived game, and the side to move starts thinking
+    def start_play(self):
+        self.game_clock.stop()
+        if self.loaded_clocks:
+            self.game_clock.remaining.update(self.loaded_clocks)
+            self.loaded_clocks = None
+        self.update_caption()
+        if not self.running or not self.state.moves:
+            return
+        if self.turn == 'b':
+            self.ai_move()
+        else:
+            self.game_clock.start('w')
+            self.update_hints()
+
+    #showing the time left on both clocks in the title of the window, it is updated after every move
+    def update_caption(self):
+        clock = self.game_clock
+        pygame.display.set_caption(f"Manual Python Chess - You {time_control.format_time(clock.time_left('w'))}"
+                                   f" | AI {time_control.format_time(clock.time_left('b'))}")
+
+    #seconds the idle loop can sleep before it has something to do, None if it can sleep until an event comes
+    def idle_timeout(self):
+        #the AI's move is shown at the time stored with it
+        if self.ai_move_data:
+            timeout = max(0.0, self.ai_move_data['time'] - time.time())
+        #the search posts an event when it is done, the timeout is only there in case that event is missed
+        elif self.ai_search is not None:
+            timeout = SEARCH_POLL_TIME
+        else:
+            timeout = None
+        #the next move of a replayed game is shown REPLAY_DELAY seconds after the last one
+        if self.replay_moves and self.moving is None:
+            left = max(0.0, self.replay_next - time.time())
+            timeout = left if timeout is None else min(timeout, left)
+        #the loop wakes up when the player's time runs out, to end the game
+        if self.game_clock.running == 'w':
+            left = max(0.0, self.game_clock.time_left('w'))
+            timeout = left if timeout is None else min(timeout, left)
+        #the numbers on the profiler overlay are updated every PROFILE_HUD_REFRESH seconds
+        if self.show_profile_hud:
+            timeout = PROFILE_HUD_REFRESH if timeout is None else min(timeout, PROFILE_HUD_REFRESH)
+        return timeout
+
+    #waiting for events, timeout is in seconds (None waits as long as it takes), returns the list of events
+    def wait_events(self, timeout):
+        if timeout is None:
+            event = pygame.event.wait()
+        else:
+            #pygame.event.wait gives NOEVENT when the time is up, a timeout of 0 would mean no timeout, so at least 1 ms
+            event = pygame.event.wait(max(1, int(timeout * 1000)))
+        events = [] if event.type == pygame.NOEVENT else [event]
+        #taking the other events that came at the same time
+        return events + pygame.event.get()
+
+    #the wake-ups and CPU time of the main loop, as a line of text
+    def loop_report(self):
+        wall = time.perf_counter() - self.loop_started
+        cpu = time.process_time() - self.loop_cpu_started
+        return f"Wake-ups: {self.wakeups} in {wall:.0f}s, CPU time: {cpu:.2f}s ({cpu / wall if wall else 0:.1%})"
+
+    #drawing one frame, the stats screen or the squares of the board that changed
+    def draw_frame(self):
+        #stats screen will be shown if the user presses 'S'
+        if self.show_stats_screen:
+            #display the stats screen
+            self.stats_screen()
+            #updating the whole display, the stats screen covers the board
+            self.update_display()
+            #the board has been drawn over, so every square is drawn again when the stats screen is closed
+            self.renderer.invalidate()
+        #otherwise, if the stats screen is not shown, only the squares that changed since the last frame are drawn
+        else:
+            #the pieces that are being animated are hidden on the board and drawn by the animator on top of it
+            hidden = self.animator.hidden()
+            #when the hints changed, the squares under the old ones are drawn again first
+            if self.hints.changed:
+                self.hints.invalidate(self.renderer)
+            dirty = self.renderer.render(self.position, self.valid_moves, hidden)
+            #the hints are drawn again only when they changed, or when a square under them was drawn again
+            #the squares under them are drawn fresh first, so the translucent arrows are not drawn over themselves
+            if self.hints.needs_redraw(dirty):
+                self.hints.invalidate(self.renderer)
+                dirty += self.renderer.render(self.position, self.valid_moves, hidden)
+                dirty += self.hints.draw(self.screen)
+            dirty += self.animator.draw(self.screen, self.renderer)
+            #the profiler overlay is drawn over the board
+            if self.show_profile_hud:
+                dirty.append(self.draw_profile_hud())
+            #updating only the parts of the display that were drawn, nothing at all if the board did not change
+            if dirty:
+                self.update_display(dirty)
+
+    #updating the display, the whole of it if rects is None, otherwise only the given rects
+    def update_display(self, rects=None):
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+
+    #drawing the overlay with the p50/p95/p99 of every timed stage in the top left corner, returns its rect
+    def draw_profile_hud(self):
+        now = time.perf_counter()
+        #the text is made again only every PROFILE_HUD_REFRESH seconds, the rest of the time the same image is drawn
+        if self.profile_hud is None or now - self.profile_hud_made >= PROFILE_HUD_REFRESH:
+            font = pygame.font.SysFont('couriernew', 14)
+            lines = [f"{'stage':<16}{'p50':>7}{'p95':>7}{'p99':>7}  ms"]
+            for stage, stats in self.profiler.summary().items():
+                lines.append(f"{stage:<16}{stats['p50']:7.2f}{stats['p95']:7.2f}{stats['p99']:7.2f}")
+            if not self.profiler.enabled:
+                lines.append("profiler off, press 'P'")
+            texts = [font.render(line, True, (255, 255, 255)) for line in lines]
+            #a translucent black box behind the text, so the board can still be seen
+            self.profile_hud = pygame.Surface((max(text.get_width() for text in texts) + 10, sum(text.get_height() for text in texts) + 10), pygame.SRCALPHA)
+            self.profile_hud.fill((0, 0, 0, 170))
+            y = 5
+            for text in texts:
+                self.profile_hud.blit(text, (5, y))
+                y += text.get_height()
+            self.profile_hud_made = now
+        rect = self.screen.blit(self.profile_hud, (5, 5))
+        #the squares under the overlay are drawn again next frame, so the overlay does not pile up on itself
+        self.renderer.invalidate_rect(rect)
+        return rect
 
     #function to run the game
     def run(self):
+        #the game does not use mouse motion, so moving the mouse over the window does not wake the loop up
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        #counting the wake-ups and CPU time from the start of the loop, so the time spent starting up is not in them
+        self.wakeups = 0
+        self.loop_started = time.perf_counter()
+        self.loop_cpu_started = time.process_time()
+
+        #drawing the first frame before waiting for any event, so the board shows straight away
+        self.draw_frame()
+        #the player's clock starts once the board is on the screen, or the AI starts thinking if a resumed game has black to move
+        #a replayed game starts the play when its last move has been shown
+        if not self.replay_moves:
+            self.start_play()
+        startup_step('first frame')
+        if STARTUP_REPORT:
+            print_startup_report()
 
         #while the game is running
         while self.running:
-            #setting the clock to tick at the defined FPS
-            self.clock.tick(FPS)
+            #while a piece is moving, the loop runs at the defined FPS
+            if self.animator.busy():
+                self.clock.tick(FPS)
+                events = pygame.event.get()
+            #otherwise it sleeps until an event comes, or until the next thing it is waiting for (see idle_timeout)
+            else:
+                events = self.wait_events(self.idle_timeout())
+            self.wakeups += 1
+            #when the work of this wake-up started, for the profiler, the waiting above is not part of it
+            frame_started = time.perf_counter()
 
             #for loop to handle events
-            for event in pygame.event.get():
+            for event in events:
                 #if the event is quit, then we will exit the game
                 if event.type == pygame.QUIT:
                     #game is closed, not running anymore
                     self.running = False
 
+                #the window was covered or minimised and shown again, so the whole board has to be drawn again
+                elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    self.renderer.invalidate()
+
+                #the lines of the hint analysis changed
+                elif event.type == HINTS_UPDATED:
+                    self.receive_hints()
+
                 #resetting the game if the user presses 'R'
                 elif event.type == pygame.KEYDOWN:
                     #if the 'R' key is pressed, reset the game
@@ -770,6 +950,18 @@ class ChessInPython:
                     #if the 'S' key is pressed, toggle the stats screen
                     if event.key == pygame.K_s:  
                         self.show_stats_screen = not self.show_stats_screen
+                    #if the 'H' key is pressed, show or hide the hints
+                    if event.key == pygame.K_h:
+                        self.show_hints = not self.show_hints
+                        self.update_hints()
+                    #if the 'P' key is pressed, turn the profiler and its overlay on or off
+                    if event.key == pygame.K_p:
+                        self.profiler.toggle()
+                        self.show_profile_hud = self.profiler.enabled
+                        #the overlay is wiped off the board when it is hidden
+                        if self.profile_hud is not None:
+                            self.renderer.invalidate_rect(self.profile_hud.get_rect(topleft=(5, 5)))
+                        self.profile_hud = None
 
                     #handling the stockfish skill level change with up and down arrow keys
                     #if the up arrow key is pressed, increase the skill level
@@ -796,68 +988,88 @@ class ChessInPython:
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     #if the left mouse button is clicked and the player is white, then we will handle the click
                     if event.button == 1:  
-                        #if the turn is white
-                        if self.turn == 'w':
+                        #if the turn is white, and the player's last move is not still being animated
+                        if self.turn == 'w' and self.moving is None and not self.replay_moves:
                             #handle the click  
                             self.handle_click(event.pos)
 
 
+            if self.profiler.enabled:
+                self.profiler.record('events', time.perf_counter() - frame_started)
+
+            #checking if the AI has finished thinking, this does not wait for the engine
+            if self.ai_search is not None and self.ai_search.done():
+                if self.profiler.enabled:
+                    self.profiler.record('engine search', time.perf_counter() - self.ai_search_started)
+                result = self.ai_search.result()
+                #the result is None if the search was cancelled
+                if result is not None and result.move is not None:
+                    #remembering the reply, the board has not changed yet so it is still the position that was searched
+                    #a ponder hit searched with no limit for however long the player thought, so it is not a search with
+                    #the settings of the key, and it is not stored under them
+                    if self.cache is not None and self.ai_search_settings is not None and not self.ai_search.pondered:
+                        self.cache.put(self.chess_board, self.ai_search_settings, result.move, self.ai_search.info, self.position_key())
+                    self.receive_ai_move(result.move, result.ponder, self.ai_search.info)
+                    #the time manager gives the next move more time if the evaluation jumped
+                    self.time_manager.record(self.ai_search.info)
+                self.ai_search = None
+
+            #the game is lost by the side whose time ran out
+            if self.running and self.game_clock.flagged() is not None:
+                self.time_out(self.game_clock.flagged())
+
             #processing AI move if it's the AI's turn
-            #if the AI move data is valid and enough time has passed, which is 1 second as a delay
-            if self.ai_move_data and time.time() - self.ai_move_data['time'] >= 1.0:
+            #if the AI move data is valid and the time it is shown has come
+            if self.ai_move_data and time.time() >= self.ai_move_data['time']:
                 #assigning the start position as the start position of the AI move data from the ai_move_data dictionary
                 start = self.ai_move_data['start']
                 #assigning the end position as the end position of the AI move data from the ai_move_data dictionary
                 end = self.ai_move_data['end']
-                #getting the piece at the start position, i.e, the piece that the AI is moving
-                piece = self.board[start[0]][start[1]]
-                
-                #animating the AI move
-                #this will animate the move of the piece from start to end position
-                self.animate_move(start, end, piece)
-                
-                #making the AI move on the board
-                self.make_move(start, end)
+                #the reply the engine expects from the player, searched while the player thinks
+                ponder = self.ai_move_data['ponder']
+
+                #the move is recorded with the time left on the AI's clock and the evaluation of its search
+                info = self.ai_move_data['info']
+                self.move_info = (self.game_clock.time_left('b'), info.get('score'), info.get('depth'))
+
+                #animating the AI move, the move is made on the board when the piece arrives
+                #and then the engine starts pondering
+                self.animate_move(start, end, self.ai_move_data['promotion'], on_done=lambda: self.start_ponder(ponder))
                 
-                #setting the ai_move_data to None after the move is made
+                #setting the ai_move_data to None once the move is started
                 #this is done to ensure that the AI does not make the same move again
                 self.ai_move_data = None
-                
-                #redrawing the board and pieces after the AI move
-                self.draw_board()
-                #using placing_pieces to place the pieces on the board after the AI move
-                #this will redraw the pieces on the board after the AI move, making the editions visible
-                self.placing_pieces() 
-                #updating the screen to show the changes made by the AI 
-                pygame.display.update()
-                
-                #checking if the AI's move results in checkmate
-                #converting the board to FEN notation to check for checkmate
-                board = chess.Board(self.to_fen(self.board))
-                #if the board is in checkmate state, then we will show a message box indicating that the AI has won
-                if board.is_checkmate():
-                    #if checkmate, playing the checkmate sound effect 
-                    if 'checkmate' in self.sounds:
-                        self.sounds['checkmate'].play()
-                    tkinter.messagebox.showinfo("Game Over", "Checkmate! AI wins!")
-                    self.running = False
 
-            #stats screen will be shown if the user presses 'S'
-            if self.show_stats_screen:
-                #display the stats screen
-                self.stats_screen()
-            #otherwise, if the stats screen is not shown, we will draw the chess board and place the pieces on it
-            else:
-                #draw the chess board
-                self.draw_board()
-                #placing the pieces on the board
-                self.placing_pieces()
+            #showing the next move of a replayed game, once the last one has been made on the board
+            if self.replay_moves and self.moving is None and time.time() >= self.replay_next:
+                self.replay_step()
 
-            #updating the display
-            pygame.display.update()
+            #advancing the animations, a move whose animation is over is made on the board here
+            self.animator.step()
+
+            #drawing what changed
+            self.draw_frame()
+            if self.profiler.enabled:
+                self.profiler.record('frame', time.perf_counter() - frame_started)
         
-        #function to quit the game and stockfish engine
-        self.engine.quit()
+        #a game that was still going on when the window was closed is written to the archive as unfinished, it can be resumed later
+        self.save_game('*', 'unterminated')
+
+        #printing how often the main loop woke up and how much CPU it used
+        print(self.loop_report())
+        #writing the timings of the profiler, if it was turned on
+        if PROFILE_PATH and self.profiler.timings:
+            self.profiler.export(PROFILE_PATH)
+            print(f"Profile written to {PROFILE_PATH}")
+        #function to quit the game and stockfish engine, a search that is still running is stopped first
+        self.async_engine.quit()
+        #saving and closing the cache of the AI's replies
+        if self.cache is not None:
+            self.cache.close()
+        #closing the opening book, and printing how often it had a move
+        if self.book is not None:
+            print(f"Opening book hits: {self.book.hits}, misses: {self.book.misses}")
+            self.book.close()
         #quitting pygame and exiting the game
         pygame.quit()
         #terminating the program
@@ -865,6 +1077,5 @@ class ChessInPython:
 
 #starting the game
 if __name__ == '__main__':
-    load_images()
     game = ChessInPython()
     game.run()
@@ -0,0 +1,213 @@
+#the rules of the game, without the window, the sounds, the message boxes or the engine
+#ChessInPython in chess_game.py is built on top of this class, and the headless tools use it on its own,
+#so they play by exactly the same rules as the game you see on the screen
+
+import collections
+import chess
+import bitboard
+import position
+
+
+#making a class for the rules of the game
+class ChessRules:
+
+    def __init__(self):
+        #setting up the starting position
+        self.new_game()
+
+    #setting up the starting position with an empty move history
+    def new_game(self):
+        #intialising the chess board, the pieces, the side to move, the castling rights, en passant square and clocks
+        self.position = self.create_board()
+        #a python-chess board that is kept in sync with self.position, every move made is pushed onto it
+        #it holds the full move history, castling rights, en passant square and move clocks
+        #stockfish is given this board, so it receives the real moves of the game instead of a fresh FEN every time
+        self.chess_board = chess.Board()
+        #a new object for every game, python-chess tells the engine a new game has started when it changes
+        self.game_id = object()
+        #working out the bitboards and the position state of the starting position
+        self.setup_bitboards()
+
+    #setting up the position of a FEN string with an empty move history, used to start games from an opening
+    def load_fen(self, fen):
+        self.chess_board = chess.Board(fen)
+        self.game_id = object()
+        self.position = position.Position.from_fen(fen)
+        self.setup_bitboards()
+
+    #the side to move as 'w' or 'b', the way the game has always stored the turn, it is kept by the position
+    @property
+    def turn(self):
+        return 'w' if self.position.turn == bitboard.WHITE else 'b'
+
+    #building the bitboards from the position, when a game starts
+    #after that apply_move makes every move on them in place, so they and their zobrist key are never built from the position again
+    def setup_bitboards(self):
+        #bitboards of the position, the move generation works on these instead of walking the squares
+        self.bitboards = self.position.bitboards()
+        #how many times each position (by its zobrist key) has been on the board in this game, for repetition draws
+        self.repetitions = collections.Counter()
+        self.update_state()
+
+    #working out the position state again, after a move has been made on the bitboards
+    def update_state(self):
+        #legal moves and check/checkmate/stalemate of the side to move, worked out once per move
+        self.state = bitboard.PositionState(self.bitboards, self.position.turn)
+        self.repetitions[self.bitboards.key] += 1
+
+    #the zobrist key of the position, the same number chess.polyglot.zobrist_hash gives for self.chess_board
+    #caches, the opening book and repetition checks can use it instead of building a FEN string or hashing the board again
+    def position_key(self):
+        return self.bitboards.key
+
+    #checking if the position on the board has been there count times in this game
+    #a position only comes back if no pawn moved and nothing was captured in between, so counting over the whole game
+    #gives the same answer as python-chess's is_repetition, without making and taking back moves on the move stack
+    def is_repetition(self, count=3):
+        return self.repetitions[self.bitboards.key] >= count
+
+    #the starting position, with white to move
+    #the pieces of white are uppercase letters ('R', 'N', ...) and the pieces of black lowercase, the same as FEN
+    def create_board(self):
+        return position.Position.starting()
+
+    #this function checks the moves in the horizontal/vertical direction, i.e, straight in any horizontal/vertcal direction
+    #along with the initial row and col, it also takes the directions of the piece
+    #WE WILL USE THIS FUNCTION FOR ROOK, BISHOP, QUEEN MOVES
+    def get_linear_moves(self, row, col, directions):
+        #the attacks along the directions are looked up on the bitboards, the ray stops at the first piece it hits
+        attacks = bitboard.slider_attacks(bitboard.square_of(row, col), self.bitboards.occupied, directions)
+        #removing the squares taken by our own pieces, the enemy piece that blocks a ray can be captured
+        own = self.bitboards.occupied_by[self.position.turn]
+        #converting the bitboard back into a list of (row, col) and returning it
+        return bitboard.to_cells(attacks & ~own)
+
+    #function for pawn moves
+    def get_pawn_moves(self, row, col):
+        #the color of the pawn is the color of its piece code
+        color = self.position.color_at(bitboard.square_of(row, col))
+        #the bitboards handle the single step, the double step from the starting row, the diagonal captures and en passant
+        moves_made = self.bitboards.pawn_targets(bitboard.square_of(row, col), color)
+        #return the moves made
+        return bitboard.to_cells(moves_made)
+
+    #checking the rook's moves
+    def get_rook_moves(self, row, col):
+        #as we know, rook moves either vertically or horizontally, in a straight line
+        #so the directions will be (-1, 0) [down, vertical], (1, 0) [up, vertical], (0, -1) [left, horizontal], (0, 1) [right, horizontal] 
+        #this covers all possible directions it can move in
+        #passing it in linear moves func, then returning the result
+        return self.get_linear_moves(row, col, [(-1, 0), (1, 0), (0, -1), (0, 1)])
+
+    #checking bishop's moves
+    def get_bishop_moves(self, row, col):
+        #bishop moves diagonally 
+        #the possible moves can be (-1, -1) [bottom-left], (-1, 1) [bottom-right], (1, -1) [top-left], (1, 1) [top-right]
+        #this covers all the possible moves of bishop
+        #passing it in linear moves func, then returning the result
+        return self.get_linear_moves(row, col, [(-1, -1), (-1, 1), (1, -1), (1, 1)])
+
+    #checking queen's moves
+    def get_queen_moves(self, row, col):
+        #queen is a mix of bishop and rook moves, it can straight or diagonally in any direction
+        #possible directions can be rook moves --> [(-1, 0), (1, 0), (0, -1), (0, 1)], bishop moves --> [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+        #passing the combination in linear moves func, and returning the result
+        return self.get_linear_moves(row, col, [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)])
+
+    #checking king's moves
+    def get_king_moves(self, row, col):
+        #king moves one step in any direction, these squares are precomputed in KING_ATTACKS
+        #removing the squares taken by our own pieces, it can capture anything else
+        own = self.bitboards.occupied_by[self.position.turn]
+        moves_made = bitboard.KING_ATTACKS[bitboard.square_of(row, col)] & ~own
+        #adding the castling moves, if the castling rights are still there and the way is free
+        moves_made |= self.bitboards.castling_targets(self.position.turn)
+        #retrning the moves as a list of (row, col)
+        return bitboard.to_cells(moves_made)
+
+    #checking tge knight's moves
+    def get_knight_moves(self, row, col):
+        #knight moves in an L shape, the squares it can jump to are precomputed in KNIGHT_ATTACKS
+        #the target is allowed if its empty or of opponent's color
+        own = self.bitboards.occupied_by[self.position.turn]
+        moves_made = bitboard.KNIGHT_ATTACKS[bitboard.square_of(row, col)] & ~own
+        return bitboard.to_cells(moves_made)
+
+    #function to calculate the valid moves of each piece
+    def get_valid_moves(self, row, col):
+        #selecting the piece at the passed coordinates 
+        piece = self.position.piece(row, col)
+        #if no piece is found at the selected coordinate, or the piece found is of opponent's, then return nothing
+        #this skips the part, returning an empty array
+        if not piece or self.position.color_at(bitboard.square_of(row, col)) != self.position.turn:
+            return []
+        
+        #defining an empty array to store all the moves
+        total_moves = []
+        
+        #if the piece has a string value of 'p' or 'P', then its a pawn
+        if piece.upper() == 'P':
+            total_moves = self.get_pawn_moves(row, col)
+        #if the piece has a string value of 'r' or 'R', then its a rook  
+        elif piece.upper() == 'R':
+            total_moves = self.get_rook_moves(row, col)
+        #if the piece has a string value of 'n' or 'N', then its a knight
+        elif piece.upper() == 'N':
+            total_moves = self.get_knight_moves(row, col)
+        #if the piece has a string value of 'b' or 'B', then its a bishop
+        elif piece.upper() == 'B':
+            total_moves = self.get_bishop_moves(row, col)
+        #if the piece has a string value of 'q' or 'Q', then its a queen
+        elif piece.upper() == 'Q':  
+            total_moves = self.get_queen_moves(row, col)
+        #if the piece has a string value of 'k' or 'K', then its a king
+        elif piece.upper() == 'K':
+            total_moves = self.get_king_moves(row, col)
+
+        #we collected all of the moves that our pieces can make, however, only a fraction of those moves will be legal
+        #a move is legal if our king is not attacked after it is made
+        #the move is made and taken back in place on the bitboards, no board copy or FEN string is needed
+        start_square = bitboard.square_of(row, col)
+        legal_moves = []
+        #looping through the array of total_moves
+        for move in total_moves:
+            if self.bitboards.is_legal(start_square, bitboard.square_of(*move)):
+                legal_moves.append(move)
+
+        return legal_moves
+    
+    #function to make a move on the position, the python-chess board and the bitboards, and to switch the turn
+    #promotion is the lowercase letter of the piece a pawn is promoted to
+    #returns whether the move was a capture and whether it was a promotion
+    def apply_move(self, start, end, promotion='q'):
+
+        #start and end are tuples of (row, col), the position and the bitboards number the squares a1 = 0 ... h8 = 63
+        start_square, end_square = bitboard.square_of(*start), bitboard.square_of(*end)
+
+        #a pawn reaching the first or the last row is promoted
+        is_promotion = self.position.piece(*start) in ('P', 'p') and end[0] in (0, 7)
+        if not is_promotion:
+            promotion = None
+
+        #making the move on the position, this moves the rook when castling, removes the pawn captured en passant,
+        #promotes the pawn and switches the turn
+        undo = self.position.make_move(start_square, end_square, promotion)
+        #the move captured something if there was a piece on the square it was taken from
+        is_capture = undo[1] != position.EMPTY
+
+        #pushing the same move onto the python-chess board and the bitboards, so they stay in sync with self.position
+        #push_move updates the castling rights, the en passant square and the zobrist key of the bitboards as well
+        self.chess_board.push(chess.Move(start_square, end_square, chess.Piece.from_symbol(promotion).piece_type if is_promotion else None))
+        self.bitboards.push_move(start_square, end_square, promotion)
+
+        #the bitboards already have the move, so only the position state is worked out again
+        self.update_state()
+
+        return is_capture, is_promotion
+
+    #function to convert the position to FEN notation
+    #the format of the FEN string is: 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1
+    #'w' or 'b' indicates the turn, 'KQkq' the castling rights ('-' if there are none), then the en passant square,
+    #the number of half moves since the last capture or pawn move, and the number of the full move
+    def to_fen(self):
+        return self.position.fen()
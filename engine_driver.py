@@ -0,0 +1,296 @@
+#running the chess engine without blocking the game
+#the search happens on a worker thread, the game gets a handle back straight away and checks it every frame
+#this keeps the window drawing and reacting to input while stockfish thinks
+#it can also ponder, i.e. search the reply it expects from the player while the player is still thinking,
+#and stream an analysis with several lines (MultiPV) for the hints, handing every new line to the game as it arrives
+
+import time
+import threading
+import concurrent.futures
+
+
+#handle of one search that is running (or waiting to run) on the worker thread
+class SearchHandle:
+
+    def __init__(self):
+        #the future of the worker thread, set by AsyncEngine.search
+        self.future = None
+        #the python-chess analysis of the running search, used to stop it early
+        self.analysis = None
+        #set when the search has been told to stop, the engine then gives its best move so far
+        self.stopped = False
+        #set when the search is cancelled, its result is thrown away
+        self.cancelled = False
+        #the last info the engine sent during the search (score, depth, ...), filled in when the search is done
+        self.info = {}
+        #set on a ponder hit, the search then ran with no limit and was stopped on a timer, not searched with the limit asked for
+        self.pondered = False
+        #the lock makes sure a cancel never happens between checking cancelled and starting the analysis
+        self.lock = threading.Lock()
+
+    #checking if the search has finished, this never blocks
+    def done(self):
+        return self.future.done()
+
+    #calling fn (with no arguments) when the search is done
+    #it is called from the worker thread, or straight away if the search is already done
+    def add_done_callback(self, fn):
+        self.future.add_done_callback(lambda future: fn())
+
+    #the chess.engine.BestMove found by the search (it has .move and .ponder), or None if it was cancelled
+    #this blocks until the search is done, so check done() first
+    def result(self):
+        if self.cancelled:
+            return None
+        return self.future.result()
+
+    #telling the engine to stop searching and give its best move so far, the result is kept
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            if self.analysis is not None:
+                self.analysis.stop()
+
+    #stopping the search, the engine is told to stop and the result is thrown away
+    def cancel(self):
+        self.cancelled = True
+        self.stop()
+
+
+#handle of a streaming analysis (see AsyncEngine.stream), it keeps the latest info of every line while the engine deepens
+class StreamHandle(SearchHandle):
+
+    def __init__(self, multipv, shown):
+        SearchHandle.__init__(self)
+        self.multipv = multipv
+        #shown(info) gives the part of a line the game shows, a new line is only handed on when this part changes
+        self.shown = shown
+        #the latest info of each line, best line first, and what was shown of each
+        self.lines = []
+        self.shown_lines = []
+        #set when the lines changed and the game has not taken them yet, so one wake-up is enough for many changes
+        self.pending = False
+
+    #taking the lines that changed since the last call, returns None if nothing changed (never blocks)
+    def take_lines(self):
+        with self.lock:
+            if not self.pending:
+                return None
+            self.pending = False
+            return list(self.lines)
+
+    #storing a line the engine sent, returns True if what is shown of the lines changed and the game has to be told
+    def _update(self, info):
+        index = info.get('multipv', 1) - 1
+        shown = self.shown(info)
+        with self.lock:
+            while len(self.lines) <= index:
+                self.lines.append(None)
+                self.shown_lines.append(None)
+            self.lines[index] = info
+            if shown == self.shown_lines[index]:
+                return False
+            self.shown_lines[index] = shown
+            #if the game has not taken the last change yet, it will get this one with it
+            wake = not self.pending
+            self.pending = True
+            return wake
+
+
+#wrapper around a chess.engine.SimpleEngine that runs its searches on a worker thread
+class AsyncEngine:
+
+    #engine is the engine process, or None if it is started later with launch()
+    def __init__(self, engine=None):
+        #the engine process, None until launch() has started it
+        self.engine = engine
+        #the future of the job that starts the engine, see launch()
+        self.launched = None
+        #UCI options set with configure() before the engine was up, they are set as soon as it starts
+        self.pending_options = {}
+        #guards engine and pending_options, which are set on the worker thread by launch and read by configure
+        self.lock = threading.Lock()
+        #one worker thread, the engine can only run one search at a time anyway
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='engine')
+        #the last search that was started, so it can be cancelled when the engine is closed
+        self.current = None
+
+        #PONDERING
+        #the search of the expected reply that runs while the player thinks, None if not pondering
+        self.ponder_handle = None
+        #the board the ponder search is looking at (the game board with the expected reply already played)
+        self.ponder_board = None
+        #when the ponder search started
+        self.ponder_started = 0.0
+        #how many times the player played the expected reply (hit) or something else (miss)
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        #seconds of search time that did not have to be waited for because of ponder hits
+        self.saved_latency = 0.0
+
+    #starting the engine process in the background, open_engine is a function that starts it and returns the engine
+    #starting the engine is the first job of the worker thread, so the searches that are started before it is up
+    #simply wait for it in the queue, and the game can show the board without waiting for the engine
+    def launch(self, open_engine):
+        self.launched = self.executor.submit(self._launch, open_engine)
+        return self.launched
+
+    #the part of launch() that runs on the worker thread
+    def _launch(self, open_engine):
+        engine = open_engine()
+        with self.lock:
+            if self.pending_options:
+                engine.configure(self.pending_options)
+                self.pending_options = {}
+            self.engine = engine
+        return engine
+
+    #true once the engine process is up
+    def ready(self):
+        return self.engine is not None
+
+    #setting UCI options of the engine (e.g. Skill Level), if the engine is not up yet they are set when it starts
+    #python-chess cancels a running command when options are sent, so a ponder search or a hint analysis would be ended
+    #without anyone knowing, instead the options are set on the worker thread, after the search that is running now,
+    #and before the next one that is started
+    def configure(self, options):
+        with self.lock:
+            self.pending_options.update(options)
+            if self.engine is None:
+                return
+        self.executor.submit(self._configure)
+
+    #the part of configure() that runs on the worker thread, the options of several calls are set together
+    def _configure(self):
+        with self.lock:
+            options, self.pending_options = self.pending_options, {}
+        if options:
+            self.engine.configure(options)
+
+    #starting a search of the board, returns a SearchHandle straight away
+    #the board is copied, so the game can keep changing its own board while the engine thinks
+    #if the engine was pondering on this exact position (ponder hit), the ponder search is reused instead
+    def search(self, board, limit, game=None):
+        if self.ponder_handle is not None:
+            handle = self._resolve_ponder(board, limit)
+            if handle is not None:
+                return handle
+        handle = SearchHandle()
+        handle.future = self.executor.submit(self._search, handle, board.copy(), limit, game)
+        self.current = handle
+        return handle
+
+    #starting to ponder, i.e. searching the position after the expected reply of the player, with no limit
+    #board is the game board with the player to move, expected_move is the ponder move the engine gave with its last move
+    def ponder(self, board, expected_move, game=None):
+        self.stop_ponder()
+        if expected_move is None or expected_move not in board.legal_moves:
+            return
+        ponder_board = board.copy()
+        ponder_board.push(expected_move)
+        #with no limit the engine searches until it is told to stop
+        self.ponder_handle = self.search(ponder_board, None, game)
+        self.ponder_board = ponder_board
+        self.ponder_started = time.time()
+
+    #streaming an analysis of the board with multipv lines and no limit, it runs until the handle is stopped or cancelled
+    #shown(info) is the part of a line the game shows (e.g. the first moves of the pv and the score), and on_update
+    #is called from the worker thread (with no arguments) when that part of any line changes, to wake the game up
+    #the lines are read with handle.take_lines(), the engine keeps deepening in the meantime
+    def stream(self, board, multipv, shown, on_update=None, game=None):
+        handle = StreamHandle(multipv, shown)
+        handle.future = self.executor.submit(self._stream, handle, board.copy(), multipv, on_update, game)
+        self.current = handle
+        return handle
+
+    #stopping the ponder search and throwing its result away
+    def stop_ponder(self):
+        if self.ponder_handle is not None:
+            self.ponder_handle.cancel()
+        self.ponder_handle = None
+        self.ponder_board = None
+
+    #share of the player's moves the engine guessed right while pondering
+    def ponder_hit_rate(self):
+        total = self.ponder_hits + self.ponder_misses
+        return self.ponder_hits / total if total else 0.0
+
+    #deciding what happens to the ponder search now that the player has moved
+    #returns the ponder search on a hit, or None on a miss (the caller then starts a fresh search)
+    def _resolve_ponder(self, board, limit):
+        handle = self.ponder_handle
+        #the ponder search is no longer pondering, whatever happens next
+        self.ponder_handle = None
+        if board.fen() != self.ponder_board.fen():
+            #ponder miss, the player played something else, so the search is for the wrong position
+            self.ponder_misses += 1
+            handle.cancel()
+            return None
+
+        #ponder hit, the engine has been searching this position since the player started thinking
+        self.ponder_hits += 1
+        handle.pondered = True
+        pondered = time.time() - self.ponder_started
+        #the search needs to run for as long as a normal search would, the time spent pondering counts towards it
+        wanted = limit.time if limit is not None and limit.time is not None else 0.0
+        self.saved_latency += min(pondered, wanted)
+        remaining = wanted - pondered
+        if remaining <= 0:
+            #it has already searched longer than a normal search, so its best move is taken right away
+            handle.stop()
+        else:
+            timer = threading.Timer(remaining, handle.stop)
+            timer.daemon = True
+            timer.start()
+        return handle
+
+    #the part of the search that runs on the worker thread
+    def _search(self, handle, board, limit, game):
+        #the engine failed to start, its error is raised here so the game gets it from the result of the search
+        if self.engine is None:
+            self.launched.result()
+        with handle.lock:
+            #the search may have been cancelled before the worker got to it
+            if handle.cancelled:
+                return None
+            #analysis() is used instead of play() because an analysis can be stopped from another thread
+            handle.analysis = self.engine.analysis(board, limit, game=game)
+            #the search may have been told to stop before the analysis existed
+            if handle.stopped:
+                handle.analysis.stop()
+        with handle.analysis:
+            #waiting for the engine to reach the limit (or be stopped), this gives the bestmove of the engine
+            best = handle.analysis.wait()
+            handle.info = dict(handle.analysis.info)
+            return best
+
+    #the part of stream() that runs on the worker thread
+    def _stream(self, handle, board, multipv, on_update, game):
+        if self.engine is None:
+            self.launched.result()
+        with handle.lock:
+            if handle.cancelled:
+                return None
+            handle.analysis = self.engine.analysis(board, None, multipv=multipv, game=game)
+            if handle.stopped:
+                handle.analysis.stop()
+        with handle.analysis:
+            #every info the engine sends arrives here as soon as it is sent, the search keeps going
+            for info in handle.analysis:
+                if handle.cancelled:
+                    break
+                #the infos about the move being searched (currmove, ...) have no pv, only the lines are kept
+                if 'pv' not in info:
+                    continue
+                if handle._update(info) and on_update is not None:
+                    on_update()
+        return None
+
+    #stopping any running search and closing the engine process
+    def quit(self):
+        self.stop_ponder()
+        if self.current is not None:
+            self.current.cancel()
+        self.executor.shutdown(wait=True)
+        if self.engine is not None:
+            self.engine.quit()
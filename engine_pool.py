@@ -0,0 +1,124 @@
+#a pool of engine processes that are started once and lent out to games
+#starting stockfish takes a while, so instead of starting and closing an engine for every game,
+#the pool keeps a number of warm engine processes and hands them out one game (or one search) at a time
+#
+#usage:
+#   pool = EnginePool('path/to/stockfish', size=8, options={'Threads': 1, 'Hash': 64})
+#   with pool.lease({'Skill Level': 5}) as engine:
+#       engine.play(board, chess.engine.Limit(time=0.1))
+#   pool.close()
+
+import os
+import queue
+import threading
+import contextlib
+import chess.engine
+import builtin_engine
+
+
+#pool of UCI engine processes
+class EnginePool:
+
+    #command is the path of the engine, size is the number of processes (one per core if not given)
+    #options are the UCI options every engine gets, e.g. Threads and Hash
+    def __init__(self, command, size=None, options=None):
+        self.command = command
+        self.size = size or os.cpu_count() or 1
+        self.options = dict(options or {})
+        #the engines that are not lent out at the moment
+        self.idle = queue.Queue()
+        #every engine of the pool, lent out or not, so they can all be closed at the end
+        self.engines = []
+        #the UCI options each engine currently has set, keyed by id() of the engine
+        self.applied = {}
+        #the list of engines is changed from the threads that give engines back, so it is guarded by a lock
+        self.lock = threading.Lock()
+        #how many engine processes had to be started again because they crashed
+        self.restarts = 0
+        self.closed = False
+
+        #starting all the engines up front, so the first games do not wait for them
+        for _ in range(self.size):
+            self.idle.put(self._spawn())
+
+    #starting a new engine process with the options of the pool, the command 'builtin' gives the built-in python engine
+    def _spawn(self):
+        engine = builtin_engine.open_engine(self.command)
+        engine.configure(self.options)
+        with self.lock:
+            self.engines.append(engine)
+            self.applied[id(engine)] = dict(self.options)
+        return engine
+
+    #closing an engine that crashed (or is being replaced) and starting a new one in its place
+    def _replace(self, engine):
+        with self.lock:
+            if engine in self.engines:
+                self.engines.remove(engine)
+            self.applied.pop(id(engine), None)
+            self.restarts += 1
+        try:
+            engine.close()
+        except Exception:
+            #the process is already dead, there is nothing more to close
+            pass
+        return self._spawn()
+
+    #setting the options of one lease on an engine
+    #options that an earlier lease changed but this one does not ask for are put back to the pool's value or the engine default
+    def _apply(self, engine, options):
+        wanted = dict(self.options)
+        wanted.update(options or {})
+        applied = self.applied[id(engine)]
+        changes = {}
+        for name in applied:
+            if name not in wanted and name in engine.options:
+                changes[name] = engine.options[name].default
+        for name, value in wanted.items():
+            if applied.get(name) != value:
+                changes[name] = value
+        if changes:
+            engine.configure(changes)
+        self.applied[id(engine)] = wanted
+
+    #lending out an engine for a with block, with the given UCI options (e.g. Skill Level) set for this lease
+    #if the pool is empty, this waits until an engine is given back (or timeout seconds pass, then queue.Empty is raised)
+    #an engine that crashes is replaced by a new process when it is given back
+    @contextlib.contextmanager
+    def lease(self, options=None, timeout=None):
+        if self.closed:
+            raise RuntimeError('engine pool is closed')
+        engine = self.idle.get(timeout=timeout)
+        try:
+            #checking the engine is still alive before lending it out, a dead one is replaced straight away
+            try:
+                engine.ping()
+                self._apply(engine, options)
+            except chess.engine.EngineTerminatedError:
+                engine = self._replace(engine)
+                self._apply(engine, options)
+            yield engine
+        except chess.engine.EngineTerminatedError:
+            #the engine died during the lease, so a new process goes back into the pool
+            engine = self._replace(engine)
+            raise
+        finally:
+            self.idle.put(engine)
+
+    #closing every engine of the pool
+    def close(self):
+        self.closed = True
+        with self.lock:
+            engines = list(self.engines)
+            self.engines = []
+        for engine in engines:
+            try:
+                engine.quit()
+            except chess.engine.EngineTerminatedError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
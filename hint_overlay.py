@@ -0,0 +1,131 @@
+#the hints: the best moves the engine finds for the player, drawn on the board as arrows with a small panel of the lines
+#the lines come from a streaming analysis (AsyncEngine.stream in engine_driver.py) that keeps deepening while the player thinks,
+#the first ones arrive within a few tens of milliseconds and the deeper ones replace them as they come
+#
+#the overlay is only drawn when the lines change, or when a square under it has been drawn again by the renderer
+#the rest of the time the arrows stay on the screen as they are and nothing is drawn
+
+import pygame
+import bitboard
+
+#colors of the arrows, best line first, the other lines are fainter
+ARROW_COLORS = [(30, 110, 230, 200), (30, 110, 230, 130), (30, 110, 230, 80)]
+#how many moves of each line are written in the panel
+PV_MOVES = 4
+
+
+#the part of a line the overlay shows: the first moves of its pv, its score and the depth
+#a line that changes in any other way (nodes, time, ...) does not make the overlay draw again
+def shown_part(info):
+    return tuple(info.get('pv', ())[:PV_MOVES]), info.get('score'), info.get('depth')
+
+#the score of a line from white's point of view, e.g. '+0.35' or '#-2' for a mate in 2 for black
+def score_text(score):
+    if score is None:
+        return '?'
+    white = score.white()
+    if white.is_mate():
+        return f"#{white.mate()}"
+    return f"{white.score() / 100:+.2f}"
+
+
+#arrows and panel of the hints
+class HintOverlay:
+
+    def __init__(self, tile_size):
+        self.tile_size = tile_size
+        #the arrows as (from square, to square), best line first, and the lines of text of the panel
+        self.arrows = []
+        self.text = []
+        #the rects the overlay covers on the screen since it was last drawn
+        self.rects = []
+        #set when the arrows or the text changed and the overlay has to be drawn again
+        self.changed = False
+        self.font = None
+
+    #taking the lines of a streaming analysis, board is the python-chess board that was analysed (to write the moves)
+    #lines are the infos of the lines, best first, the overlay is only drawn again if the arrows or the text change
+    def set_lines(self, board, lines):
+        arrows = []
+        text = []
+        for number, info in enumerate(lines, 1):
+            pv = info.get('pv')
+            if not pv:
+                continue
+            try:
+                moves = board.variation_san(pv[:PV_MOVES])
+            except ValueError:
+                #a line that does not fit the board any more (the position changed while it was on its way) is skipped,
+                #its arrow as well as its text, so the board never shows an arrow of a move that is not legal there
+                continue
+            arrows.append((pv[0].from_square, pv[0].to_square))
+            text.append(f"{number}. {score_text(info.get('score')):>6}  {moves}")
+        if lines and lines[0].get('depth'):
+            text.insert(0, f"hints, depth {lines[0]['depth']}")
+        if arrows != self.arrows or text != self.text:
+            self.arrows = arrows
+            self.text = text
+            self.changed = True
+
+    #removing the hints from the board, the squares under them are drawn again on the next frame
+    def clear(self):
+        if self.arrows or self.text:
+            self.arrows = []
+            self.text = []
+            self.changed = True
+
+    #checking if the overlay has to be drawn, because it changed or because the renderer drew over part of it
+    def needs_redraw(self, dirty):
+        return self.changed or any(rect.collidelist(self.rects) >= 0 for rect in dirty)
+
+    #making the renderer draw the squares under the overlay again, so it is never drawn over itself (the arrows are translucent)
+    def invalidate(self, renderer):
+        for rect in self.rects:
+            renderer.invalidate_rect(rect)
+
+    #the pixel position of the center of a square
+    def center(self, square):
+        row, col = bitboard.row_col(square)
+        return pygame.Vector2((col + 0.5) * self.tile_size, (row + 0.5) * self.tile_size)
+
+    #drawing one arrow from the center of one square to the center of another, returns its rect
+    def draw_arrow(self, screen, from_sq, to_sq, color):
+        start, end = self.center(from_sq), self.center(to_sq)
+        direction = (end - start).normalize()
+        normal = pygame.Vector2(-direction.y, direction.x)
+        #the shaft starts a little way off the center of the square, the head ends on the center of the target
+        start += direction * self.tile_size * 0.2
+        neck = end - direction * self.tile_size * 0.35
+        shaft, head = self.tile_size * 0.08, self.tile_size * 0.22
+        points = [start + normal * shaft, neck + normal * shaft, neck + normal * head, end,
+                  neck - normal * head, neck - normal * shaft, start - normal * shaft]
+        left = int(min(point.x for point in points)) - 1
+        top = int(min(point.y for point in points)) - 1
+        width = int(max(point.x for point in points)) - left + 2
+        height = int(max(point.y for point in points)) - top + 2
+        #the arrow is drawn on its own translucent surface, so the board shows through it
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        pygame.draw.polygon(surface, color, [(point.x - left, point.y - top) for point in points])
+        return screen.blit(surface, (left, top))
+
+    #drawing the arrows (the best line last, so it is on top) and the panel in the bottom left corner
+    #returns the rects that were drawn, the renderer has already drawn the squares under them
+    def draw(self, screen):
+        self.changed = False
+        self.rects = []
+        for index in range(len(self.arrows) - 1, -1, -1):
+            from_sq, to_sq = self.arrows[index]
+            self.rects.append(self.draw_arrow(screen, from_sq, to_sq, ARROW_COLORS[min(index, len(ARROW_COLORS) - 1)]))
+        if self.text:
+            if self.font is None:
+                self.font = pygame.font.SysFont('couriernew', 14)
+            texts = [self.font.render(line, True, (255, 255, 255)) for line in self.text]
+            #a translucent black box behind the text, like the profiler overlay
+            panel = pygame.Surface((max(text.get_width() for text in texts) + 10, sum(text.get_height() for text in texts) + 10), pygame.SRCALPHA)
+            panel.fill((0, 0, 0, 170))
+            y = 5
+            for text in texts:
+                panel.blit(text, (5, y))
+                y += text.get_height()
+            self.rects.append(screen.blit(panel, (5, screen.get_height() - panel.get_height() - 5)))
+        return list(self.rects)
@@ -0,0 +1,79 @@
+#opening book support, for polyglot .bin books
+#a polyglot book is a file of 16 byte entries (position key, move, weight, learn) sorted by the zobrist key of the position
+#python-chess opens the file with mmap and finds the entries of a position with a binary search on the keys,
+#so the book is never loaded into memory and a lookup only touches a few pages of the file
+#
+#a book move costs no engine time and comes back straight away, and the weighted choice gives varied openings
+
+import random
+import chess
+import chess.engine
+import chess.polyglot
+
+#how a move is picked when the book has more than one for a position
+#'weighted' picks at random, with the chance of each move set by its weight, 'best' always picks the highest weight
+BOOK_MODES = ('weighted', 'best')
+
+
+#a polyglot opening book
+class OpeningBook:
+
+    def __init__(self, path, mode='weighted', seed=None):
+        if mode not in BOOK_MODES:
+            raise ValueError(f'unknown book mode {mode!r}, expected one of {BOOK_MODES}')
+        self.path = path
+        self.mode = mode
+        #memory mapped reader of the book, the file is not read into memory
+        self.reader = chess.polyglot.open_reader(path)
+        #random number generator for the weighted choice, a seed gives the same openings every run
+        self.random = random.Random(seed)
+        #how many lookups found a book move, and how many did not
+        self.hits = 0
+        self.misses = 0
+
+    #finding a book move for the position, None if the position is not in the book
+    #key is the zobrist hash of the board if it is already known, then a position that is not in the book
+    #(every position once the game has left the book) is a miss after one binary search, without hashing the board
+    def choose(self, board, key=None):
+        if key is not None and not self.contains(key):
+            self.misses += 1
+            return None
+        try:
+            if self.mode == 'best':
+                entry = self.reader.find(board)
+            else:
+                entry = self.reader.weighted_choice(board, random=self.random)
+        except IndexError:
+            #python-chess raises IndexError when the book has no entry for the position
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.move
+
+    #checking if the book has any entry for the position with this zobrist key
+    def contains(self, key):
+        index = self.reader.bisect_key_left(key)
+        return index < len(self.reader) and self.reader[index].key == key
+
+    #share of lookups that found a book move
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.reader.close()
+
+
+#wrapper around an engine that plays from the opening book while the position is in it, and asks the engine after that
+#it has the same play(board, limit, game=..., info=...) method as a SimpleEngine, so selfplay.py can use it in place of the engine
+class BookEngine:
+
+    def __init__(self, engine, book):
+        self.engine = engine
+        self.book = book
+
+    def play(self, board, limit, game=None, info=chess.engine.INFO_NONE):
+        move = self.book.choose(board)
+        if move is not None:
+            return chess.engine.PlayResult(move, None, {'string': 'book'})
+        return self.engine.play(board, limit, game=game, info=info)
@@ -0,0 +1,153 @@
+#perft: counting every position the move generator reaches to a given depth, and comparing the count with python-chess
+#the node counts of the standard perft positions are known, so any missing or extra move (castling through check,
+#en passant, promotions, pins, ...) shows up as a wrong count, and --divide shows which first move the difference is under
+#the nodes per second of the game's generator is printed as well, so it doubles as a benchmark of the move generation
+#
+#usage: python perft.py --depth 3                     (every standard position)
+#       python perft.py --position 2 --depth 3 --divide
+#       python perft.py --fen "<fen>" --depth 4
+
+import sys
+import time
+import argparse
+import chess
+import position
+
+#the standard perft positions and their known node counts for depth 1, 2, 3, ...
+#https://www.chessprogramming.org/Perft_Results
+POSITIONS = [
+    ('start', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', [48, 2039, 97862, 4085603]),
+    ('position 3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624]),
+    ('position 4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', [6, 264, 9467, 422333]),
+    ('position 5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379, 2103487]),
+    ('position 6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', [46, 2079, 89890, 3894594]),
+]
+
+
+#building the bitboards and the side to move of a FEN
+def from_fen(fen):
+    start = position.Position.from_fen(fen)
+    return start.bitboards(), start.turn
+
+#the UCI name of a move of the generator, e.g. 'e2e4' or 'a7a8q'
+def move_name(move):
+    from_sq, to_sq, promotion = move
+    return chess.square_name(from_sq) + chess.square_name(to_sq) + (promotion or '')
+
+
+#counting the positions at the given depth with the game's move generator
+#at depth 1 the legal moves are only counted, not made (bulk counting), as every perft tool does
+def perft(bitboards, color, depth):
+    moves = bitboards.legal_moves_with_promotions(color)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for from_sq, to_sq, promotion in moves:
+        undo = bitboards.push_move(from_sq, to_sq, promotion)
+        nodes += perft(bitboards, color ^ 1, depth - 1)
+        bitboards.pop_move(from_sq, to_sq, undo)
+    return nodes
+
+#the node count under each first move, as {uci name: nodes}
+def divide(bitboards, color, depth):
+    counts = {}
+    for move in bitboards.legal_moves_with_promotions(color):
+        undo = bitboards.push_move(*move)
+        counts[move_name(move)] = perft(bitboards, color ^ 1, depth - 1)
+        bitboards.pop_move(move[0], move[1], undo)
+    return counts
+
+
+#the same counts with python-chess, the reference the game's generator is compared with
+def chess_perft(board, depth):
+    if depth <= 1:
+        return board.legal_moves.count() if depth == 1 else 1
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += chess_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+def chess_divide(board, depth):
+    counts = {}
+    for move in board.legal_moves:
+        board.push(move)
+        counts[move.uci()] = chess_perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
+#running perft on one position, printing the result and returning True if the counts agree
+def run_position(name, fen, depth, expected=None, show_divide=False, compare=True):
+    bitboards, color = from_fen(fen)
+    started = time.perf_counter()
+    if show_divide:
+        counts = divide(bitboards, color, depth)
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(bitboards, color, depth)
+    seconds = time.perf_counter() - started
+
+    reference = None
+    reference_seconds = None
+    if compare:
+        board = chess.Board(fen)
+        started = time.perf_counter()
+        if show_divide:
+            reference_counts = chess_divide(board, depth)
+            reference = sum(reference_counts.values())
+        else:
+            reference = chess_perft(board, depth)
+        reference_seconds = time.perf_counter() - started
+    #the known count is used when python-chess is not run
+    elif expected is not None and depth <= len(expected):
+        reference = expected[depth - 1]
+
+    ok = reference is None or nodes == reference
+    line = f"{name:<12} depth {depth}  nodes {nodes:>10,}  {nodes / seconds if seconds else 0:>10,.0f} nps"
+    if compare:
+        line += f"  | python-chess {reference:>10,}  {reference / reference_seconds if reference_seconds else 0:>10,.0f} nps"
+    elif reference is not None:
+        line += f"  | expected {reference:>10,}"
+    print(line + ('' if ok else '  MISMATCH'))
+
+    if show_divide:
+        #the moves are printed in UCI order, those whose counts differ (or that only one generator has) are marked
+        for move in sorted(set(counts) | set(reference_counts if compare else ())):
+            ours = counts.get(move)
+            theirs = reference_counts.get(move) if compare else None
+            mark = '' if not compare or ours == theirs else f'  <- python-chess {theirs}'
+            print(f"  {move:<6} {ours if ours is not None else '-'}{mark}")
+    return ok
+
+
+#reading the command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Count the nodes of the game's move generator and compare them with python-chess.")
+    parser.add_argument('--depth', type=int, default=3, help='depth to count to')
+    parser.add_argument('--position', type=int, help='number of the standard position to run (1-6), all of them if not given')
+    parser.add_argument('--fen', help='run this position instead of the standard ones')
+    parser.add_argument('--divide', action='store_true', help='print the node count under each first move')
+    parser.add_argument('--no-compare', action='store_true', help='do not run python-chess, check against the known counts only')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.fen:
+        positions = [('fen', args.fen, None)]
+    elif args.position:
+        positions = [POSITIONS[args.position - 1]]
+    else:
+        positions = POSITIONS
+
+    results = [run_position(name, fen, args.depth, expected, args.divide, not args.no_compare) for name, fen, expected in positions]
+    #a mismatch makes the exit code 1, so perft can be used as a check in scripts
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
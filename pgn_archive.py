@@ -0,0 +1,238 @@
+#recording the games in a PGN archive, and reading them back
+#every finished game is appended to the end of the archive through a buffered writer, the games already in it are never rewritten
+#the moves carry the time left on the clock of the side that moved ([%clk]) and, for the AI's moves, its evaluation ([%eval])
+#
+#the archive can grow to gigabytes, so it is never loaded as a whole: an index next to it (games.pgn.idx) keeps the byte offset
+#where every game starts, a game is read by seeking straight to it, and games() goes through the archive one game at a time
+#
+#usage:
+#   archive = PgnArchive('games.pgn')
+#   game = archive.game(-1)                #the last game, as a chess.pgn.Game
+#   for game in archive.games(1000):      #every game from the 1000th on, only one of them in memory at a time
+#       ...
+
+import io
+import os
+import re
+import array
+import datetime
+import chess
+import chess.pgn
+
+#the index of an archive is kept in a file with the name of the archive and this after it
+INDEX_SUFFIX = '.idx'
+#bytes the writer collects before it writes to the file, a whole game normally goes out in one write
+WRITE_BUFFER = 1 << 16
+#bytes read at a time when the archive is read or indexed
+READ_BUFFER = 1 << 20
+#a header line like [Event "..."], the first one after the moves of a game is where the next game starts
+#the comments of the moves can also be wrapped onto a line that starts with '[' ([%clk ...]), so the tag name and quote are checked
+HEADER_LINE = re.compile(rb'\[[A-Za-z0-9_]+\s+"')
+
+
+#a PGN archive with an index of where each game starts
+class PgnArchive:
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        #the byte offset of every game, and how many bytes of the archive the index covers
+        self.offsets = array.array('Q')
+        self.indexed = 0
+        self._load_index()
+        self.refresh()
+
+    #reading the index file, it is the offsets of the games followed by the size of the archive they were read from
+    def _load_index(self):
+        self.offsets, self.indexed = read_index(self.path)
+
+    #writing the whole index file
+    def _save_index(self):
+        data = array.array('Q', self.offsets)
+        data.append(self.indexed)
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(data.tobytes())
+        os.replace(temporary, self.index_path)
+
+    #bringing the index up to date with the archive, only the part of the archive written since the last time is read
+    #if the archive is smaller than the index says, it was replaced, and it is indexed again from the start
+    def refresh(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        reset = size < self.indexed
+        if reset:
+            self.offsets = array.array('Q')
+            self.indexed = 0
+        if size > self.indexed:
+            self._scan(self.indexed)
+            self._save_index()
+        elif reset:
+            #the archive was emptied, the old index file has to go as well, append() only adds to the end of it
+            self._save_index()
+
+    #finding the games that start from a byte offset on, the lines are read as bytes so their offsets are exact
+    def _scan(self, start):
+        with open(self.path, 'rb', buffering=READ_BUFFER) as file:
+            file.seek(start)
+            offset = start
+            #the first header line of a game starts it, the ones after it belong to the same game
+            in_headers = False
+            for line in file:
+                #the archive may start with the byte order mark of UTF-8
+                text = line[3:] if offset == 0 and line.startswith(b'\xef\xbb\xbf') else line
+                if HEADER_LINE.match(text):
+                    if not in_headers:
+                        self.offsets.append(offset)
+                        in_headers = True
+                elif text.strip():
+                    in_headers = False
+                offset += len(line)
+        self.indexed = offset
+
+    #the number of games in the archive
+    def __len__(self):
+        return len(self.offsets)
+
+    #appending a chess.pgn.Game to the end of the archive, returns its number
+    #the game is written in one go through the buffer, the index only gets the offset of the new game added
+    def append(self, game):
+        self.refresh()
+        data = game.accept(chess.pgn.StringExporter(headers=True, variations=True, comments=True)).encode('utf-8') + b'\n\n'
+        with open(self.path, 'ab', buffering=WRITE_BUFFER) as file:
+            offset = file.seek(0, os.SEEK_END)
+            #a game must come after an empty line, otherwise python-chess reads its headers as part of the game before it
+            #if something was written without the empty line at the end, it is added
+            if offset:
+                separator = self._separator()
+                file.write(separator)
+                offset += len(separator)
+            file.write(data)
+        self.offsets.append(offset)
+        self.indexed = offset + len(data)
+        self._append_index(offset)
+        return len(self.offsets) - 1
+
+    #adding the offset of a new game to the index file, the size at its end is written over, the rest of the file is kept as it is
+    def _append_index(self, offset):
+        if not os.path.exists(self.index_path):
+            self._save_index()
+            return
+        with open(self.index_path, 'r+b') as file:
+            file.seek(-array.array('Q').itemsize, os.SEEK_END)
+            file.write(array.array('Q', [offset, self.indexed]).tobytes())
+
+    #the newlines that have to be written before a new game, so the archive ends with an empty line
+    def _separator(self):
+        with open(self.path, 'rb') as file:
+            file.seek(-min(2, os.path.getsize(self.path)), os.SEEK_END)
+            end = file.read()
+        if end.endswith(b'\n\n'):
+            return b''
+        return b'\n' if end.endswith(b'\n') else b'\n\n'
+
+    #opening the archive as text at the start of a game, number counts from 0 and negative numbers count from the end
+    def _open_at(self, number):
+        raw = open(self.path, 'rb', buffering=READ_BUFFER)
+        raw.seek(self.offsets[number])
+        return io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace')
+
+    #reading one game, without reading the games before it
+    def game(self, number):
+        with self._open_at(number) as file:
+            return chess.pgn.read_game(file)
+
+    #reading the headers of one game, without its moves
+    def headers(self, number):
+        with self._open_at(number) as file:
+            return chess.pgn.read_headers(file)
+
+    #going through the games from number start on, one at a time, the archive is read as the games are asked for
+    def games(self, start=0):
+        if start >= len(self.offsets):
+            return
+        with self._open_at(start) as file:
+            while True:
+                game = chess.pgn.read_game(file)
+                if game is None:
+                    return
+                yield game
+
+    def __iter__(self):
+        return self.games()
+
+
+#reading the index of an archive without writing anything, for archives that are only read (and may be read only)
+#returns the offsets of the games and the size of the archive they were read from, no offsets and 0 if there is no index
+def read_index(path):
+    data = array.array('Q')
+    if os.path.exists(path + INDEX_SUFFIX):
+        with open(path + INDEX_SUFFIX, 'rb') as file:
+            data.frombytes(file.read())
+    if not data:
+        return data, 0
+    indexed = data.pop()
+    return data, indexed
+
+
+#recording the game that is being played, move by move, and writing it to the archive when it is over
+class GameRecorder:
+
+    #headers are the PGN headers every game gets, e.g. {'White': 'Player'}
+    def __init__(self, archive, headers=None):
+        self.archive = archive
+        self.headers = dict(headers or {})
+        self.start()
+
+    #starting to record a new game, from the normal starting position or from board (a chess.Board with no moves)
+    def start(self, board=None):
+        self.game = chess.pgn.Game()
+        self.game.headers['Event'] = 'Casual game'
+        self.game.headers['Date'] = datetime.date.today().strftime('%Y.%m.%d')
+        self.game.headers.update(self.headers)
+        if board is not None and board.fen() != chess.STARTING_FEN:
+            self.game.setup(board)
+        #the node of the last move, new moves are added after it
+        self.node = self.game
+        self.moves = 0
+
+    #recording a move, clock is the seconds the side that moved has left, score (a chess.engine.PovScore) and depth its evaluation
+    def record(self, move, clock=None, score=None, depth=None):
+        self.node = self.node.add_variation(move)
+        if clock is not None:
+            self.node.set_clock(max(0.0, clock))
+        if score is not None:
+            self.node.set_eval(score, depth)
+        self.moves += 1
+
+    #writing the game to the archive and starting a new one, result is '1-0', '0-1', '1/2-1/2' or '*' for a game that was not finished
+    #headers are set on this game only (e.g. the skill level of the AI), returns the number of the game in the archive
+    def finish(self, result, termination=None, headers=None):
+        self.game.headers['Result'] = result
+        if termination is not None:
+            self.game.headers['Termination'] = termination
+        self.game.headers.update(headers or {})
+        number = self.archive.append(self.game)
+        self.start()
+        return number
+
+
+#the moves of a game with what was recorded with each of them, as (move, clock, score, depth), and the board it starts from
+def recorded_moves(game):
+    moves = []
+    for node in game.mainline():
+        score = node.eval()
+        moves.append((node.move, node.clock(), score, node.eval_depth() if score is not None else None))
+    return game.board(), moves
+
+
+#how a recorded game ended, as text (e.g. '1-0, time forfeit'), None if it was not finished and can be played on
+#the Result header is checked, and the position after the last move, for a mate or stalemate written without a result
+def game_result(game):
+    result = game.headers.get('Result', '*')
+    if result == '*':
+        board = game.end().board()
+        if not (board.is_checkmate() or board.is_stalemate()):
+            return None
+        result = board.result()
+    termination = game.headers.get('Termination')
+    return f'{result}, {termination}' if termination and termination != 'unterminated' else result
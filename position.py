@@ -0,0 +1,195 @@
+#the position of the game: the pieces on the board, the side to move, the castling rights, the en passant square and the clocks
+#the board used to be a list of 8 lists of one character strings, this keeps the 64 squares in one bytearray instead,
+#with one small number per square, so a position is one small object and copying it is copying 64 bytes
+#
+#the squares are numbered the same way as in bitboard.py and python-chess, a1 = 0, b1 = 1, ... h8 = 63
+#the game works with (row, col) where row 0 is the top of the screen (rank 8), piece(row, col) reads a square that way
+
+import bitboard
+from bitboard import WHITE, BLACK
+
+#PIECE CODES:
+#0 is an empty square, 1-6 are the white P N B R Q K and 7-12 the black p n b r q k
+#so code - 1 is the index of the piece in bitboard.PIECE_LETTERS, and every code above 6 is black
+EMPTY = 0
+PIECE_CODES = {letter: index + 1 for index, letter in enumerate(bitboard.PIECE_LETTERS)}
+#the letter of every code, '' for an empty square, the same letters the images and FEN use
+PIECE_SYMBOLS = [''] + list(bitboard.PIECE_LETTERS)
+
+#codes of the pieces the moves need to know about
+WHITE_PAWN, WHITE_KING = PIECE_CODES['P'], PIECE_CODES['K']
+BLACK_PAWN, BLACK_KING = PIECE_CODES['p'], PIECE_CODES['k']
+
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+#the color of a piece code, the code must not be EMPTY
+def color_of(code):
+    return BLACK if code > 6 else WHITE
+
+
+#class holding one position of the game
+class Position:
+    __slots__ = ('squares', 'turn', 'castling', 'ep_square', 'halfmove_clock', 'fullmove_number')
+
+    def __init__(self):
+        #the piece code of every square, in square order
+        self.squares = bytearray(64)
+        #the side to move, bitboard.WHITE or bitboard.BLACK
+        self.turn = WHITE
+        #castling rights still available, as FEN letters ('KQkq', '' if none)
+        self.castling = ''
+        #square a pawn can capture en passant on, None if the last move was not a double pawn step
+        self.ep_square = None
+        #half moves since the last capture or pawn move (for the fifty move rule), and the number of the full move
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+
+    #building a position from a FEN string
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        position = cls()
+        #the rows of the FEN go from rank 8 down to rank 1, a digit is that many empty squares
+        for rank, line in enumerate(fields[0].split('/')):
+            square = (7 - rank) * 8
+            for char in line:
+                if char.isdigit():
+                    square += int(char)
+                else:
+                    position.squares[square] = PIECE_CODES[char]
+                    square += 1
+        position.turn = WHITE if len(fields) < 2 or fields[1] == 'w' else BLACK
+        position.castling = fields[2].replace('-', '') if len(fields) > 2 else ''
+        position.ep_square = bitboard.square_of(8 - int(fields[3][1]), ord(fields[3][0]) - ord('a')) if len(fields) > 3 and fields[3] != '-' else None
+        position.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        position.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        return position
+
+    #the starting position of a game
+    @classmethod
+    def starting(cls):
+        return cls.from_fen(STARTING_FEN)
+
+    #a copy of the position, the squares are one bytearray so this is a single 64 byte copy
+    def copy(self):
+        position = Position.__new__(Position)
+        position.squares = self.squares[:]
+        position.turn = self.turn
+        position.castling = self.castling
+        position.ep_square = self.ep_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_number = self.fullmove_number
+        return position
+
+    #the letter of the piece on a square ('P', 'k', ...), '' if it is empty
+    def piece_at(self, square):
+        return PIECE_SYMBOLS[self.squares[square]]
+
+    #the letter of the piece on the (row, col) of the game, '' if it is empty
+    def piece(self, row, col):
+        return PIECE_SYMBOLS[self.squares[(7 - row) * 8 + col]]
+
+    #the color of the piece on a square, None if it is empty
+    def color_at(self, square):
+        code = self.squares[square]
+        if code == EMPTY:
+            return None
+        return color_of(code)
+
+    #making a move in place, returns what is needed to take it back with unmake_move
+    #en passant, castling (the rook moves along with the king) and promotion (the lowercase letter of the new piece, or None)
+    #are handled here, and so are the castling rights, the en passant square, the clocks and the side to move
+    def make_move(self, from_sq, to_sq, promotion=None):
+        squares = self.squares
+        moving = squares[from_sq]
+        captured = squares[to_sq]
+        captured_sq = to_sq
+        rook = None
+        state = (self.castling, self.ep_square, self.halfmove_clock)
+        pawn = moving == WHITE_PAWN or moving == BLACK_PAWN
+        #a pawn moving diagonally onto an empty square is capturing en passant, the captured pawn is next to the start square
+        if pawn and not captured and (to_sq - from_sq) % 8:
+            captured_sq = to_sq - 8 if moving == WHITE_PAWN else to_sq + 8
+            captured = squares[captured_sq]
+            squares[captured_sq] = EMPTY
+        #a king moving two squares is castling, the rook jumps over to the other side of the king
+        elif (moving == WHITE_KING or moving == BLACK_KING) and abs(to_sq - from_sq) == 2:
+            rook = (from_sq + 3, from_sq + 1) if to_sq > from_sq else (from_sq - 4, from_sq - 1)
+            squares[rook[1]] = squares[rook[0]]
+            squares[rook[0]] = EMPTY
+
+        squares[to_sq] = moving
+        squares[from_sq] = EMPTY
+        #the pawn that reached the last rank is swapped for the new piece
+        if promotion is not None:
+            squares[to_sq] = PIECE_CODES[promotion.upper() if moving == WHITE_PAWN else promotion.lower()]
+
+        #moving the king or a rook, or capturing a rook on its starting square, loses those castling rights
+        if self.castling:
+            self.castling = ''.join(right for right in self.castling
+                                    if from_sq not in bitboard.CASTLING_SQUARES[right] and to_sq not in bitboard.CASTLING_SQUARES[right])
+        #a pawn that moves two squares can be captured en passant on the square it skipped
+        self.ep_square = (from_sq + to_sq) // 2 if pawn and abs(to_sq - from_sq) == 16 else None
+        #a pawn move or a capture starts the fifty move count again, and black's move finishes a full move
+        self.halfmove_clock = 0 if pawn or captured else self.halfmove_clock + 1
+        if self.turn == BLACK:
+            self.fullmove_number += 1
+        self.turn ^= 1
+        return moving, captured, captured_sq, rook, state
+
+    #taking back a move made with make_move, undo is the tuple make_move returned
+    def unmake_move(self, from_sq, to_sq, undo):
+        moving, captured, captured_sq, rook, state = undo
+        squares = self.squares
+        squares[from_sq] = moving
+        squares[to_sq] = EMPTY
+        squares[captured_sq] = captured
+        if rook is not None:
+            squares[rook[0]] = squares[rook[1]]
+            squares[rook[1]] = EMPTY
+        self.turn ^= 1
+        if self.turn == BLACK:
+            self.fullmove_number -= 1
+        self.castling, self.ep_square, self.halfmove_clock = state
+
+    #the bitboards of the position, for the move generation
+    def bitboards(self):
+        return bitboard.Bitboards.from_position(self)
+
+    #checking if the side to move can capture en passant with a legal move
+    #the en passant square is only written into the FEN when it can, the same way python-chess does it
+    def has_legal_en_passant(self):
+        if self.ep_square is None:
+            return False
+        bitboards = self.bitboards()
+        pawns = bitboards.pieces[0 if self.turn == WHITE else 6]
+        for square in bitboard.iter_squares(bitboard.PAWN_ATTACKS[self.turn ^ 1][self.ep_square] & pawns):
+            if bitboards.is_legal(square, self.ep_square):
+                return True
+        return False
+
+    #the FEN string of the position, e.g. 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row = ''
+            empty = 0
+            for code in self.squares[rank * 8:rank * 8 + 8]:
+                if code == EMPTY:
+                    empty += 1
+                    continue
+                #the count of the empty squares before a piece is written before it
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += PIECE_SYMBOLS[code]
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        en_passant = '-'
+        if self.has_legal_en_passant():
+            row, col = bitboard.row_col(self.ep_square)
+            en_passant = 'abcdefgh'[col] + str(8 - row)
+        return (f"{'/'.join(rows)} {'w' if self.turn == WHITE else 'b'} {self.castling or '-'} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
@@ -0,0 +1,117 @@
+#timing the hot paths of the game, to see where the time of a frame goes
+#each stage (events, move generation, drawing, display update, ...) keeps its last timings in a ring buffer,
+#from which the p50/p95/p99 are worked out for the overlay and for the export at the end
+#
+#when the profiler is off, the methods it times are the normal methods of the game: timing is added by putting a timed
+#wrapper on the object (see watch), and taken off again by removing it, so there is nothing to pay while it is off
+
+import csv
+import json
+import time
+import collections
+
+#how many timings each stage keeps, the oldest ones are dropped first
+BUFFER_SIZE = 600
+
+
+#the value below which p percent of the sorted values are (nearest rank)
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+#timings of the stages of the game
+class Profiler:
+
+    def __init__(self, size=BUFFER_SIZE, enabled=False):
+        self.size = size
+        #the last timings of each stage in seconds, in the order the stages were first timed
+        self.timings = {}
+        #the methods that are timed while the profiler is on, as (object, method name, stage)
+        self.watched = []
+        self.enabled = False
+        if enabled:
+            self.enable()
+
+    #storing one timing of a stage, in seconds
+    def record(self, stage, seconds):
+        buffer = self.timings.get(stage)
+        if buffer is None:
+            buffer = self.timings[stage] = collections.deque(maxlen=self.size)
+        buffer.append(seconds)
+
+    #timing every call of obj.name as the given stage while the profiler is on
+    def watch(self, obj, name, stage):
+        self.watched.append((obj, name, stage))
+        if self.enabled:
+            self._wrap(obj, name, stage)
+
+    #putting a timed wrapper around a method, as an attribute of the object that hides the method of its class
+    def _wrap(self, obj, name, stage):
+        method = getattr(obj, name)
+        record = self.record
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(stage, perf_counter() - started)
+
+        setattr(obj, name, timed)
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            for obj, name, stage in self.watched:
+                self._wrap(obj, name, stage)
+
+    #turning the profiler off, the timed wrappers are removed so the methods of the classes are used again
+    #the timings are kept, so they can still be shown and exported
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            for obj, name, stage in self.watched:
+                if name in vars(obj):
+                    delattr(obj, name)
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    #the statistics of every stage in milliseconds, as {stage: {count, mean, p50, p95, p99, max}}
+    def summary(self):
+        stats = {}
+        for stage, buffer in self.timings.items():
+            values = sorted(buffer)
+            if not values:
+                continue
+            stats[stage] = {
+                'count': len(values),
+                'mean': sum(values) / len(values) * 1000,
+                'p50': percentile(values, 50) * 1000,
+                'p95': percentile(values, 95) * 1000,
+                'p99': percentile(values, 99) * 1000,
+                'max': values[-1] * 1000,
+            }
+        return stats
+
+    #writing the statistics to a file, as JSON if the path ends with .json and as CSV otherwise
+    #the JSON file also has the timings themselves, in milliseconds
+    def export(self, path):
+        stats = self.summary()
+        if path.endswith('.json'):
+            for stage, values in stats.items():
+                values['samples'] = [round(seconds * 1000, 4) for seconds in self.timings[stage]]
+            with open(path, 'w') as file:
+                json.dump(stats, file, indent=2)
+        else:
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+                for stage, values in stats.items():
+                    writer.writerow([stage, values['count']] + [f"{values[name]:.4f}" for name in ('mean', 'p50', 'p95', 'p99', 'max')])
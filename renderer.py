@@ -0,0 +1,83 @@
+#drawing the board with as little work as possible
+#the 64 squares never change, so they are drawn once into a cached surface, and the translucent highlight is made once too
+#the renderer remembers what every square shows on the screen (its piece and whether it is highlighted),
+#so each frame only the squares that changed are drawn again, and only their rects are sent to pygame.display.update
+
+import pygame
+from position import PIECE_SYMBOLS
+
+
+#renderer of the board and the pieces, with per-square dirty tracking
+class BoardRenderer:
+
+    #screen is the display surface, images the dictionary of piece images ('r', 'R', ...)
+    #light, dark and highlight are the colors of the white tiles, the black tiles and the highlight of valid moves
+    def __init__(self, screen, images, tile_size, light, dark, highlight):
+        self.screen = screen
+        self.images = images
+        self.tile_size = tile_size
+
+        #drawing the empty board once, every square is copied from this surface when it has to be drawn again
+        self.board_surface = pygame.Surface((8 * tile_size, 8 * tile_size)).convert()
+        for row in range(8):
+            for col in range(8):
+                color = light if (row + col) % 2 == 0 else dark
+                pygame.draw.rect(self.board_surface, color, (col * tile_size, row * tile_size, tile_size, tile_size))
+
+        #the translucent green tile that marks the valid moves, made once instead of every frame
+        self.highlight_surface = pygame.Surface((tile_size, tile_size)).convert()
+        self.highlight_surface.set_alpha(100)
+        self.highlight_surface.fill(highlight)
+
+        #what each square shows on the screen right now, as (piece, highlighted), None if it is not known
+        self.drawn = [[None] * 8 for _ in range(8)]
+
+    #forgetting what is on the screen, so the next render draws every square
+    #this has to be called after anything else has drawn over the board (e.g. the stats screen)
+    def invalidate(self):
+        self.drawn = [[None] * 8 for _ in range(8)]
+
+    #marking one square as changed, so the next render draws it again
+    def invalidate_square(self, row, col):
+        if 0 <= row < 8 and 0 <= col < 8:
+            self.drawn[row][col] = None
+
+    #marking every square a screen rect touches as changed, used for rects a moving sprite has drawn over
+    def invalidate_rect(self, rect):
+        tile = self.tile_size
+        for row in range(max(0, rect.top // tile), min(8, (rect.bottom - 1) // tile + 1)):
+            for col in range(max(0, rect.left // tile), min(8, (rect.right - 1) // tile + 1)):
+                self.drawn[row][col] = None
+
+    #the screen rect of a square
+    def square_rect(self, row, col):
+        return pygame.Rect(col * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size)
+
+    #drawing one square: the tile from the cached board, the highlight if it has one, and the piece on it
+    def draw_square(self, row, col, piece, highlighted):
+        rect = self.square_rect(row, col)
+        self.screen.blit(self.board_surface, rect, rect)
+        if highlighted:
+            self.screen.blit(self.highlight_surface, rect)
+        if piece:
+            self.screen.blit(self.images[piece], rect)
+        return rect
+
+    #drawing the squares that changed since the last render, returns the list of rects that were drawn
+    #position is the position.Position of the game, valid_moves the (row, col) squares to highlight
+    #hidden is an optional set of (row, col) squares whose piece should not be drawn (e.g. a piece that is being animated)
+    def render(self, position, valid_moves, hidden=()):
+        highlighted = set(valid_moves)
+        dirty = []
+        squares = position.squares
+        for row in range(8):
+            drawn_row = self.drawn[row]
+            #row 0 of the screen is rank 8, the squares of a rank are 8 bytes in a row of the position
+            first = (7 - row) * 8
+            for col in range(8):
+                piece = '' if (row, col) in hidden else PIECE_SYMBOLS[squares[first + col]]
+                wanted = (piece, (row, col) in highlighted)
+                if drawn_row[col] != wanted:
+                    dirty.append(self.draw_square(row, col, *wanted))
+                    drawn_row[col] = wanted
+        return dirty
@@ -0,0 +1,224 @@
+#headless engine vs engine games, for running many games with no window, sounds, message boxes or move delay
+#the games are played with ChessRules, the same rules the game on the screen uses
+#every finished game is written out straight away as one line of JSON, so results can be read while the run goes on
+#
+#usage: python selfplay.py --engine path/to/stockfish --games 100 --skill 5 10 --time 0.05 --concurrency 8 > results.jsonl
+#any UCI engine can be used, including a stub engine for testing without stockfish, or --engine builtin for the python engine
+
+import sys
+import json
+import time
+import argparse
+import concurrent.futures
+import chess
+import chess.engine
+import bitboard
+from chess_rules import ChessRules
+from engine_pool import EnginePool
+from analysis_cache import AnalysisCache, CachedEngine
+from opening_book import OpeningBook, BookEngine, BOOK_MODES
+
+#a game that goes on for this many plies (half moves) is stopped and counted as a draw
+MAX_PLIES = 400
+#seconds an engine searches for a move when no limit is given, the same as the game on the screen
+DEFAULT_TIME = 0.1
+
+
+#checking if the game is over, returns (result, termination) or None if the game goes on
+#result is written the PGN way: '1-0' white won, '0-1' black won, '1/2-1/2' draw
+def game_over(rules, max_plies=MAX_PLIES):
+    #checkmate and stalemate come from the position state the rules work out after every move
+    if rules.state.is_checkmate:
+        #the side to move is the one that is checkmated
+        return ('0-1' if rules.turn == 'w' else '1-0'), 'checkmate'
+    if rules.state.is_stalemate:
+        return '1/2-1/2', 'stalemate'
+    #the draws that need the move history are checked on the python-chess board
+    board = rules.chess_board
+    if board.is_insufficient_material():
+        return '1/2-1/2', 'insufficient material'
+    if board.is_fifty_moves():
+        return '1/2-1/2', 'fifty moves'
+    #repetitions are counted by the rules with the zobrist key of every position, no moves are taken back to find them
+    if rules.is_repetition(3):
+        return '1/2-1/2', 'threefold repetition'
+    if len(board.move_stack) >= max_plies:
+        return '1/2-1/2', 'move limit'
+    return None
+
+
+#playing one game between two engines and returning the result as a dictionary
+#white and black are anything with a python-chess style play(board, limit, game=..., info=...) method, usually a SimpleEngine
+#fen is the position to start from, None for the normal starting position
+#black_limit is the limit of the black engine if it is not the same as white's, for players with different search times
+#the record has the moves, seconds and nodes each side searched, to work out the cost of a move of each player
+def play_game(white, black, limit, fen=None, max_plies=MAX_PLIES, black_limit=None):
+    rules = ChessRules()
+    if fen is not None:
+        rules.load_fen(fen)
+    start_fen = rules.chess_board.fen()
+    engines = {'w': white, 'b': black}
+    limits = {'w': limit, 'b': black_limit or limit}
+    search = {'w': {'moves': 0, 'seconds': 0.0, 'nodes': 0}, 'b': {'moves': 0, 'seconds': 0.0, 'nodes': 0}}
+    started = time.perf_counter()
+
+    while True:
+        over = game_over(rules, max_plies)
+        if over is not None:
+            result, termination = over
+            break
+
+        #INFO_BASIC makes the engine send the nodes it searched with its move
+        move_started = time.perf_counter()
+        played = engines[rules.turn].play(rules.chess_board, limits[rules.turn], game=rules.game_id, info=chess.engine.INFO_BASIC)
+        side = search[rules.turn]
+        side['moves'] += 1
+        side['seconds'] += time.perf_counter() - move_started
+        side['nodes'] += played.info.get('nodes', 0)
+        move = played.move
+        #an engine that gives no move has resigned, and one that gives an illegal move loses the game
+        if move is None or played.resigned:
+            result, termination = ('0-1' if rules.turn == 'w' else '1-0'), 'resignation'
+            break
+        if move not in rules.chess_board.legal_moves:
+            result, termination = ('0-1' if rules.turn == 'w' else '1-0'), f'illegal move {move.uci()}'
+            break
+
+        #playing the move with the rules of the game
+        promotion = chess.piece_symbol(move.promotion) if move.promotion else 'q'
+        rules.apply_move(bitboard.row_col(move.from_square), bitboard.row_col(move.to_square), promotion)
+
+    return {
+        'result': result,
+        'termination': termination,
+        'plies': len(rules.chess_board.move_stack),
+        'seconds': round(time.perf_counter() - started, 3),
+        'fen': start_fen,
+        'moves': [move.uci() for move in rules.chess_board.move_stack],
+        'search': {color: dict(side, seconds=round(side['seconds'], 4)) for color, side in search.items()},
+    }
+
+
+#playing a number of games between two players and yielding the result of each game as soon as it is finished
+#players is a list of two (name, engine) tuples, they swap colors after every game so both get white equally often
+#openings is an optional list of FEN strings, the games go through them in order
+def run_games(players, games, limit, openings=None, max_plies=MAX_PLIES):
+    for number in range(games):
+        #the first player is white in even games and black in odd games
+        (white_name, white), (black_name, black) = players if number % 2 == 0 else players[::-1]
+        fen = openings[number % len(openings)] if openings else None
+        record = {'game': number + 1, 'white': white_name, 'black': black_name}
+        record.update(play_game(white, black, limit, fen, max_plies))
+        yield record
+
+
+#playing one game with two engines leased from pools, used by run_games_pooled
+def _pooled_game(number, players, limit, openings, max_plies, cache, book):
+    (white_name, white_pool, white_options), (black_name, black_pool, black_options) = players if number % 2 == 0 else players[::-1]
+    fen = openings[number % len(openings)] if openings else None
+    record = {'game': number + 1, 'white': white_name, 'black': black_name}
+    with white_pool.lease(white_options) as white, black_pool.lease(black_options) as black:
+        #with a cache, positions that were already searched with the same settings are answered without the engine
+        if cache is not None:
+            white = CachedEngine(white, cache, white_options)
+            black = CachedEngine(black, cache, black_options)
+        #with a book, the engines play book moves while the game is in the book
+        if book is not None:
+            white = BookEngine(white, book)
+            black = BookEngine(black, book)
+        record.update(play_game(white, black, limit, fen, max_plies))
+    return record
+
+#the same as run_games, but with engines leased from engine pools and several games played at the same time
+#players is a list of two (name, pool, options) tuples, options are the UCI options of that player (e.g. Skill Level)
+#the records are yielded in the order the games finish, their 'game' number tells which game they are
+#every game leases two engines, so the pools together need at least 2 * concurrency engines
+#cache is an optional AnalysisCache and book an optional OpeningBook, both shared by all the games
+def run_games_pooled(players, games, limit, concurrency=1, openings=None, max_plies=MAX_PLIES, cache=None, book=None):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(_pooled_game, number, players, limit, openings, max_plies, cache, book) for number in range(games)]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+#reading the command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Play engine vs engine games without a window and write the results as JSON lines.')
+    parser.add_argument('--engine', required=True, help="path of the UCI engine (e.g. stockfish), or 'builtin' for the built-in python engine")
+    parser.add_argument('--black-engine', help='path of the engine for the second player, the same engine if not given')
+    parser.add_argument('--games', type=int, default=10, help='number of games to play')
+    parser.add_argument('--skill', type=int, nargs=2, default=[10, 10], metavar=('A', 'B'), help='Skill Level (0-20) of the two players')
+    parser.add_argument('--time', type=float, help='seconds per move')
+    parser.add_argument('--depth', type=int, help='search depth per move')
+    parser.add_argument('--nodes', type=int, help='nodes per move')
+    parser.add_argument('--concurrency', type=int, default=1, help='number of games played at the same time')
+    parser.add_argument('--threads', type=int, default=1, help='Threads option of the engines')
+    parser.add_argument('--hash', type=int, default=16, help='Hash option of the engines, in MB')
+    parser.add_argument('--openings', help='file with one FEN per line to start the games from')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='plies after which a game is counted as a draw')
+    parser.add_argument('--cache', help='sqlite file where engine replies are remembered between runs')
+    parser.add_argument('--cache-size', type=int, default=100000, help='most replies kept in the cache')
+    parser.add_argument('--book', help='polyglot .bin opening book')
+    parser.add_argument('--book-mode', choices=BOOK_MODES, default='weighted', help='how book moves are picked')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    #if no limit is given, the engines search for the same time as in the game on the screen
+    if args.time is None and args.depth is None and args.nodes is None:
+        args.time = DEFAULT_TIME
+    limit = chess.engine.Limit(time=args.time, depth=args.depth, nodes=args.nodes)
+
+    openings = None
+    if args.openings:
+        with open(args.openings) as file:
+            openings = [line.strip() for line in file if line.strip()]
+
+    #one engine pool per engine command, with two engines for every game that is played at the same time
+    commands = [args.engine, args.black_engine or args.engine]
+    base_options = {'Threads': args.threads, 'Hash': args.hash}
+    pools = {}
+    for command in commands:
+        if command not in pools:
+            pools[command] = EnginePool(command, size=2 * args.concurrency if len(set(commands)) == 1 else args.concurrency, options=base_options)
+
+    #each player leases its engines with its own skill level
+    players = [(f'skill {skill}', pools[command], {'Skill Level': skill}) for command, skill in zip(commands, args.skill)]
+    #the two players need different names for the score at the end
+    if players[0][0] == players[1][0]:
+        players = [(players[0][0] + ' (A)',) + players[0][1:], (players[1][0] + ' (B)',) + players[1][1:]]
+
+    cache = AnalysisCache(args.cache, args.cache_size) if args.cache else None
+    book = OpeningBook(args.book, args.book_mode) if args.book else None
+
+    #points of each player, a win is 1 and a draw is 0.5
+    score = {players[0][0]: 0.0, players[1][0]: 0.0}
+    try:
+        for record in run_games_pooled(players, args.games, limit, args.concurrency, openings, args.max_plies, cache, book):
+            #writing the game out straight away
+            sys.stdout.write(json.dumps(record) + '\n')
+            sys.stdout.flush()
+            if record['result'] == '1-0':
+                score[record['white']] += 1
+            elif record['result'] == '0-1':
+                score[record['black']] += 1
+            else:
+                score[record['white']] += 0.5
+                score[record['black']] += 0.5
+    finally:
+        for pool in pools.values():
+            pool.close()
+        if cache is not None:
+            print(f'cache hits: {cache.hits}, misses: {cache.misses} ({cache.hit_rate():.0%})', file=sys.stderr)
+            cache.close()
+        if book is not None:
+            print(f'book hits: {book.hits}, misses: {book.misses} ({book.hit_rate():.0%})', file=sys.stderr)
+            book.close()
+
+    #the final score goes to stderr, so stdout only has the game records
+    print(' - '.join(f'{name}: {points}' for name, points in score.items()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#the images of the pieces packed into one surface (an atlas)
+#the 12 piece images are scaled to the tile size once and packed side by side into one surface,
+#which is converted to the pixel format of the screen (convert_alpha), so blitting a piece is a plain copy with alpha
+#and never has to convert pixel formats; each piece is a subsurface of the atlas, so the pixels are not copied
+#
+#the scaled atlas is saved in a cache folder, one file per tile size, so a relaunch (or going back to a tile size
+#that was used before) only loads one small image and does not scale the 12 large ones again
+
+import os
+import pygame
+
+#the image file of each piece, lowercase are the black (brown) pieces and uppercase the white ones
+PIECE_FILES = {
+    'r': 'brown-castle.png',
+    'n': 'brown-elephant.png',
+    'b': 'bishop-brown.png',
+    'q': 'brown-queen.png',
+    'k': 'brown-king.png',
+    'p': 'brown-pawn.png',
+    'R': 'white-castle.png',
+    'N': 'white-elephant.png',
+    'B': 'white-bishop.png',
+    'Q': 'white-queen.png',
+    'K': 'white-king.png',
+    'P': 'white-pawn.png',
+}
+
+#the order of the pieces in the atlas, one row for each color
+ATLAS_ROWS = ['rnbqkp', 'RNBQKP']
+
+#folder the scaled atlases are saved in
+CACHE_FOLDER = '.sprite_cache'
+
+
+#the atlas of the piece images at one tile size
+class SpriteAtlas:
+
+    #folder is where the piece images are, cache_folder where the scaled atlases are saved (None to not save them)
+    def __init__(self, tile_size, folder='images', cache_folder=CACHE_FOLDER):
+        self.tile_size = tile_size
+        self.folder = folder
+        self.cache_folder = cache_folder
+        #true if the atlas was loaded from the cache, false if the images had to be scaled
+        self.from_cache = False
+
+        surface = self._load_cached()
+        if surface is None:
+            surface = self._build()
+            self._save(surface)
+        else:
+            self.from_cache = True
+
+        #converting to the pixel format of the screen, this needs the window to be open, without it the atlas still works, only slower
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        self.surface = surface
+
+        #one subsurface per piece, they share the pixels of the atlas
+        self.sprites = {}
+        for row, letters in enumerate(ATLAS_ROWS):
+            for col, piece in enumerate(letters):
+                self.sprites[piece] = surface.subsurface((col * tile_size, row * tile_size, tile_size, tile_size))
+
+    #the image of a piece, e.g. 'K' for the white king
+    def __getitem__(self, piece):
+        return self.sprites[piece]
+
+    #the file the atlas of this tile size is saved in
+    def cache_path(self):
+        return os.path.join(self.cache_folder, f'pieces_{self.tile_size}.png')
+
+    #loading the saved atlas, None if there is none or it is older than one of the piece images
+    def _load_cached(self):
+        if self.cache_folder is None:
+            return None
+        path = self.cache_path()
+        try:
+            saved = os.path.getmtime(path)
+            if any(os.path.getmtime(os.path.join(self.folder, filename)) > saved for filename in PIECE_FILES.values()):
+                return None
+            surface = pygame.image.load(path)
+        except (OSError, pygame.error):
+            return None
+        #a file of the wrong size (e.g. written by another version) is built again
+        if surface.get_size() != (len(ATLAS_ROWS[0]) * self.tile_size, len(ATLAS_ROWS) * self.tile_size):
+            return None
+        return surface
+
+    #loading the 12 piece images, scaling them to the tile size and packing them into one surface
+    def _build(self):
+        tile = self.tile_size
+        surface = pygame.Surface((len(ATLAS_ROWS[0]) * tile, len(ATLAS_ROWS) * tile), pygame.SRCALPHA)
+        for row, letters in enumerate(ATLAS_ROWS):
+            for col, piece in enumerate(letters):
+                image = pygame.image.load(os.path.join(self.folder, PIECE_FILES[piece]))
+                #BLEND_RGBA_MAX onto the empty (fully transparent) atlas copies the pixels and their alpha exactly,
+                #a normal blit would blend the soft edges of the piece with the empty atlas and darken them
+                surface.blit(pygame.transform.scale(image, (tile, tile)), (col * tile, row * tile), special_flags=pygame.BLEND_RGBA_MAX)
+        return surface
+
+    #saving the atlas to the cache folder, a cache that cannot be written is skipped, the game works without it
+    def _save(self, surface):
+        if self.cache_folder is None:
+            return
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            #saving to a temporary file first, so a game started at the same time never reads half a file
+            temp_path = self.cache_path() + '.tmp.png'
+            pygame.image.save(surface, temp_path)
+            os.replace(temp_path, self.cache_path())
+        except (OSError, pygame.error) as error:
+            print(f"Could not save the sprite cache: {error}")
@@ -0,0 +1,5 @@
+#the modules of the game are at the root of the repository, the tests import them from there
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
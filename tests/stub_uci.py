@@ -0,0 +1,85 @@
+#a tiny UCI engine for the tests, it answers every search straight away with a legal move
+#it mates in one when it can, otherwise the move is picked at random with the position as the seed, so the same
+#position always gets the same move and the games are the same on every run
+#the options the tests set (Skill Level, Threads, Hash) are accepted and ignored
+#
+#usage: python tests/stub_uci.py   (speaks UCI on stdin and stdout, e.g. chess.engine.SimpleEngine.popen_uci([sys.executable, path]))
+
+import sys
+import random
+import chess
+
+OPTIONS = [
+    'option name Skill Level type spin default 20 min 0 max 20',
+    'option name Threads type spin default 1 min 1 max 512',
+    'option name Hash type spin default 16 min 1 max 33554432',
+]
+
+
+def send(line):
+    sys.stdout.write(line + '\n')
+    sys.stdout.flush()
+
+
+#the board of a 'position startpos moves ...' or 'position fen <fen> moves ...' command
+def read_position(tokens):
+    if tokens[1] == 'startpos':
+        board = chess.Board()
+        rest = tokens[2:]
+    else:
+        end = tokens.index('moves') if 'moves' in tokens else len(tokens)
+        board = chess.Board(' '.join(tokens[2:end]))
+        rest = tokens[end:]
+    for move in rest[1:]:
+        board.push_uci(move)
+    return board
+
+
+#the move the stub plays, a mate in one if there is one, otherwise one picked with the position as the seed
+def choose(board):
+    moves = sorted(board.legal_moves, key=lambda move: move.uci())
+    for move in moves:
+        board.push(move)
+        mate = board.is_checkmate()
+        board.pop()
+        if mate:
+            return move
+    return random.Random(board.fen()).choice(moves)
+
+
+def main():
+    board = chess.Board()
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == 'uci':
+            send('id name stub')
+            send('id author tests')
+            for option in OPTIONS:
+                send(option)
+            send('uciok')
+        elif command == 'isready':
+            send('readyok')
+        elif command == 'position':
+            board = read_position(tokens)
+        elif command == 'go':
+            #an infinite search or a ponder search only gives its move when it is told to stop
+            if 'infinite' in tokens or 'ponder' in tokens:
+                for line in sys.stdin:
+                    if line.strip() in ('stop', 'ponderhit', 'quit'):
+                        break
+            if not any(board.generate_legal_moves()):
+                send('bestmove (none)')
+                continue
+            move = choose(board)
+            send(f'info depth 1 seldepth 1 nodes {board.legal_moves.count()} score cp 0 pv {move.uci()}')
+            send(f'bestmove {move.uci()}')
+        elif command == 'quit':
+            return
+        #ucinewgame, setoption and stop need no answer
+
+
+if __name__ == '__main__':
+    main()
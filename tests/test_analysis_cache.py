@@ -0,0 +1,124 @@
+#storing engine replies, and removing the ones used the longest time ago when the cache is full
+import itertools
+import chess
+import chess.engine
+import analysis_cache
+from analysis_cache import AnalysisCache, CachedEngine, settings_key, engine_name
+
+SETTINGS = 'Skill Level=10|time=0.1'
+
+
+#a clock that goes up by one every time it is read, so the order entries were used in never depends on the timer resolution
+class Ticks:
+
+    def __init__(self):
+        self.counter = itertools.count()
+
+    def time(self):
+        return float(next(self.counter))
+
+
+#the positions after each of the first moves of the starting position
+def positions(count):
+    boards = []
+    for move in list(chess.Board().legal_moves)[:count]:
+        board = chess.Board()
+        board.push(move)
+        boards.append(board)
+    return boards
+
+
+def reply(board):
+    return next(iter(board.legal_moves))
+
+
+def test_settings_key():
+    assert settings_key({'Skill Level': 10}, chess.engine.Limit(time=0.1)) == SETTINGS
+    assert settings_key({}, chess.engine.Limit(depth=12, nodes=1000)) == 'depth=12|nodes=1000'
+    assert settings_key(None, None) == ''
+    assert settings_key({'Skill Level': 10}, chess.engine.Limit(time=0.1), 'builtin') == 'engine=builtin|' + SETTINGS
+
+
+def test_put_and_get(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.sqlite3'))
+    board = positions(1)[0]
+    assert cache.get(board, SETTINGS) is None
+    info = {'score': chess.engine.PovScore(chess.engine.Cp(35), chess.WHITE), 'depth': 9}
+    cache.put(board, SETTINGS, reply(board), info)
+    #the score is kept for the side to move, which is black after the first move
+    assert cache.get(board, SETTINGS) == {'move': reply(board), 'score': -35, 'depth': 9}
+    assert cache.get(board, 'Skill Level=20|time=0.1') is None
+    assert cache.hit_rate() == 1 / 3
+    cache.close()
+    #the replies are still there when the file is opened again
+    cache = AnalysisCache(str(tmp_path / 'cache.sqlite3'))
+    assert cache.get(board, SETTINGS)['move'] == reply(board)
+    cache.close()
+
+
+def test_least_recently_used_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_cache, 'time', Ticks())
+    cache = AnalysisCache(str(tmp_path / 'cache.sqlite3'), max_entries=10)
+    boards = positions(12)
+    for board in boards[:10]:
+        cache.put(board, SETTINGS, reply(board))
+    #using the oldest entry makes it the newest
+    assert cache.get(boards[0], SETTINGS) is not None
+    #one entry too many removes the oldest ones, a tenth of the cache more than needed
+    cache.put(boards[10], SETTINGS, reply(boards[10]))
+    assert cache.count == 9
+    kept = [cache.get(board, SETTINGS) is not None for board in boards[:11]]
+    assert kept == [True, False, False] + [True] * 8
+    cache.close()
+
+
+def test_replacing_an_entry_does_not_evict(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_cache, 'time', Ticks())
+    cache = AnalysisCache(str(tmp_path / 'cache.sqlite3'), max_entries=3)
+    boards = positions(3)
+    for board in boards:
+        cache.put(board, SETTINGS, reply(board))
+    for _ in range(3):
+        cache.put(boards[0], SETTINGS, reply(boards[0]))
+    assert all(cache.get(board, SETTINGS) is not None for board in boards)
+    cache.close()
+
+
+#an engine that counts how often it was asked
+class CountingEngine:
+
+    def __init__(self, name='counting'):
+        self.id = {'name': name}
+        self.calls = 0
+
+    def play(self, board, limit, game=None, info=chess.engine.INFO_NONE):
+        self.calls += 1
+        return chess.engine.PlayResult(reply(board), None, {'depth': 5})
+
+
+def test_cached_engine(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.sqlite3'))
+    engine = CountingEngine()
+    cached = CachedEngine(engine, cache, {'Skill Level': 10})
+    board = chess.Board()
+    limit = chess.engine.Limit(time=0.1)
+    first = cached.play(board, limit)
+    second = cached.play(board, limit)
+    assert first.move == second.move and second.info == {'depth': 5}
+    assert engine.calls == 1
+    cached.play(board, chess.engine.Limit(time=0.2))
+    assert engine.calls == 2
+    cache.close()
+
+
+def test_engines_do_not_share_replies(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.sqlite3'))
+    builtin, stockfish = CountingEngine('builtin'), CountingEngine('Stockfish 16')
+    assert engine_name(builtin) == 'builtin' and engine_name(object()) == 'unknown'
+    board = chess.Board()
+    limit = chess.engine.Limit(time=0.1)
+    CachedEngine(builtin, cache, {'Skill Level': 10}).play(board, limit)
+    #the same position and settings with another engine is searched by that engine
+    CachedEngine(stockfish, cache, {'Skill Level': 10}).play(board, limit)
+    assert (builtin.calls, stockfish.calls) == (1, 1)
+    cache.close()
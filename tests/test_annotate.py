@@ -0,0 +1,70 @@
+#the marks annotate_game gives a move from the scores before and after it
+import chess
+import chess.pgn
+import pytest
+from annotate import annotate_game, read_games, LOSS_CAP
+from analysis_cache import MATE_SCORE
+
+BEST = chess.Move.from_uci('d2d4')
+
+
+#1. e4 with the scores of the positions before and after it, in centipawns for the side to move
+def annotated(before, after, best=BEST, thresholds=None):
+    game = chess.pgn.Game()
+    game.add_main_variation(chess.Move.from_uci('e2e4'))
+    answers = [(best, before, 20), (chess.Move.from_uci('e7e5'), after, 18)]
+    if thresholds is None:
+        return annotate_game(game, answers).next()
+    return annotate_game(game, answers, thresholds).next()
+
+
+#the loss of the move is the score before it plus the score after it, which is for the other side
+@pytest.mark.parametrize('before, after, nag', [
+    (30, -30, None),
+    (30, 19, None),
+    (30, 20, chess.pgn.NAG_DUBIOUS_MOVE),
+    (30, 69, chess.pgn.NAG_DUBIOUS_MOVE),
+    (30, 70, chess.pgn.NAG_MISTAKE),
+    (30, 269, chess.pgn.NAG_MISTAKE),
+    (30, 270, chess.pgn.NAG_BLUNDER),
+    (30, 900, chess.pgn.NAG_BLUNDER),
+])
+def test_nag_thresholds(before, after, nag):
+    node = annotated(before, after)
+    assert node.nags == ({nag} if nag is not None else set())
+    #python-chess keeps the [%eval] in the comment as well, the better move comes after it
+    assert node.comment.endswith('Best: d4') == (nag is not None)
+    #the evaluation after the move is written from white's point of view
+    assert node.eval().white().score() == -after
+    assert node.eval_depth() == 18
+
+
+def test_no_mark_when_the_best_move_was_played():
+    assert annotated(30, 500, best=chess.Move.from_uci('e2e4')).nags == set()
+    assert annotated(30, 500, best=None).nags == set()
+
+
+def test_thresholds_can_be_changed():
+    assert annotated(30, 20, thresholds=(10, 20, 30)).nags == {chess.pgn.NAG_BLUNDER}
+    assert annotated(30, 20, thresholds=(100, 200, 300)).nags == set()
+
+
+def test_scores_are_capped():
+    #going from mate to a big advantage in a won position is not a mistake
+    assert annotated(MATE_SCORE - 3, -LOSS_CAP).nags == set()
+    #but throwing away a mate is
+    assert annotated(MATE_SCORE - 3, 0).nags == {chess.pgn.NAG_BLUNDER}
+    assert annotated(MATE_SCORE - 3, 0).eval().white().score() == 0
+
+
+def test_read_games_skips_to_start(tmp_path):
+    path = tmp_path / 'games.pgn'
+    with open(path, 'w', encoding='utf-8') as file:
+        for number in range(4):
+            game = chess.pgn.Game()
+            game.headers['Event'] = f'G{number}'
+            file.write(str(game) + '\n\n')
+    assert [game.headers['Event'] for game in read_games(str(path), 2)] == ['G2', 'G3']
+    assert list(read_games(str(path), 4)) == []
+    #nothing is written next to the archive
+    assert [entry.name for entry in tmp_path.iterdir()] == ['games.pgn']
@@ -0,0 +1,77 @@
+#the attack tables and the move generation of the bitboards against python-chess
+import chess
+import chess.polyglot
+import pytest
+import bitboard
+import perft
+from bitboard import WHITE, BLACK
+
+FENS = [fen for _, fen, _ in perft.POSITIONS]
+
+
+def test_step_tables():
+    for square in range(64):
+        assert bitboard.KNIGHT_ATTACKS[square] == chess.BB_KNIGHT_ATTACKS[square]
+        assert bitboard.KING_ATTACKS[square] == chess.BB_KING_ATTACKS[square]
+        assert bitboard.PAWN_ATTACKS[bitboard.WHITE][square] == chess.BB_PAWN_ATTACKS[chess.WHITE][square]
+        assert bitboard.PAWN_ATTACKS[bitboard.BLACK][square] == chess.BB_PAWN_ATTACKS[chess.BLACK][square]
+
+
+#the moves of the generator as UCI names, next to the legal moves python-chess finds
+def check_moves(bitboards, color, board):
+    assert {perft.move_name(move) for move in bitboards.legal_moves_with_promotions(color)} == {move.uci() for move in board.legal_moves}
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_slider_attacks(fen):
+    occupied = chess.Board(fen).occupied
+    for square in range(64):
+        #the attacks of a slider do not depend on what stands on its own square, so every square can be checked
+        rook = chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+        bishop = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+        assert bitboard.slider_attacks(square, occupied, bitboard.ROOK_DIRECTIONS) == rook
+        assert bitboard.slider_attacks(square, occupied, bitboard.BISHOP_DIRECTIONS) == bishop
+        assert bitboard.slider_attacks(square, occupied, bitboard.QUEEN_DIRECTIONS) == rook | bishop
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_legal_moves(fen):
+    bitboards, color = perft.from_fen(fen)
+    board = chess.Board(fen)
+    check_moves(bitboards, color, board)
+    #one ply deeper as well, so the positions after castling, en passant and promotion are checked too
+    for move in list(board.legal_moves):
+        board.push(move)
+        undo = bitboards.push_move(move.from_square, move.to_square, chess.piece_symbol(move.promotion) if move.promotion else None)
+        check_moves(bitboards, color ^ 1, board)
+        bitboards.pop_move(move.from_square, move.to_square, undo)
+        board.pop()
+
+
+#the key after every move of a game is the polyglot key python-chess works out from scratch
+#the games cover castling on both sides, en passant captures (and a double step no pawn can capture), promotion with and without capture,
+#and a rook captured on its starting square
+@pytest.mark.parametrize('fen, moves', [
+    (chess.STARTING_FEN, 'e2e4 g8f6 e4e5 d7d5 e5d6 c7d6 g1f3 b8c6 f1e2 c8g4 e1g1 d8a5 b1c3 e8c8 a2a4 h7h5'),
+    ('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'a1a8 e8d7 h1h8 d7c6'),
+    ('r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1', 'h8h1 e1d2 a8a1'),
+    ('4k3/1P6/8/8/8/8/6p1/4K2R b K - 0 1', 'g2h1n b7b8q e8d7 b8b6 h1g3'),
+    ('4k3/8/8/8/5p2/8/4P3/4K3 w - - 0 1', 'e2e4 f4e3 e1e2'),
+])
+def test_zobrist_key(fen, moves):
+    bitboards, color = perft.from_fen(fen)
+    board = chess.Board(fen)
+    assert bitboards.key == chess.polyglot.zobrist_hash(board)
+    undos = []
+    for move in moves.split():
+        #push_uci checks the moves of the games are legal
+        move = board.push_uci(move)
+        undos.append(bitboards.push_move(move.from_square, move.to_square, chess.piece_symbol(move.promotion) if move.promotion else None))
+        assert bitboards.key == chess.polyglot.zobrist_hash(board)
+        #the key worked out from the whole position agrees with the one kept up to date move by move
+        assert bitboards.key == bitboards.compute_key(WHITE if board.turn == chess.WHITE else BLACK)
+    #taking the moves back gives the keys of the earlier positions again
+    while undos:
+        move = board.pop()
+        bitboards.pop_move(move.from_square, move.to_square, undos.pop())
+        assert bitboards.key == chess.polyglot.zobrist_hash(board)
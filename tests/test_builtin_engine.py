@@ -0,0 +1,76 @@
+#the built-in engine: it finds mates and free material, keeps to the limits of its skill level, and can be stopped
+import chess
+import chess.engine
+import pytest
+import builtin_engine
+from builtin_engine import BuiltinEngine, skill_limits, open_engine
+
+#white mates in one with Qg7 or Qh7
+MATE_IN_ONE = '7k/8/6KQ/8/8/8/8/8 w - - 0 1'
+#the black queen on d5 is not protected, Rxd5 wins it
+HANGING_QUEEN = 'k7/8/8/3q4/8/8/8/K2R4 w - - 0 1'
+
+
+@pytest.fixture
+def engine():
+    engine = open_engine('builtin')
+    yield engine
+    engine.quit()
+
+
+def test_open_engine(engine):
+    assert isinstance(engine, BuiltinEngine)
+    assert engine.id['name'] == builtin_engine.BUILTIN
+
+
+@pytest.mark.parametrize('skill', [0, 10, 20])
+def test_mate_in_one(engine, skill):
+    engine.configure({'Skill Level': skill})
+    board = chess.Board(MATE_IN_ONE)
+    result = engine.play(board, chess.engine.Limit(time=1.0))
+    board.push(result.move)
+    assert board.is_checkmate()
+    assert result.info['score'].white() == chess.engine.Mate(1)
+
+
+def test_wins_free_material(engine):
+    engine.configure({'Skill Level': 5})
+    result = engine.play(chess.Board(HANGING_QUEEN), chess.engine.Limit(time=1.0))
+    assert result.move == chess.Move.from_uci('d1d5')
+
+
+def test_skill_limits():
+    assert skill_limits(0) == (1, 0.05)
+    assert skill_limits(20) == (7, pytest.approx(1.05))
+    assert skill_limits(-5) == skill_limits(0) and skill_limits(30) == skill_limits(20)
+
+
+@pytest.mark.parametrize('skill', [0, 4, 10])
+def test_skill_level_caps_the_depth(engine, skill):
+    engine.configure({'Skill Level': skill})
+    result = engine.play(chess.Board(), chess.engine.Limit(time=5.0))
+    assert result.move in chess.Board().legal_moves
+    assert result.info['depth'] <= skill_limits(skill)[0]
+    #at skill 0 the engine only looks one move ahead
+    if skill == 0:
+        assert result.info['depth'] == 1
+
+
+def test_limit_depth_and_options(engine):
+    #options the engine does not have, such as Threads, are ignored
+    engine.configure({'Skill Level': 20, 'Threads': 4, 'Hash': 1})
+    result = engine.play(chess.Board(), chess.engine.Limit(depth=2))
+    assert result.info['depth'] == 2 and result.info['nodes'] > 0
+    assert engine.max_entries == engine._entries(1)
+
+
+def test_analysis_lines_and_stop(engine):
+    board = chess.Board()
+    with engine.analysis(board, multipv=3) as analysis:
+        lines = set()
+        for info in analysis:
+            lines.add(info['pv'][0])
+            if len(lines) == 3:
+                analysis.stop()
+    assert len(lines) == 3 and all(move in board.legal_moves for move in lines)
+    assert analysis.wait().move in board.legal_moves
@@ -0,0 +1,46 @@
+#repetitions counted by the zobrist keys of ChessRules, against python-chess's is_repetition
+import chess
+import chess.polyglot
+import bitboard
+from chess_rules import ChessRules
+
+#the knights go out and back, so the starting position comes back after every four moves
+SHUFFLE = [((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6))]
+
+
+def test_is_repetition():
+    rules = ChessRules()
+    assert not rules.is_repetition(2)
+    for count in (2, 3):
+        for start, end in SHUFFLE:
+            rules.apply_move(start, end)
+            assert rules.is_repetition() == rules.chess_board.is_repetition()
+            assert rules.position_key() == chess.polyglot.zobrist_hash(rules.chess_board)
+        #the starting position has now been on the board count times
+        assert rules.is_repetition(count)
+        assert not rules.is_repetition(count + 1)
+    assert rules.is_repetition()
+
+
+def test_is_repetition_needs_the_same_side_to_move():
+    #the white king goes around a triangle and the black rook back and forth, so after five moves the pieces
+    #stand where they started but with black to move, which is not the same position
+    fen = '4k2r/8/8/8/8/8/8/4K3 w - - 0 1'
+    rules = ChessRules()
+    rules.load_fen(fen)
+    for start, end in [((7, 4), (7, 3)), ((0, 7), (0, 6)), ((7, 3), (6, 3)), ((0, 6), (0, 7)), ((6, 3), (7, 4))]:
+        assert chess.Move(bitboard.square_of(*start), bitboard.square_of(*end)) in rules.chess_board.legal_moves
+        rules.apply_move(start, end)
+    assert rules.chess_board.board_fen() == chess.Board(fen).board_fen()
+    assert not rules.is_repetition(2)
+    assert not rules.chess_board.is_repetition(2)
+
+
+def test_load_fen_starts_the_count_again():
+    rules = ChessRules()
+    for start, end in SHUFFLE:
+        rules.apply_move(start, end)
+    assert rules.is_repetition(2)
+    rules.load_fen(chess.STARTING_FEN)
+    assert rules.is_repetition(1)
+    assert not rules.is_repetition(2)
@@ -0,0 +1,157 @@
+#the searches of AsyncEngine on its worker thread, with the stub UCI engine: cancelling, pondering and setting options
+import os
+import sys
+import time
+import chess
+import chess.engine
+import pytest
+import builtin_engine
+from engine_driver import AsyncEngine
+
+STUB = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_uci.py')]
+LIMIT = chess.engine.Limit(time=0.05)
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncEngine()
+    engine.launch(lambda: chess.engine.SimpleEngine.popen_uci(STUB)).result()
+    yield engine
+    engine.quit()
+
+
+#the UCI options the stub has been sent, python-chess keeps them on the protocol
+def sent_options(engine):
+    return dict(engine.engine.protocol.config)
+
+
+#the board after 1. e4, and the reply the engine is told to expect
+def after_e4():
+    board = chess.Board()
+    board.push_uci('e2e4')
+    return board, chess.Move.from_uci('e7e5')
+
+
+def test_search(engine):
+    handle = engine.search(chess.Board(), LIMIT)
+    result = handle.result()
+    assert result.move in chess.Board().legal_moves
+    assert handle.done() and handle.info['depth'] == 1
+
+
+def test_cancel_before_the_worker_starts_it(engine):
+    #an unlimited search keeps the worker busy, the stub only answers it when it is stopped
+    busy = engine.search(chess.Board(), None)
+    waiting = engine.search(chess.Board(), LIMIT)
+    waiting.cancel()
+    assert waiting.result() is None
+    busy.stop()
+    assert busy.result().move is not None
+    waiting.future.result()
+    #the worker found it cancelled and never started an analysis for it
+    assert waiting.analysis is None and waiting.result() is None
+
+
+def test_ponder_hit(engine):
+    board, expected = after_e4()
+    engine.ponder(board, expected)
+    time.sleep(0.2)
+    board.push(expected)
+    handle = engine.search(board, chess.engine.Limit(time=0.1))
+    #the ponder search is handed back, it had already searched longer than the limit so it is stopped straight away
+    assert handle.pondered
+    assert handle.result().move in board.legal_moves
+    assert (engine.ponder_hits, engine.ponder_misses) == (1, 0)
+    assert engine.saved_latency == pytest.approx(0.1)
+    assert engine.ponder_handle is None and engine.ponder_hit_rate() == 1.0
+
+
+def test_ponder_hit_waits_for_the_rest_of_the_limit(engine):
+    board, expected = after_e4()
+    engine.ponder(board, expected)
+    board.push(expected)
+    started = time.perf_counter()
+    handle = engine.search(board, chess.engine.Limit(time=0.3))
+    assert handle.result().move in board.legal_moves
+    #the time spent pondering counts towards the limit, the rest is waited for
+    assert 0.15 < time.perf_counter() - started < 1.0
+    assert 0 < engine.saved_latency < 0.3
+
+
+def test_ponder_miss(engine):
+    board, expected = after_e4()
+    engine.ponder(board, expected)
+    ponder_handle = engine.ponder_handle
+    board.push_uci('c7c5')
+    handle = engine.search(board, LIMIT)
+    assert handle is not ponder_handle and not handle.pondered
+    assert handle.result().move in board.legal_moves
+    #the ponder search is thrown away
+    assert ponder_handle.result() is None
+    assert (engine.ponder_hits, engine.ponder_misses, engine.saved_latency) == (0, 1, 0.0)
+    assert engine.ponder_hit_rate() == 0.0
+
+
+def test_ponder_on_an_illegal_move_does_nothing(engine):
+    board, _ = after_e4()
+    engine.ponder(board, chess.Move.from_uci('e2e4'))
+    engine.ponder(board, None)
+    assert engine.ponder_handle is None
+
+
+def test_configure_during_ponder_is_deferred(engine):
+    board, expected = after_e4()
+    engine.ponder(board, expected)
+    ponder_handle = engine.ponder_handle
+    time.sleep(0.1)
+    engine.configure({'Skill Level': 3})
+    time.sleep(0.2)
+    #sending the option now would make python-chess cancel the ponder search, so it waits
+    assert not ponder_handle.done()
+    assert sent_options(engine).get('Skill Level') != 3
+    board.push(expected)
+    handle = engine.search(board, LIMIT)
+    assert handle is ponder_handle and handle.result().move in board.legal_moves
+    #the option is set as soon as the ponder search is over, before the next search
+    engine.search(chess.Board(), LIMIT).result()
+    assert sent_options(engine)['Skill Level'] == 3
+    assert engine.pending_options == {}
+
+
+def test_configure_when_idle(engine):
+    engine.configure({'Skill Level': 7})
+    engine.configure({'Hash': 32})
+    engine.search(chess.Board(), LIMIT).result()
+    assert sent_options(engine)['Skill Level'] == 7 and sent_options(engine)['Hash'] == 32
+
+
+def test_options_set_before_the_engine_is_up():
+    engine = AsyncEngine()
+
+    #an engine that takes a while to start, so the options are set before it is up
+    def open_slowly():
+        time.sleep(0.2)
+        return builtin_engine.open_engine('builtin')
+
+    launched = engine.launch(open_slowly)
+    assert not engine.ready()
+    engine.configure({'Skill Level': 4})
+    #a search started before the engine is up waits for it in the queue
+    handle = engine.search(chess.Board(), LIMIT)
+    assert launched.result().skill_level == 4
+    assert engine.ready() and engine.pending_options == {}
+    assert handle.result().move in chess.Board().legal_moves
+    engine.quit()
+
+
+def test_launch_error_is_raised_by_the_search():
+    engine = AsyncEngine()
+
+    def fail():
+        raise FileNotFoundError('no engine')
+
+    engine.launch(fail)
+    handle = engine.search(chess.Board(), LIMIT)
+    with pytest.raises(FileNotFoundError):
+        handle.result()
+    engine.quit()
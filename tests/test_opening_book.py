@@ -0,0 +1,93 @@
+#choosing moves from a small polyglot book written by the test
+import struct
+import chess
+import chess.engine
+import chess.polyglot
+import pytest
+from opening_book import OpeningBook, BookEngine
+
+
+#the polyglot move of a UCI move, the to square in the low 6 bits, the from square in the next 6 (no castling or promotions here)
+def raw_move(uci):
+    move = chess.Move.from_uci(uci)
+    return move.to_square | move.from_square << 6
+
+
+#writing a book of (moves to reach the position, book move, weight) entries, sorted by key as polyglot wants
+def write_book(path, entries):
+    rows = []
+    for moves, move, weight in entries:
+        board = chess.Board()
+        for played in moves:
+            board.push_uci(played)
+        rows.append((chess.polyglot.zobrist_hash(board), raw_move(move), weight))
+    with open(path, 'wb') as file:
+        for key, move, weight in sorted(rows):
+            file.write(struct.pack('>QHHI', key, move, weight, 0))
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    path = str(tmp_path / 'book.bin')
+    write_book(path, [((), 'e2e4', 30), ((), 'd2d4', 10), (('e2e4',), 'e7e5', 5)])
+    return path
+
+
+def test_best_mode(book_path):
+    book = OpeningBook(book_path, 'best')
+    assert book.choose(chess.Board()) == chess.Move.from_uci('e2e4')
+    board = chess.Board()
+    board.push_uci('e2e4')
+    assert book.choose(board) == chess.Move.from_uci('e7e5')
+    book.close()
+
+
+def test_weighted_mode_follows_the_weights(book_path):
+    book = OpeningBook(book_path, 'weighted', seed=1)
+    moves = [book.choose(chess.Board()).uci() for _ in range(400)]
+    assert set(moves) == {'e2e4', 'd2d4'}
+    assert 0.65 < moves.count('e2e4') / len(moves) < 0.85
+    #the same seed gives the same openings
+    again = OpeningBook(book_path, 'weighted', seed=1)
+    assert [again.choose(chess.Board()).uci() for _ in range(400)] == moves
+    book.close()
+    again.close()
+
+
+def test_position_not_in_the_book(book_path):
+    book = OpeningBook(book_path, 'best')
+    board = chess.Board()
+    board.push_uci('g1f3')
+    assert book.choose(board) is None
+    #with the key given, a miss is found without hashing the board
+    key = chess.polyglot.zobrist_hash(board)
+    assert not book.contains(key)
+    assert book.choose(board, key) is None
+    assert book.contains(chess.polyglot.zobrist_hash(chess.Board()))
+    assert book.choose(chess.Board(), chess.polyglot.zobrist_hash(chess.Board())) == chess.Move.from_uci('e2e4')
+    assert (book.hits, book.misses, book.hit_rate()) == (1, 2, 1 / 3)
+    book.close()
+
+
+def test_unknown_mode(book_path):
+    with pytest.raises(ValueError):
+        OpeningBook(book_path, 'random')
+
+
+#an engine that always plays the first legal move, for when the game has left the book
+class FirstMoveEngine:
+
+    def play(self, board, limit, game=None, info=chess.engine.INFO_NONE):
+        return chess.engine.PlayResult(next(iter(board.legal_moves)), None, {})
+
+
+def test_book_engine(book_path):
+    engine = BookEngine(FirstMoveEngine(), OpeningBook(book_path, 'best'))
+    limit = chess.engine.Limit(time=0.1)
+    result = engine.play(chess.Board(), limit)
+    assert result.move == chess.Move.from_uci('e2e4') and result.info == {'string': 'book'}
+    board = chess.Board()
+    board.push_uci('d2d4')
+    result = engine.play(board, limit)
+    assert result.move == next(iter(board.legal_moves)) and result.info == {}
+    engine.book.close()
@@ -0,0 +1,27 @@
+#the move generator against the known node counts of the standard perft positions
+import chess
+import pytest
+import perft
+
+#depth 3 of every position is under 100000 nodes, a few seconds in all
+DEPTH = 3
+
+
+@pytest.mark.parametrize('name, fen, counts', perft.POSITIONS, ids=[name for name, _, _ in perft.POSITIONS])
+def test_perft(name, fen, counts):
+    bitboards, color = perft.from_fen(fen)
+    assert [perft.perft(bitboards, color, depth) for depth in range(1, DEPTH + 1)] == counts[:DEPTH]
+
+
+def test_perft_leaves_the_position_as_it_was():
+    bitboards, color = perft.from_fen(perft.POSITIONS[1][1])
+    before = perft.divide(bitboards, color, 1)
+    perft.perft(bitboards, color, DEPTH)
+    assert perft.divide(bitboards, color, 1) == before
+
+
+def test_divide_matches_python_chess():
+    name, fen, counts = perft.POSITIONS[3]
+    bitboards, color = perft.from_fen(fen)
+    counts = perft.divide(bitboards, color, 2)
+    assert counts == perft.chess_divide(chess.Board(fen), 2)
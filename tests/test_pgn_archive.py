@@ -0,0 +1,131 @@
+#appending games to an archive, its index on disk, and what happens when the archive changes behind its back
+import os
+import array
+import chess
+import chess.pgn
+import chess.engine
+from pgn_archive import PgnArchive, GameRecorder, recorded_moves, game_result, read_index, INDEX_SUFFIX
+
+
+#a game with the given moves and an Event header to tell it apart
+def make_game(event, moves=('e2e4', 'e7e5')):
+    game = chess.pgn.Game()
+    game.headers['Event'] = event
+    node = game
+    for move in moves:
+        node = node.add_variation(chess.Move.from_uci(move))
+    return game
+
+
+def events(games):
+    return [game.headers['Event'] for game in games]
+
+
+def test_append_and_read(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    archive = PgnArchive(path)
+    assert len(archive) == 0 and list(archive) == []
+    assert [archive.append(make_game(f'G{number}')) for number in range(3)] == [0, 1, 2]
+    assert events(archive) == ['G0', 'G1', 'G2']
+    assert archive.game(-1).headers['Event'] == 'G2'
+    assert archive.headers(1)['Event'] == 'G1'
+    assert events(archive.games(1)) == ['G1', 'G2']
+    assert list(archive.games(3)) == []
+    assert [move.uci() for move in archive.game(0).mainline_moves()] == ['e2e4', 'e7e5']
+
+
+def test_index_is_reloaded(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    archive = PgnArchive(path)
+    for number in range(3):
+        archive.append(make_game(f'G{number}'))
+    offsets, indexed = read_index(path)
+    assert list(offsets) == list(archive.offsets)
+    assert indexed == os.path.getsize(path)
+    #a new archive object takes the index from the file, nothing has to be read again
+    again = PgnArchive(path)
+    assert list(again.offsets) == list(archive.offsets)
+    assert events(again) == ['G0', 'G1', 'G2']
+
+
+def test_games_written_by_someone_else_are_indexed(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    archive = PgnArchive(path)
+    archive.append(make_game('G0'))
+    #a game written without the archive, and with no newline at the end
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(str(make_game('G1')))
+    archive.append(make_game('G2'))
+    assert events(archive) == ['G0', 'G1', 'G2']
+    assert events(PgnArchive(path)) == ['G0', 'G1', 'G2']
+
+
+def test_truncated_archive_is_indexed_again(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    archive = PgnArchive(path)
+    for number in range(3):
+        archive.append(make_game(f'G{number}'))
+    #the archive is replaced by a smaller one, the old index does not fit it any more
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(str(make_game('new')) + '\n\n')
+    again = PgnArchive(path)
+    assert events(again) == ['new']
+    assert read_index(path)[1] == os.path.getsize(path)
+    #the archive object that was already open notices it on its next append
+    assert archive.append(make_game('after')) == 1
+    assert events(archive) == ['new', 'after']
+
+
+def test_missing_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    archive = PgnArchive(path)
+    for number in range(3):
+        archive.append(make_game(f'G{number}'))
+    offsets = list(archive.offsets)
+    os.remove(path + INDEX_SUFFIX)
+    assert list(PgnArchive(path).offsets) == offsets
+    assert os.path.exists(path + INDEX_SUFFIX)
+
+
+def test_recorder_and_recorded_moves(tmp_path):
+    archive = PgnArchive(str(tmp_path / 'games.pgn'))
+    recorder = GameRecorder(archive, {'White': 'Player'})
+    recorder.record(chess.Move.from_uci('e2e4'), 598.5)
+    recorder.record(chess.Move.from_uci('e7e5'), 59.0, chess.engine.PovScore(chess.engine.Cp(-20), chess.BLACK), 12)
+    assert recorder.finish('*', 'unterminated', {'Black': 'AI'}) == 0
+    assert recorder.moves == 0
+    game = archive.game(0)
+    assert (game.headers['White'], game.headers['Black'], game.headers['Result']) == ('Player', 'AI', '*')
+    board, moves = recorded_moves(game)
+    assert board.fen() == chess.STARTING_FEN
+    (first, clock, score, depth), (second, clock2, score2, depth2) = moves
+    assert (first.uci(), clock, score, depth) == ('e2e4', 598.5, None, None)
+    assert (second.uci(), clock2, score2.white(), depth2) == ('e7e5', 59.0, chess.engine.Cp(20), 12)
+    assert game_result(game) is None
+
+
+def test_game_result():
+    game = make_game('mate', ('f2f3', 'e7e5', 'g2g4', 'd8h4'))
+    #a mate with no result written is still over
+    assert game_result(game) == '0-1'
+    game.headers['Result'] = '0-1'
+    game.headers['Termination'] = 'normal'
+    assert game_result(game) == '0-1, normal'
+    game = make_game('time')
+    game.headers['Result'] = '1-0'
+    game.headers['Termination'] = 'time forfeit'
+    assert game_result(game) == '1-0, time forfeit'
+
+
+def test_emptied_archive_then_append(tmp_path):
+    path = str(tmp_path / 'games.pgn')
+    archive = PgnArchive(path)
+    for number in range(3):
+        archive.append(make_game(f'G{number}'))
+    open(path, 'w').close()
+    assert len(PgnArchive(path)) == 0
+    assert read_index(path) == (array.array('Q'), 0)
+    archive.append(make_game('after'))
+    again = PgnArchive(path)
+    assert list(again.offsets) == [0]
+    assert events(again) == ['after']
@@ -0,0 +1,52 @@
+#the bytearray position against python-chess: FEN strings, making moves and taking them back
+import chess
+import pytest
+import perft
+from position import Position, STARTING_FEN
+
+FENS = [fen for _, fen, _ in perft.POSITIONS] + [
+    #en passant squares that can be captured, that can not (the pawn would leave its king in check), and none at all
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+    '8/8/8/K2pP2r/8/8/8/7k w - d6 0 1',
+    '4k3/8/8/8/8/8/8/4K3 b - - 12 40',
+]
+
+
+#everything a position holds, to compare it before and after a move is taken back
+def state(position):
+    return (bytes(position.squares), position.turn, position.castling, position.ep_square, position.halfmove_clock, position.fullmove_number)
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_fen(fen):
+    assert Position.from_fen(fen).fen() == chess.Board(fen).fen()
+
+
+def test_starting():
+    position = Position.starting()
+    assert position.fen() == STARTING_FEN
+    assert (position.piece(0, 4), position.piece(7, 3), position.piece_at(chess.E2), position.piece_at(chess.E4)) == ('k', 'Q', 'P', '')
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_make_and_unmake_move(fen):
+    position = Position.from_fen(fen)
+    board = chess.Board(fen)
+    before = state(position)
+    for move in list(board.legal_moves):
+        undo = position.make_move(move.from_square, move.to_square, chess.piece_symbol(move.promotion) if move.promotion else None)
+        board.push(move)
+        #castling, en passant, promotion, the castling rights and the clocks all end up the way python-chess has them
+        assert position.fen() == board.fen()
+        board.pop()
+        position.unmake_move(move.from_square, move.to_square, undo)
+        #taking the move back gives exactly the same bytes and state as before
+        assert state(position) == before
+
+
+def test_copy():
+    position = Position.starting()
+    copy = position.copy()
+    copy.make_move(chess.E2, chess.E4)
+    assert position.fen() == STARTING_FEN
+    assert copy.fen() == 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
@@ -0,0 +1,100 @@
+#headless games through the stub UCI engine, one at a time and with engines leased from pools
+import os
+import sys
+import chess
+import chess.engine
+import pytest
+from engine_pool import EnginePool
+from selfplay import play_game, run_games, run_games_pooled
+
+STUB = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_uci.py')]
+LIMIT = chess.engine.Limit(time=0.01)
+RESULTS = ('1-0', '0-1', '1/2-1/2')
+
+
+#checking a record of a finished game, its moves have to be legal from its start position and add up with the search counts
+def check_record(record, max_plies):
+    assert record['result'] in RESULTS
+    assert record['plies'] == len(record['moves']) <= max_plies
+    board = chess.Board(record['fen'])
+    for move in record['moves']:
+        assert chess.Move.from_uci(move) in board.legal_moves
+        board.push_uci(move)
+    search = record['search']
+    assert search['w']['moves'] + search['b']['moves'] == record['plies']
+    #the stub sends the nodes it searched with every move
+    for side in search.values():
+        assert (side['nodes'] > 0) == (side['moves'] > 0)
+    if record['termination'] == 'checkmate':
+        assert board.is_checkmate()
+
+
+@pytest.fixture
+def engines():
+    white = chess.engine.SimpleEngine.popen_uci(STUB)
+    black = chess.engine.SimpleEngine.popen_uci(STUB)
+    yield white, black
+    white.quit()
+    black.quit()
+
+
+def test_play_game(engines):
+    record = play_game(*engines, LIMIT, max_plies=60)
+    check_record(record, 60)
+    assert record['fen'] == chess.STARTING_FEN
+
+
+def test_play_game_from_fen(engines):
+    #white mates in one with Qg7 or Qh7, the stub finds it
+    fen = '7k/8/6KQ/8/8/8/8/8 w - - 0 1'
+    record = play_game(*engines, LIMIT, fen=fen, max_plies=60)
+    check_record(record, 60)
+    assert (record['result'], record['termination'], record['plies']) == ('1-0', 'checkmate', 1)
+
+
+def test_play_game_move_limit(engines):
+    record = play_game(*engines, LIMIT, max_plies=6)
+    assert (record['result'], record['termination'], record['plies']) == ('1/2-1/2', 'move limit', 6)
+
+
+def test_run_games(engines):
+    white, black = engines
+    openings = [chess.STARTING_FEN, '7k/8/6KQ/8/8/8/8/8 w - - 0 1']
+    records = list(run_games([('first', white), ('second', black)], 4, LIMIT, openings, max_plies=40))
+    assert [record['game'] for record in records] == [1, 2, 3, 4]
+    #the players swap colors after every game, and the games go through the openings in order
+    assert [record['white'] for record in records] == ['first', 'second', 'first', 'second']
+    assert [record['fen'] for record in records] == openings * 2
+    for record in records:
+        check_record(record, 40)
+
+
+@pytest.mark.parametrize('size, concurrency', [(2, 1), (4, 2)])
+def test_run_games_pooled(size, concurrency):
+    pool = EnginePool(STUB, size=size, options={'Threads': 1})
+    players = [('low', pool, {'Skill Level': 1}), ('high', pool, {'Skill Level': 20})]
+    try:
+        records = []
+        #the records come out one by one as the games finish
+        for record in run_games_pooled(players, 4, LIMIT, concurrency, max_plies=40):
+            check_record(record, 40)
+            records.append(record)
+    finally:
+        pool.close()
+    assert sorted(record['game'] for record in records) == [1, 2, 3, 4]
+    #the players swap colors after every game
+    for record in records:
+        assert record['white'] == ('low' if record['game'] % 2 == 1 else 'high')
+        assert {record['white'], record['black']} == {'low', 'high'}
+    assert pool.restarts == 0
+
+
+def test_pool_lease_options():
+    with EnginePool(STUB, size=1, options={'Hash': 32}) as pool:
+        with pool.lease({'Skill Level': 3}) as engine:
+            assert pool.applied[id(engine)] == {'Hash': 32, 'Skill Level': 3}
+        #an option the next lease does not ask for goes back to the engine default
+        with pool.lease() as same:
+            assert same is engine
+            assert pool.applied[id(engine)] == {'Hash': 32}
+    assert pool.closed
@@ -0,0 +1,78 @@
+#the time the AI gives a move, and the limits of its searches
+import chess.engine
+import pytest
+import time_control
+from time_control import allocate, round_time, skill_limits, format_time, Clock, TimeManager
+
+
+def test_allocate_shares_out_the_time_left():
+    #50 moves expected, so on move 1 a 49th of the time left plus most of the increment
+    assert allocate(60, 1, 1) == pytest.approx(60 / 49 + 0.8)
+    #late in the game it still plans for MIN_MOVES_TO_GO more moves
+    assert allocate(60, 0, 45) == pytest.approx(60 / time_control.MIN_MOVES_TO_GO)
+
+
+def test_allocate_instability_doubles_at_most():
+    steady = allocate(60, 1, 1)
+    assert allocate(60, 1, 1, 0.5) == pytest.approx(steady * 1.5)
+    assert allocate(60, 1, 1, 1.0) == pytest.approx(steady * 2)
+    assert allocate(60, 1, 1, 5.0) == pytest.approx(steady * 2)
+
+
+def test_allocate_never_runs_the_clock_out():
+    #a big increment with little time left is capped at a share of the time left
+    assert allocate(10, 5, 1) == pytest.approx(10 * time_control.MAX_SHARE - time_control.SAFETY_MARGIN)
+    assert allocate(10, 5, 1, 1.0) == pytest.approx(10 * time_control.MAX_SHARE - time_control.SAFETY_MARGIN)
+    #with almost nothing left it still searches a little
+    assert allocate(0.01, 0, 1) == time_control.MIN_THINK_TIME
+    assert allocate(-1, 0, 1) == time_control.MIN_THINK_TIME
+
+
+@pytest.mark.parametrize('seconds, rounded', [(0.01, 0.01), (0.025, 0.025), (0.07, 0.05), (0.79, 0.4), (2.02, 1.6), (100, 6.4)])
+def test_round_time(seconds, rounded):
+    assert round_time(seconds) == rounded
+
+
+def test_skill_limits():
+    assert skill_limits(0) == (4, 5000)
+    assert skill_limits(2) == (5, 10000)
+    assert skill_limits(20) == (None, None)
+    assert skill_limits(-3) == skill_limits(0)
+    assert skill_limits(25) == (None, None)
+
+
+@pytest.mark.parametrize('seconds, text', [(600, '10:00'), (65.9, '1:05'), (9.54, '0:09.5'), (-2, '0:00.0')])
+def test_format_time(seconds, text):
+    assert format_time(seconds) == text
+
+
+def test_clock_increment_and_odds():
+    clock = Clock((60, 1), (30, 0.2))
+    assert clock.describe('w') == '1+1' and clock.describe('b') == '0.5+0.2'
+    clock.start('b')
+    clock.started -= 2.0
+    assert clock.time_left('b') == pytest.approx(28.0, abs=0.1)
+    assert clock.stop() == pytest.approx(2.0, abs=0.1)
+    assert clock.time_left('b') == pytest.approx(28.2, abs=0.1)
+    assert clock.time_left('w') == 60
+    assert clock.flagged() is None
+    clock.start('w')
+    clock.started -= 61
+    assert clock.flagged() == 'w'
+
+
+def test_time_manager_limit():
+    clock = Clock((600, 5), (60, 1))
+    manager = TimeManager(clock)
+    assert manager.limit('b', 1, 20) == chess.engine.Limit(time=1.6)
+    assert manager.limit('b', 1, 0) == chess.engine.Limit(time=1.6, depth=4, nodes=5000)
+    #a jump of the evaluation gives the next move twice the time
+    for score in (0, 150):
+        manager.record({'score': chess.engine.PovScore(chess.engine.Cp(score), chess.BLACK)})
+    assert manager.instability() == pytest.approx(1.5)
+    assert manager.limit('b', 1, 20) == chess.engine.Limit(time=3.2)
+    #an info with no score leaves the evaluations as they are
+    manager.record({})
+    assert manager.instability() == pytest.approx(1.5)
+    manager.reset()
+    assert manager.instability() == 0.0
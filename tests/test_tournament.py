@@ -0,0 +1,63 @@
+#the pairings and schedule of a tournament, the Elo of a score and the ratings fitted from the results
+import math
+import pytest
+from tournament import elo, elo_interval, fit_ratings, pairings, schedule
+
+
+def test_pairings():
+    assert pairings(4, 'round-robin') == [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)]
+    #in a gauntlet the first player meets every other one, and the others do not meet each other
+    assert pairings(4, 'gauntlet') == [(0, 1), (0, 2), (0, 3)]
+
+
+def test_schedule_plays_each_opening_with_both_colors():
+    pairs = pairings(3, 'round-robin')
+    games = schedule(pairs, ['a', 'b'], rounds=2)
+    assert [game[0] for game in games] == list(range(1, 2 * 3 * 2 * 2 + 1))
+    for pair in pairs:
+        for opening in (0, 1):
+            colors = [(white, black) for _, game_pair, number, white, black in games if game_pair == pair and number == opening]
+            assert sorted(colors) == sorted([pair, pair[::-1]] * 2)
+
+
+def test_elo():
+    assert elo(0.5) == 0
+    assert elo(0.75) == pytest.approx(190.85, abs=0.01)
+    assert elo(0.25) == pytest.approx(-elo(0.75))
+    assert elo(0) == -math.inf and elo(1) == math.inf
+
+
+def test_elo_interval():
+    rating, low, high = elo_interval(30, 20, 10)
+    assert rating == pytest.approx(elo(40 / 60))
+    assert low < rating < high
+    assert elo_interval(0, 0, 0) == (0.0, -math.inf, math.inf)
+
+
+def test_fit_ratings_two_players():
+    #with two players the fit is the Elo of the score, the virtual draw adds half a point to each side
+    ratings = fit_ratings(2, {(0, 1): [30, 0, 10]})
+    assert ratings[0] == 0
+    assert ratings[1] == pytest.approx(-400 * math.log10(30.5 / 10.5), abs=0.01)
+
+
+def test_fit_ratings_even_results():
+    ratings = fit_ratings(3, {(0, 1): [5, 10, 5], (0, 2): [0, 20, 0], (1, 2): [7, 6, 7]})
+    assert ratings == pytest.approx([0, 0, 0], abs=1e-6)
+
+
+def test_fit_ratings_order_and_no_losses():
+    #the strongest player never lost, the virtual draw keeps its rating finite
+    results = {(0, 1): [0, 2, 18], (0, 2): [0, 0, 20], (1, 2): [2, 4, 14]}
+    ratings = fit_ratings(3, results)
+    assert ratings[0] == 0
+    assert 0 < ratings[1] < ratings[2] < math.inf
+    #who is listed first in a pair does not change the fit
+    swapped = {(b, a): [lost, drawn, won] for (a, b), (won, drawn, lost) in results.items()}
+    assert fit_ratings(3, swapped) == pytest.approx(ratings)
+
+
+def test_fit_ratings_pair_without_games():
+    #players 0 and 2 never met, they are rated through player 1
+    ratings = fit_ratings(3, {(0, 1): [10, 0, 10], (1, 2): [10, 0, 10]})
+    assert ratings == pytest.approx([0, 0, 0], abs=1e-6)
@@ -0,0 +1,157 @@
+#time management of the AI: game clocks with an increment, and how long the engine searches for each move
+#the engine used to search every move for the same 0.1 seconds, whatever the position or the time left
+#now each side has a clock (base time plus an increment after every move), and the AI spends its time the way a player would:
+#a share of what is left, more while the evaluation is jumping around, less when it is running short
+#the weaker skill levels also get a depth and node cap, so they play at the same strength however fast the computer is
+#
+#the colors are 'w' and 'b', the same as the turn of ChessRules
+
+import time
+import chess.engine
+
+#the number of moves the AI plans to still play in a game, used to share out its time, it is never planned for fewer than MIN_MOVES_TO_GO
+EXPECTED_MOVES = 50
+MIN_MOVES_TO_GO = 15
+#share of the increment that is spent on the move, the rest builds up on the clock
+INCREMENT_SHARE = 0.8
+#a move never takes more than this share of the time left, and SAFETY_MARGIN seconds are always kept back for the overhead
+MAX_SHARE = 0.3
+SAFETY_MARGIN = 0.05
+#the shortest search the AI does, even with almost no time left
+MIN_THINK_TIME = 0.02
+#centipawns the evaluation has to change between two moves for the AI to spend double the time, the extra time grows up to that
+INSTABILITY_SCALE = 100
+#a mate score counts as this many centipawns when the change of the evaluation is worked out
+MATE_SCORE = 10000
+#the search times are rounded down to these steps (seconds), so the analysis cache finds positions searched with the same time again
+TIME_STEPS = [0.025, 0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4]
+
+
+#the depth and node caps of a skill level, (None, None) at skill 20 where the engine searches as far as its time goes
+#the caps double the nodes every two levels, from depth 4 and 5000 nodes at skill 0 to depth 13 and about 3 million at skill 19
+def skill_limits(skill):
+    skill = max(0, min(20, skill))
+    if skill == 20:
+        return None, None
+    return 4 + skill // 2, int(5000 * 2 ** (skill / 2))
+
+
+#rounding a search time down to one of the TIME_STEPS, anything under the first step is kept as it is
+def round_time(seconds):
+    rounded = seconds
+    for step in TIME_STEPS:
+        if step > seconds:
+            break
+        rounded = step
+    return rounded
+
+
+#the seconds to search a move, from the time left on the clock, the increment, the number of the move (1 for the first move)
+#and the instability of the evaluation (0 when it is steady, 1 or more when it moved by INSTABILITY_SCALE centipawns or more)
+def allocate(remaining, increment, move_number, instability=0.0):
+    moves_to_go = max(MIN_MOVES_TO_GO, EXPECTED_MOVES - move_number)
+    seconds = remaining / moves_to_go + increment * INCREMENT_SHARE
+    #while the evaluation is changing the position is not settled yet, so it is searched for up to twice as long
+    seconds *= 1 + min(instability, 1.0)
+    #the time of one move is capped so the clock never runs out, however much the instability asks for
+    seconds = min(seconds, remaining * MAX_SHARE - SAFETY_MARGIN)
+    return max(MIN_THINK_TIME, seconds)
+
+
+#text of a time on a clock, e.g. '4:05', or '0:09.5' for the last ten seconds
+def format_time(seconds):
+    seconds = max(0.0, seconds)
+    if seconds < 10:
+        return f"0:{seconds:04.1f}"
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+#the clocks of both sides, only one of them runs at a time
+class Clock:
+
+    #white and black are the (base, increment) of each side, the seconds it starts with and the seconds added after every move
+    #black gets the same as white if it is not given, with different ones the sides play with time odds
+    def __init__(self, white, black=None):
+        self.controls = {'w': white, 'b': black or white}
+        self.reset()
+
+    #the seconds a side starts with, and the seconds added to its clock after every move
+    def base(self, color):
+        return self.controls[color][0]
+
+    def increment(self, color):
+        return self.controls[color][1]
+
+    #the time control of a side as text, e.g. '5+3' for 5 minutes and 3 seconds a move
+    def describe(self, color):
+        return f"{self.base(color) / 60:g}+{self.increment(color):g}"
+
+    #starting both clocks again from the base time, neither of them running
+    def reset(self):
+        self.remaining = {color: float(self.base(color)) for color in ('w', 'b')}
+        #the side whose clock is running, None if none is, and when it was started
+        self.running = None
+        self.started = 0.0
+
+    #starting the clock of a side, the clock that was running is stopped first
+    def start(self, color):
+        self.stop()
+        self.running = color
+        self.started = time.perf_counter()
+
+    #stopping the running clock after its side moved, the time it ran is taken off and the increment added
+    #returns the seconds it ran, 0 if no clock was running
+    def stop(self):
+        if self.running is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.started
+        self.remaining[self.running] += self.increment(self.running) - elapsed
+        self.running = None
+        return elapsed
+
+    #the seconds a side has left, counting the time its clock has been running
+    def time_left(self, color):
+        left = self.remaining[color]
+        if self.running == color:
+            left -= time.perf_counter() - self.started
+        return left
+
+    #the side whose time has run out, None if both have time left
+    def flagged(self):
+        for color in ('w', 'b'):
+            if self.time_left(color) <= 0:
+                return color
+        return None
+
+
+#working out the search limit of every move of the AI, from its clock, the skill level and how the evaluation moved
+class TimeManager:
+
+    def __init__(self, clock):
+        self.clock = clock
+        #the last evaluations of the AI's searches in centipawns, from the AI's point of view
+        self.scores = []
+
+    #forgetting the evaluations of the last game
+    def reset(self):
+        self.scores = []
+
+    #the chess.engine.Limit of the next search for color, move_number is the number of the full move (1 for the first)
+    def limit(self, color, move_number, skill):
+        seconds = allocate(self.clock.time_left(color), self.clock.increment(color), move_number, self.instability())
+        depth, nodes = skill_limits(skill)
+        return chess.engine.Limit(time=round_time(seconds), depth=depth, nodes=nodes)
+
+    #remembering the evaluation of a search, info is the info the engine sent with its move
+    def record(self, info):
+        score = info.get('score')
+        if score is None:
+            return
+        self.scores = self.scores[-1:] + [score.relative.score(mate_score=MATE_SCORE)]
+
+    #how much the evaluation changed between the last two searches, 1 for INSTABILITY_SCALE centipawns
+    def instability(self):
+        if len(self.scores) < 2:
+            return 0.0
+        return abs(self.scores[-1] - self.scores[-2]) / INSTABILITY_SCALE
@@ -0,0 +1,279 @@
+#calibration tournaments between skill levels (and search times) of an engine, to see what each level costs and how strong it is
+#the games are played by selfplay.play_game on a pool of worker processes, each with its own warm engines,
+#and every opening is played twice with the colors swapped (paired openings), so neither player gets the better side more often
+#every finished game is written out straight away as one line of JSON, and the standings are printed as the games come in
+#at the end it prints, for every player, an Elo estimate with its 95% error bars, the milliseconds and nodes per move
+#
+#usage: python tournament.py --engine path/to/stockfish --players 0 5 10 15 20 --concurrency 8 > games.jsonl
+#       python tournament.py --engine builtin --players 10@0.1 10@0.05 5@0.1 --mode gauntlet --budget-ms 100
+#a player is a skill level, with @ and the seconds per move if it searches for a different time than --time
+
+import sys
+import json
+import math
+import argparse
+import itertools
+import multiprocessing.util
+import concurrent.futures
+import chess
+import chess.engine
+from engine_pool import EnginePool
+from selfplay import play_game, MAX_PLIES, DEFAULT_TIME
+
+#the openings the games start from when no --openings file is given, a few balanced moves of the common openings
+#every one is played twice between each pair of players, once with each player as white
+DEFAULT_OPENINGS = [
+    'e2e4 e7e5 g1f3 b8c6 f1b5',           #ruy lopez
+    'e2e4 e7e5 g1f3 b8c6 f1c4 f8c5',      #italian
+    'e2e4 c7c5 g1f3 d7d6 d2d4 c5d4',      #sicilian
+    'e2e4 e7e6 d2d4 d7d5',                #french
+    'e2e4 c7c6 d2d4 d7d5',                #caro-kann
+    'd2d4 d7d5 c2c4 e7e6 b1c3 g8f6',      #queen's gambit declined
+    'd2d4 g8f6 c2c4 g7g6 b1c3 f8g7',      #king's indian
+    'c2c4 e7e5 b1c3 g8f6',                #english
+]
+#the z of the 95% error bars
+Z_95 = 1.96
+#the MM iterations used to fit the ratings of a round robin
+RATING_ITERATIONS = 200
+
+#the engine pool of a worker process, made once by _init_worker and used by every game the worker plays
+_pool = None
+
+
+#reading a player like '10' or '10@0.05', returns (name, skill, seconds per move)
+def parse_player(text, default_time):
+    skill, _, seconds = text.partition('@')
+    seconds = float(seconds) if seconds else default_time
+    name = f'skill {int(skill)}' if seconds == default_time else f'skill {int(skill)} @ {seconds:g}s'
+    return name, int(skill), seconds
+
+
+#the FEN strings of openings given as moves in UCI notation (like DEFAULT_OPENINGS)
+def openings_from_moves(lines):
+    fens = []
+    for line in lines:
+        board = chess.Board()
+        for uci in line.split():
+            board.push_uci(uci)
+        fens.append(board.fen())
+    return fens
+
+
+#the pairs of players that play each other, as indexes into the list of players
+#'round-robin' is every player against every other, 'gauntlet' is the first player against each of the others
+def pairings(count, mode):
+    if mode == 'gauntlet':
+        return [(0, other) for other in range(1, count)]
+    return list(itertools.combinations(range(count), 2))
+
+
+#the list of games to play, as (game number, pair, opening number, white index, black index)
+#every opening is played twice per pair, the second time with the colors swapped
+def schedule(pairs, openings, rounds=1):
+    games = []
+    for _ in range(rounds):
+        for pair in pairs:
+            for number in range(len(openings)):
+                games.append((len(games) + 1, pair, number, pair[0], pair[1]))
+                games.append((len(games) + 1, pair, number, pair[1], pair[0]))
+    return games
+
+
+#starting the engines of a worker process, two of them, one for each side of a game
+def _init_worker(command, options):
+    global _pool
+    _pool = EnginePool(command, size=2, options=options)
+    #the worker processes do not run atexit, the engines are closed by the finalizer of multiprocessing when the worker stops
+    multiprocessing.util.Finalize(None, _pool.close, exitpriority=10)
+
+
+#playing one game of the tournament in a worker process, players are the (name, skill, seconds) of all the players
+def _play(game, players, opening, max_plies):
+    number, pair, opening_number, white, black = game
+    (white_name, white_skill, white_time), (black_name, black_skill, black_time) = players[white], players[black]
+    record = {'game': number, 'white': white_name, 'black': black_name, 'opening': opening_number}
+    with _pool.lease({'Skill Level': white_skill}) as white_engine, _pool.lease({'Skill Level': black_skill}) as black_engine:
+        record.update(play_game(white_engine, black_engine, chess.engine.Limit(time=white_time), opening, max_plies,
+                                black_limit=chess.engine.Limit(time=black_time)))
+    return record
+
+
+#the Elo difference of a score (share of the points, between 0 and 1), it is infinite for a score of 0 or 1
+def elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+#the Elo difference of wins, draws and losses with its 95% error bars, as (elo, low, high)
+#the error bars come from the spread of the game results around the mean score
+def elo_interval(wins, draws, losses):
+    games = wins + draws + losses
+    if not games:
+        return 0.0, -math.inf, math.inf
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = Z_95 * math.sqrt(variance / games)
+    return elo(score), elo(score - margin), elo(score + margin)
+
+
+#the ratings of the players from the results between them, with the first player at 0
+#results[(a, b)] is [wins, draws, losses] of a against b, the ratings are fitted with the MM algorithm of the Bradley-Terry model,
+#a draw counts as half a win for each side, a player with no wins or no losses is pulled in by a virtual draw against each opponent
+def fit_ratings(count, results):
+    wins = [[0.0] * count for _ in range(count)]
+    for (a, b), (won, drawn, lost) in results.items():
+        wins[a][b] += won + 0.5 * drawn + 0.5
+        wins[b][a] += lost + 0.5 * drawn + 0.5
+    strength = [1.0] * count
+    for _ in range(RATING_ITERATIONS):
+        for player in range(count):
+            total = sum(wins[player])
+            games = sum((wins[player][other] + wins[other][player]) / (strength[player] + strength[other])
+                        for other in range(count) if other != player)
+            if games:
+                strength[player] = total / games
+    return [400 * math.log10(strength[player] / strength[0]) for player in range(count)]
+
+
+#the tally of a tournament, updated with every game that finishes
+class Standings:
+
+    def __init__(self, players, pairs):
+        self.players = players
+        self.pairs = pairs
+        #[wins, draws, losses] of the first player of each pair against the second
+        self.results = {pair: [0, 0, 0] for pair in pairs}
+        #points, games, moves, seconds and nodes of every player
+        self.points = [0.0] * len(players)
+        self.games = [0] * len(players)
+        self.moves = [0] * len(players)
+        self.seconds = [0.0] * len(players)
+        self.nodes = [0] * len(players)
+        self.index = {name: number for number, (name, _, _) in enumerate(players)}
+
+    #adding a finished game
+    def add(self, record):
+        white, black = self.index[record['white']], self.index[record['black']]
+        if record['result'] == '1-0':
+            points = 1.0
+        elif record['result'] == '0-1':
+            points = 0.0
+        else:
+            points = 0.5
+        #the result of the pair, from the point of view of its first player
+        pair, first_points = ((white, black), points) if (white, black) in self.results else ((black, white), 1 - points)
+        self.results[pair][0 if first_points == 1 else 1 if first_points == 0.5 else 2] += 1
+        for player, color, player_points in ((white, 'w', points), (black, 'b', 1 - points)):
+            self.points[player] += player_points
+            self.games[player] += 1
+            self.moves[player] += record['search'][color]['moves']
+            self.seconds[player] += record['search'][color]['seconds']
+            self.nodes[player] += record['search'][color]['nodes']
+
+    #one line with the score of every player, for the progress while the tournament goes on
+    def progress(self):
+        return ', '.join(f'{name} {self.points[number]:g}/{self.games[number]}' for number, (name, _, _) in enumerate(self.players))
+
+    #the table at the end: Elo with error bars, score, ms and nodes per move of every player
+    #in a gauntlet the Elo of every player is against the first one, in a round robin it is fitted from all the games
+    #budget_ms marks the players whose moves take longer than that on average
+    def table(self, mode, budget_ms=None):
+        count = len(self.players)
+        ratings = fit_ratings(count, self.results) if mode == 'round-robin' else [0.0] * count
+        lines = [f"{'player':<22}{'elo':>7}{'95% interval':>18}{'score':>12}{'ms/move':>10}{'nodes/move':>12}"]
+        for number, (name, _, _) in enumerate(self.players):
+            #the error bars of a player come from its results against the player it is measured against (gauntlet),
+            #or from its score against the whole field, moved to its fitted rating (round robin)
+            if mode == 'gauntlet' and number:
+                won, drawn, lost = self.results[(0, number)]
+                rating, low, high = elo_interval(lost, drawn, won)
+            else:
+                won = drawn = lost = 0
+                for (a, b), (pair_won, pair_drawn, pair_lost) in self.results.items():
+                    if a == number:
+                        won, drawn, lost = won + pair_won, drawn + pair_drawn, lost + pair_lost
+                    elif b == number:
+                        won, drawn, lost = won + pair_lost, drawn + pair_drawn, lost + pair_won
+                field, low, high = elo_interval(won, drawn, lost)
+                rating = ratings[number]
+                #a player that won or lost every game has an infinite Elo against the field, its error bars are left open
+                if math.isfinite(field):
+                    low, high = rating + low - field, rating + high - field
+            ms = 1000 * self.seconds[number] / self.moves[number] if self.moves[number] else 0.0
+            nodes = self.nodes[number] / self.moves[number] if self.moves[number] else 0.0
+            over = '  over budget' if budget_ms is not None and ms > budget_ms else ''
+            interval = f'[{low:+.0f}, {high:+.0f}]'
+            lines.append(f'{name:<22}{rating:>+7.0f}{interval:>18}{self.points[number]:>7g}/{self.games[number]:<4}'
+                         f'{ms:>10.1f}{nodes:>12.0f}{over}')
+        return '\n'.join(lines)
+
+
+#playing the games of a tournament on a pool of worker processes, yielding every record in the order the games finish
+#command is the engine ('builtin' for the built-in python engine), players are (name, skill, seconds) and openings FEN strings
+def run_tournament(command, players, games, openings, concurrency=1, options=None, max_plies=MAX_PLIES):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=concurrency, initializer=_init_worker, initargs=(command, options or {})) as executor:
+        futures = [executor.submit(_play, game, players, openings[game[2]], max_plies) for game in games]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        finally:
+            #stopping early (ctrl-c, or the caller stops reading) cancels the games that have not started yet
+            for future in futures:
+                future.cancel()
+
+
+#reading the command line arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Play a tournament between skill levels of an engine and report their Elo and cost per move.')
+    parser.add_argument('--engine', required=True, help="path of the UCI engine (e.g. stockfish), or 'builtin' for the built-in python engine")
+    parser.add_argument('--players', nargs='+', required=True, metavar='SKILL[@SECONDS]', help='skill levels that play, e.g. 5 10 10@0.05')
+    parser.add_argument('--mode', choices=('round-robin', 'gauntlet'), default='round-robin',
+                        help='everyone plays everyone, or the first player plays each of the others')
+    parser.add_argument('--time', type=float, default=DEFAULT_TIME, help='seconds per move of the players that do not give their own')
+    parser.add_argument('--openings', help='file with one FEN per line, every opening is played twice by each pair with the colors swapped')
+    parser.add_argument('--rounds', type=int, default=1, help='times every pair plays through the openings')
+    parser.add_argument('--concurrency', type=int, default=1, help='number of worker processes, each plays one game at a time')
+    parser.add_argument('--hash', type=int, default=16, help='Hash option of the engines, in MB')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='plies after which a game is counted as a draw')
+    parser.add_argument('--budget-ms', type=float, help='milliseconds per move the players should stay under, the ones over it are marked')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    players = [parse_player(text, args.time) for text in args.players]
+    if len(players) < 2:
+        sys.exit('a tournament needs at least two players')
+    if len({name for name, _, _ in players}) < len(players):
+        sys.exit('every player has to be different')
+
+    if args.openings:
+        with open(args.openings) as file:
+            openings = [line.strip() for line in file if line.strip()]
+    else:
+        openings = openings_from_moves(DEFAULT_OPENINGS)
+
+    pairs = pairings(len(players), args.mode)
+    games = schedule(pairs, openings, args.rounds)
+    standings = Standings(players, pairs)
+    #the engines use one thread each, the games are spread over the processes instead
+    options = {'Threads': 1, 'Hash': args.hash}
+    print(f'{len(games)} games, {len(pairs)} pairs, {len(openings)} openings played with both colors', file=sys.stderr)
+    for done, record in enumerate(run_tournament(args.engine, players, games, openings, args.concurrency, options, args.max_plies), 1):
+        #writing the game out straight away, and the standings after it to stderr
+        sys.stdout.write(json.dumps(record) + '\n')
+        sys.stdout.flush()
+        standings.add(record)
+        print(f"[{done}/{len(games)}] {record['white']} - {record['black']} {record['result']} ({record['termination']}), "
+              f'{standings.progress()}', file=sys.stderr)
+
+    #the final table goes to stderr, so stdout only has the game records
+    print(standings.table(args.mode, args.budget_ms), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()